@@ -0,0 +1,282 @@
+import sys
+import os
+import json
+import time
+import signal
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from price_predictor import get_price_recommendation, get_price_recommendations, get_tier, DEFAULT_ENGINE
+
+DEFAULT_CHUNK_SIZE = 8
+DEFAULT_ITEM_TIMEOUT = 60 # seconds per product
+# Where SIGALRM exists (not on Windows) a worker interrupts its own slow item; elsewhere the
+# parent enforces the timeout by killing the pool
+HAS_SIGALRM = hasattr(signal, "SIGALRM")
+PARENT_TIMEOUT_SLACK = 5 # seconds on top of item_timeout before the parent gives up on an item
+
+
+class PredictionTimeout(Exception):
+    """Raised inside a worker when a single product's forecast runs past its time limit."""
+
+
+_alarm_fired = False
+
+def _on_alarm(signum, frame):
+    global _alarm_fired
+    _alarm_fired = True
+    raise PredictionTimeout("Prediction timed out.")
+
+def _predict_one(record, item_timeout, tier=None):
+    """
+    Runs one {productId, currentPrice[, engine, tier]} record and returns (result, seconds).
+    `tier` applies to records without a 'tier' field. An input line that could not be parsed
+    arrives as the ValueError from _read_records and gets an ERROR result, like any bad record.
+    On platforms with SIGALRM the item is interrupted after `item_timeout` seconds.
+    """
+    global _alarm_fired
+    _alarm_fired = False
+    start = time.perf_counter()
+    use_alarm = item_timeout and HAS_SIGALRM
+
+    try:
+        if isinstance(record, ValueError):
+            result = {"advice": "ERROR", "message": str(record)}
+        elif not isinstance(record, dict):
+            result = {"advice": "ERROR", "message": "Each record must be a JSON object."}
+        elif not record.get("productId") or record.get("currentPrice") is None:
+            result = {"advice": "ERROR", "message": "Missing 'productId' or 'currentPrice' in input."}
+        else:
+            if use_alarm:
+                signal.signal(signal.SIGALRM, _on_alarm)
+                signal.setitimer(signal.ITIMER_REAL, item_timeout)
+            result = get_price_recommendation(record["productId"], float(record["currentPrice"]), record.get("engine"), record.get("tier") or tier)
+    except PredictionTimeout:
+        pass # Reported below
+    except Exception as e:
+        result = {"advice": "ERROR", "message": f"An error occurred during prediction: {str(e)}"}
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    # get_price_recommendation catches everything itself, so an alarm during the fit shows up
+    # as a generic ERROR; reword it so callers can tell timeouts apart.
+    if _alarm_fired:
+        message = f"Prediction timed out after {item_timeout} seconds."
+        result = {"advice": "ERROR", "message": message, "min_predicted_price": None}
+
+    return result, time.perf_counter() - start
+
+def _predict_numpy_group(records, item_timeout, tier=None):
+    """
+    Predicts the valid numpy-engine records of a chunk in one get_price_recommendations call per
+    tier, so their histories are forecast together. A group gets `item_timeout` seconds per
+    record. Returns {index: (result, seconds)}; records left out (other engines, bad fields, or
+    a group that raised) go through _predict_one.
+    """
+    global _alarm_fired
+    groups = {}
+    for i, record in enumerate(records):
+        if not isinstance(record, dict) or not record.get("productId") or (record.get("engine") or DEFAULT_ENGINE) != 'numpy':
+            continue
+        try:
+            current_price = float(record["currentPrice"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        groups.setdefault(record.get("tier") or tier, []).append((i, record["productId"], current_price))
+
+    done = {}
+    for group_tier, members in groups.items():
+        _alarm_fired = False
+        use_alarm = item_timeout and HAS_SIGALRM
+        start = time.perf_counter()
+        try:
+            if use_alarm:
+                signal.signal(signal.SIGALRM, _on_alarm)
+                signal.setitimer(signal.ITIMER_REAL, item_timeout * len(members))
+            results = get_price_recommendations([(product_id, price) for _, product_id, price in members], 'numpy', group_tier)
+        except PredictionTimeout:
+            pass # Reported below
+        except Exception:
+            continue
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        if _alarm_fired:
+            message = f"Prediction timed out after {item_timeout} seconds."
+            results = [{"advice": "ERROR", "message": message, "min_predicted_price": None}] * len(members)
+        seconds = (time.perf_counter() - start) / len(members)
+        for (i, _, _), result in zip(members, results):
+            done[i] = (result, seconds)
+    return done
+
+def _predict_chunk(records, item_timeout, tier=None):
+    """Worker entry point: predicts a chunk of records inside one process, numpy-engine records batched."""
+    batched = _predict_numpy_group(records, item_timeout, tier)
+    return [batched[i] if i in batched else _predict_one(record, item_timeout, tier) for i, record in enumerate(records)]
+
+def _terminate_pool(executor):
+    """Shuts a pool down without waiting: Future.cancel() cannot stop an item that is already running."""
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+def predict_batch(records, max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, item_timeout=DEFAULT_ITEM_TIMEOUT, tier=None):
+    """
+    Predicts many {productId, currentPrice} records in parallel across CPU cores.
+
+    Records are split into chunks that run on a process pool. Results are yielded in input
+    order as (record, result, seconds) tuples; a failing or timed-out item yields an ERROR
+    result instead of stopping the batch. `records` may be any iterable (including a stream).
+    `tier` is the latency tier for records that do not name one (see price_predictor.TIERS).
+
+    A chunk that outlives its timeout has its worker killed: the pool is replaced and the
+    other in-flight chunks are resubmitted. Without SIGALRM that is the only per-item timeout,
+    so chunks are then one item each.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    # Keep a bounded number of chunks in flight so a long input stream is never fully buffered
+    max_in_flight = max_workers * 2
+    if item_timeout and not HAS_SIGALRM:
+        print("DEBUG: No SIGALRM on this platform; items are timed out by the parent, one per task.", file=sys.stderr)
+        chunk_size = 1
+
+    def chunked(iterable):
+        chunk = []
+        for record in iterable:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    in_flight = []
+    chunks = chunked(records)
+
+    def submit_next():
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        in_flight.append((chunk, executor.submit(_predict_chunk, chunk, item_timeout, tier)))
+        return True
+
+    try:
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            chunk, future = in_flight.pop(0)
+            if not item_timeout:
+                chunk_timeout = None
+            elif HAS_SIGALRM:
+                # Backstop for a worker stuck where the alarm cannot interrupt it
+                chunk_timeout = item_timeout * len(chunk) + 30
+            else:
+                chunk_timeout = item_timeout + PARENT_TIMEOUT_SLACK
+            try:
+                chunk_results = future.result(timeout=chunk_timeout)
+            except FutureTimeoutError:
+                _terminate_pool(executor)
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+                in_flight[:] = [(c, f if f.done() and not f.cancelled() and f.exception() is None
+                                 else executor.submit(_predict_chunk, c, item_timeout, tier))
+                                for c, f in in_flight]
+                message = f"Prediction timed out after {item_timeout} seconds."
+                chunk_results = [({"advice": "ERROR", "message": message}, None)] * len(chunk)
+            except Exception as e:
+                # A crashed worker process fails its whole chunk, but not the batch
+                message = f"An error occurred during prediction: {str(e)}"
+                chunk_results = [({"advice": "ERROR", "message": message}, None)] * len(chunk)
+
+            submit_next()
+            for record, (result, seconds) in zip(chunk, chunk_results):
+                yield record, result, seconds
+    finally:
+        executor.shutdown(wait=True)
+
+def _parse_record(text, line_number):
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON on line {line_number}: {str(e)}")
+
+def _read_records(stream):
+    """
+    Accepts either a JSON list or newline-delimited JSON objects. A line that is not valid
+    JSON is yielded as a ValueError in its place, so it gets its own ERROR result.
+    """
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+
+    if first == "[":
+        records = _parse_record(first + stream.read(), 1)
+        for record in (records if isinstance(records, list) else [records]):
+            yield record
+        return
+
+    pending = first
+    line_number = 0
+    for line_number, line in enumerate(stream, 1):
+        line = (pending + line).strip()
+        pending = ""
+        if line:
+            yield _parse_record(line, line_number)
+    if pending.strip():
+        yield _parse_record(pending, line_number + 1)
+
+def run_batch(in_stream, out_stream, max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, item_timeout=DEFAULT_ITEM_TIMEOUT, tier=None):
+    """
+    Reads records from `in_stream`, writes one NDJSON result per record (in input order) to
+    `out_stream` and returns a throughput summary dict.
+    """
+    start = time.perf_counter()
+    total = 0
+    failed = 0
+    item_seconds = 0.0
+
+    for record, result, seconds in predict_batch(_read_records(in_stream), max_workers, chunk_size, item_timeout, tier):
+        total += 1
+        if result.get("advice") == "ERROR":
+            failed += 1
+        if seconds is not None:
+            item_seconds += seconds
+
+        output = {"productId": record.get("productId") if isinstance(record, dict) else None, **result}
+        output["elapsed_seconds"] = round(seconds, 4) if seconds is not None else None
+        out_stream.write(json.dumps(output) + "\n")
+        out_stream.flush()
+
+    wall_seconds = time.perf_counter() - start
+    return {
+        "items": total,
+        "failed": failed,
+        "wall_seconds": round(wall_seconds, 3),
+        "items_per_second": round(total / wall_seconds, 3) if wall_seconds > 0 else None,
+        "mean_item_seconds": round(item_seconds / total, 4) if total else None,
+        "workers": max_workers or os.cpu_count() or 1,
+        "tier": tier,
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python batch_predictor.py [input.json|input.ndjson|-] [--workers N] [--chunk-size N] [--timeout SECONDS]
+    #        [--tier interactive|standard|thorough]
+    # Results go to stdout as NDJSON (input order); the throughput summary goes to stderr.
+    args = sys.argv[1:]
+    workers = int(args[args.index("--workers") + 1]) if "--workers" in args else None
+    chunk_size = int(args[args.index("--chunk-size") + 1]) if "--chunk-size" in args else DEFAULT_CHUNK_SIZE
+    timeout = float(args[args.index("--timeout") + 1]) if "--timeout" in args else DEFAULT_ITEM_TIMEOUT
+    tier = get_tier(args[args.index("--tier") + 1])[0] if "--tier" in args else None
+    source = args[0] if args and not args[0].startswith("--") else "-"
+
+    if source == "-":
+        summary = run_batch(sys.stdin, sys.stdout, workers, chunk_size, timeout, tier)
+    else:
+        with open(source, encoding="utf-8") as f:
+            summary = run_batch(f, sys.stdout, workers, chunk_size, timeout, tier)
+
+    print(json.dumps({"summary": summary}), file=sys.stderr)
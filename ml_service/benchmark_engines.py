@@ -0,0 +1,131 @@
+import sys
+import json
+import time
+import logging
+import numpy as np
+import pandas as pd
+from price_predictor import build_prophet_model, FORECAST_DAYS
+from fast_forecast import forecast_many, frame_to_series
+
+# Prophet/cmdstanpy log every fit; keep the benchmark output readable.
+# cmdstanpy only installs its own INFO handler when the logger has none, so give it one first.
+logging.getLogger("cmdstanpy").addHandler(logging.NullHandler())
+logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+logging.getLogger("prophet").setLevel(logging.WARNING)
+
+
+def synthetic_series(n_series, n_days=90 + FORECAST_DAYS, seed=42):
+    """
+    Generates price series shaped like the ones we track: a base price, a mild trend,
+    a weekly pattern, noise and occasional sale dips. Returns (start_date, [n_series, n_days]).
+    """
+    rng = np.random.default_rng(seed)
+    days = np.arange(n_days)
+    base = rng.uniform(500, 150000, size=(n_series, 1))
+    trend = rng.normal(0, 0.0008, size=(n_series, 1)) * days
+    weekly = rng.uniform(0, 0.02, size=(n_series, 1)) * np.sin(2 * np.pi * days / 7 + rng.uniform(0, 2 * np.pi, size=(n_series, 1)))
+    noise = rng.normal(0, 0.015, size=(n_series, n_days))
+    sales = (rng.random((n_series, n_days)) < 0.03) * rng.uniform(0.05, 0.15, size=(n_series, n_days))
+    Y = base * (1 + trend + weekly + noise - sales)
+    return pd.Timestamp("2024-01-01"), np.round(Y, 2)
+
+def recorded_series(path, n_days=90 + FORECAST_DAYS):
+    """
+    Loads recorded histories from a JSON-lines export of PriceHistory documents
+    ({productName, source, prices: [{price, date}]}), keeping series with enough daily points.
+    """
+    series = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            dates = [p["date"]["$date"] if isinstance(p["date"], dict) else p["date"] for p in doc.get("prices", [])]
+            df = pd.DataFrame({"ds": pd.to_datetime(dates, utc=True).tz_localize(None), "y": [p["price"] for p in doc["prices"]]})
+            if df.empty:
+                continue
+            start_date, values = frame_to_series(df)
+            if len(values) >= n_days:
+                series.append(values[-n_days:])
+    if not series:
+        return None, None
+    # Recorded series have different calendars; align them on a common (arbitrary) start date.
+    # Weekday alignment is lost, which only matters for the weekly component.
+    return pd.Timestamp("2024-01-01"), np.vstack(series)
+
+def forecast_errors(actual, predicted):
+    """Mean absolute error and mean absolute percentage error over all forecast days."""
+    mask = ~np.isnan(actual)
+    abs_err = np.abs(actual - predicted)[mask]
+    return float(abs_err.mean()), float((abs_err / np.abs(actual[mask])).mean() * 100)
+
+def run_prophet(start_date, history):
+    yhat = np.zeros((history.shape[0], FORECAST_DAYS))
+    latencies = []
+    ds = pd.date_range(start_date, periods=history.shape[1], freq="D")
+    for i, values in enumerate(history):
+        df = pd.DataFrame({"ds": ds, "y": values}).dropna()
+        t0 = time.perf_counter()
+        m = build_prophet_model()
+        m.fit(df)
+        future = m.make_future_dataframe(periods=FORECAST_DAYS)
+        yhat[i] = m.predict(future)["yhat"].tail(FORECAST_DAYS).to_numpy()
+        latencies.append(time.perf_counter() - t0)
+    return yhat, latencies
+
+def run_numpy(start_date, history):
+    latencies = []
+    yhat = np.zeros((history.shape[0], FORECAST_DAYS))
+    for i, values in enumerate(history):
+        t0 = time.perf_counter()
+        yhat[i] = forecast_many(values[None, :], start_date, FORECAST_DAYS)["yhat"][0]
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    batched = forecast_many(history, start_date, FORECAST_DAYS)["yhat"]
+    batch_seconds = time.perf_counter() - t0
+    assert np.allclose(batched, yhat, rtol=1e-6, equal_nan=True)
+    return yhat, latencies, batch_seconds
+
+def benchmark(name, start_date, Y, skip_prophet=False):
+    history, actual = Y[:, :-FORECAST_DAYS], Y[:, -FORECAST_DAYS:]
+    report = {"dataset": name, "series": int(Y.shape[0]), "history_days": int(history.shape[1])}
+
+    yhat, latencies, batch_seconds = run_numpy(start_date, history)
+    mae, mape = forecast_errors(actual, yhat)
+    report["numpy"] = {
+        "p50_ms": round(np.percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(np.percentile(latencies, 95) * 1000, 3),
+        "batched_ms_per_series": round(batch_seconds * 1000 / Y.shape[0], 4),
+        "mae": round(mae, 2),
+        "mape_pct": round(mape, 3),
+    }
+
+    if not skip_prophet:
+        yhat, latencies = run_prophet(start_date, history)
+        mae, mape = forecast_errors(actual, yhat)
+        report["prophet"] = {
+            "p50_ms": round(np.percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(np.percentile(latencies, 95) * 1000, 3),
+            "mae": round(mae, 2),
+            "mape_pct": round(mape, 3),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_engines.py [--series N] [--recorded price_history.jsonl] [--skip-prophet]
+    # Compares latency and 14-day forecast error of the Prophet and NumPy engines on a holdout.
+    args = sys.argv[1:]
+    n_series = int(args[args.index("--series") + 1]) if "--series" in args else 50
+    skip_prophet = "--skip-prophet" in args
+
+    start_date, Y = synthetic_series(n_series)
+    print(json.dumps(benchmark("synthetic", start_date, Y, skip_prophet)))
+
+    if "--recorded" in args:
+        start_date, Y = recorded_series(args[args.index("--recorded") + 1])
+        if Y is None:
+            print(json.dumps({"dataset": "recorded", "error": "No series with enough history."}))
+        else:
+            print(json.dumps(benchmark("recorded", start_date, Y, skip_prophet)))
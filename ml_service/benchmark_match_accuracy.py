@@ -0,0 +1,112 @@
+import sys
+import os
+import json
+import time
+from collections import Counter
+from product_matcher import match_title_score, find_master_match, MasterIndex
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "title_pairs.jsonl")
+SCRAPING_SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scraping_service")
+THRESHOLDS = list(range(70, 101, 5)) + [88, 90, 92, 94, 96, 98]
+
+# The labeled corpus (data/title_pairs.jsonl) holds {scraped, master, match, kind} pairs.
+# match=true means the same model in the same configuration (storage, RAM, CPU, size);
+# a different colour still counts as a match, since it sells at the same price.
+# kind names the hard negatives: storage_variant, ram_variant, model_variant, generation_variant,
+# cpu_variant, gpu_variant, size_variant, accessory, ... and different_product for easy ones.
+
+
+def load_corpus(path=DEFAULT_CORPUS):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def scorers():
+    """The pairwise scorers under test, with the threshold each caller uses today."""
+    result = {"product_matcher.match_title_score": (match_title_score, 90)}
+    sys.path.insert(0, SCRAPING_SERVICE_DIR)
+    try:
+        from scrape_common import title_match_score, MATCH_THRESHOLD
+        result["scraper.title_match_score"] = (title_match_score, MATCH_THRESHOLD)
+    except ImportError as e:
+        print(f"DEBUG: Skipping scraper scorer ({e})", file=sys.stderr)
+    return result
+
+def precision_recall(scores, labels, threshold):
+    predicted = [s >= threshold for s in scores]
+    tp = sum(p and l for p, l in zip(predicted, labels))
+    fp = sum(p and not l for p, l in zip(predicted, labels))
+    fn = sum(l and not p for p, l in zip(predicted, labels))
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"threshold": threshold, "precision": round(precision, 3), "recall": round(recall, 3), "f1": round(f1, 3),
+            "false_positives": fp, "false_negatives": fn}
+
+def evaluate_scorer(name, scorer, default_threshold, pairs):
+    """Precision/recall of a pairwise scorer at every threshold, and which hard negatives get through."""
+    t0 = time.perf_counter()
+    scores = [scorer(p["master"], p["scraped"]) for p in pairs]
+    seconds = time.perf_counter() - t0
+    labels = [p["match"] for p in pairs]
+    curve = [precision_recall(scores, labels, t) for t in sorted(set(THRESHOLDS))]
+    leaked = Counter(p["kind"] for p, s in zip(pairs, scores) if not p["match"] and s >= default_threshold)
+    missed = [p["scraped"] for p, s in zip(pairs, scores) if p["match"] and s < default_threshold]
+    return {
+        "scorer": name,
+        "default_threshold": default_threshold,
+        "at_default": precision_recall(scores, labels, default_threshold),
+        "best_f1": max(curve, key=lambda row: (row["f1"], row["threshold"])),
+        "curve": curve,
+        "false_positives_by_kind": dict(leaked),
+        "missed_matches": missed,
+        "pairs_per_second": round(len(pairs) / seconds, 1) if seconds > 0 else None,
+    }
+
+def evaluate_retrieval(pairs, threshold=90):
+    """
+    Matches every scraped title against a catalog, like the matching service does. The catalog
+    holds every master plus every hard negative as a product of its own, so positives have to
+    beat their near-identical variants. A positive must come back as its own master; a hard
+    negative must not come back as the master it was paired with.
+    """
+    masters = sorted({p["master"] for p in pairs} | {p["scraped"] for p in pairs if not p["match"] and p["kind"] != "different_product"})
+    catalog = {f"MP{i:04d}": title for i, title in enumerate(masters)}
+    index = MasterIndex(catalog)
+    correct = wrong = unmatched = leaked = 0
+    for pair in pairs:
+        if pair["kind"] == "different_product":
+            continue # Same scraped titles as the positives of other masters
+        match_id, _ = find_master_match(pair["scraped"], catalog, threshold, index=index)
+        matched_title = catalog.get(match_id)
+        if pair["match"]:
+            if matched_title == pair["master"]:
+                correct += 1
+            elif matched_title is None:
+                unmatched += 1
+            else:
+                wrong += 1
+        elif matched_title == pair["master"]:
+            leaked += 1
+    returned = correct + wrong + leaked
+    return {
+        "threshold": threshold,
+        "catalog_size": len(catalog),
+        "precision": round(correct / returned, 3) if returned else 1.0,
+        "recall": round(correct / (correct + wrong + unmatched), 3) if correct + wrong + unmatched else 1.0,
+        "wrong_master": wrong,
+        "hard_negatives_matched": leaked,
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_match_accuracy.py [--corpus data/title_pairs.jsonl] [--curve]
+    # One JSON line per scorer (precision/recall per threshold) plus one for catalog retrieval.
+    args = sys.argv[1:]
+    corpus = load_corpus(args[args.index("--corpus") + 1] if "--corpus" in args else DEFAULT_CORPUS)
+
+    for name, (scorer, threshold) in scorers().items():
+        report = evaluate_scorer(name, scorer, threshold, corpus)
+        if "--curve" not in args:
+            del report["curve"]
+        print(json.dumps(report))
+    print(json.dumps({"retrieval": evaluate_retrieval(corpus)}))
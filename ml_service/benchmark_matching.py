@@ -0,0 +1,106 @@
+import sys
+import os
+import json
+import time
+import random
+import tempfile
+from product_matcher import find_master_match, match_many, MasterIndex, MasterCatalog
+
+# Per-method work caps (title x catalog comparisons), so 1M-product catalogs finish in minutes:
+# the exhaustive loop and cdist are timed on a prefix of the titles and reported as a rate
+MAX_LOOP_COMPARISONS = 500_000
+MAX_CDIST_COMPARISONS = 200_000_000
+
+BRANDS = ['Apple', 'Samsung', 'Sony', 'Dell', 'HP', 'Lenovo', 'Asus', 'Acer', 'OnePlus', 'Xiaomi', 'boAt', 'JBL', 'Realme', 'Vivo', 'LG']
+PRODUCT_TYPES = ['Laptop', 'Smartphone', 'Wireless Headphones', 'Monitor', 'Tablet', 'Bluetooth Speaker', 'Smart Watch', 'Earbuds', 'Smart TV']
+LINES = ['Pro', 'Max', 'Ultra', 'Lite', 'Plus', 'Air', 'Neo', 'Prime', 'Inspiron', 'Pavilion', 'Galaxy', 'IdeaPad', 'Vivobook']
+COLOURS = ['Black', 'Silver', 'Blue', 'Natural Titanium', 'Green', 'Midnight', 'Starlight']
+
+
+def synthetic_catalog(size, seed=7):
+    """Generates `size` master products with realistic-looking, mostly distinct titles."""
+    rng = random.Random(seed)
+    catalog = {}
+    for i in range(size):
+        model = f"{rng.choice('ABCDEFGHKMSXZ')}{rng.randint(1, 9999)}"
+        title = f"{rng.choice(BRANDS)} {rng.choice(LINES)} {rng.choice(PRODUCT_TYPES)} {model} ({rng.choice([64, 128, 256, 512])}GB) - {rng.choice(COLOURS)}"
+        catalog[f"MP{i:07d}"] = title
+    return catalog
+
+def scraped_variants(catalog, count, seed=11):
+    """Derives scraped-looking titles: reordered words, dropped suffixes, retailer noise, plus unknown products."""
+    rng = random.Random(seed)
+    titles = list(catalog.values())
+    scraped = []
+    for _ in range(count):
+        if rng.random() < 0.2:
+            scraped.append(f"{rng.choice(BRANDS)} {rng.choice(PRODUCT_TYPES)} Z{rng.randint(10000, 99999)}")
+            continue
+        words = rng.choice(titles).split()
+        rng.shuffle(words)
+        if rng.random() < 0.3:
+            words = words[:-2]
+        if rng.random() < 0.3:
+            words.append(rng.choice(["(Renewed)", "with Offers", "| Free Delivery", "New"]))
+        scraped.append(" ".join(words))
+    return scraped
+
+def throughput(label, n_titles, seconds):
+    return {"method": label, "titles": n_titles, "seconds": round(seconds, 3),
+            "titles_per_second": round(n_titles / seconds, 1) if seconds > 0 else None}
+
+def run(catalog_size, n_titles, loop_titles):
+    catalog = synthetic_catalog(catalog_size)
+    scraped = scraped_variants(catalog, n_titles)
+    results = []
+
+    # The per-title loops are slow on big catalogs; time them on a prefix and report the rate
+    loop_sample = scraped[:max(1, min(loop_titles, MAX_LOOP_COMPARISONS // catalog_size))]
+    t0 = time.perf_counter()
+    exhaustive = [find_master_match(title, catalog) for title in loop_sample]
+    results.append(throughput("find_master_match (exhaustive loop)", len(loop_sample), time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    index = MasterIndex(catalog)
+    build_seconds = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    indexed = [find_master_match(title, catalog, index=index) for title in scraped]
+    results.append(dict(throughput("find_master_match (MasterIndex)", len(scraped), time.perf_counter() - t0),
+                        build_seconds=round(build_seconds, 3),
+                        # Speedups only count if the answers stay the same
+                        agreement_with_exhaustive=round(sum(a == b for a, b in zip(exhaustive, indexed)) / len(exhaustive), 4)))
+
+    # Compiled catalog, saved and memory-mapped back, as a long-running matcher would load it
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        path = os.path.join(tmp, "catalog.mcat")
+        MasterCatalog.from_dict(catalog).save(path)
+        compile_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        mapped_index = MasterIndex(MasterCatalog.load(path))
+        load_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for title in scraped:
+            mapped_index.find(title)
+        results.append(dict(throughput("MasterIndex (compiled, mmap)", len(scraped), time.perf_counter() - t0),
+                            compile_seconds=round(compile_seconds, 3), load_seconds=round(load_seconds, 3)))
+        del mapped_index
+
+    cdist_sample = scraped[:max(1, min(len(scraped), MAX_CDIST_COMPARISONS // catalog_size))]
+    t0 = time.perf_counter()
+    match_many(cdist_sample, index, top_k=3)
+    results.append(throughput("match_many (cdist, all cores)", len(cdist_sample), time.perf_counter() - t0))
+
+    return {"catalog_size": catalog_size, "results": results}
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_matching.py [--catalog-sizes 1000,10000,100000,1000000] [--titles 1000] [--loop-titles 100]
+    # Accuracy on the labeled corpus is measured by benchmark_match_accuracy.py
+    args = sys.argv[1:]
+    sizes = [int(s) for s in args[args.index("--catalog-sizes") + 1].split(",")] if "--catalog-sizes" in args else [1000, 10000]
+    n_titles = int(args[args.index("--titles") + 1]) if "--titles" in args else 1000
+    loop_titles = int(args[args.index("--loop-titles") + 1]) if "--loop-titles" in args else 100
+
+    for size in sizes:
+        print(json.dumps(run(size, n_titles, loop_titles)))
@@ -0,0 +1,93 @@
+import sys
+import json
+import time
+import random
+from collections import Counter
+from entity_resolution import EntityResolver
+from benchmark_matching import synthetic_catalog
+
+
+def labeled_crawl(masters, count, seed=13):
+    """Scraped-looking variants of the given masters: reordered words, dropped colour, retailer noise. Returns [(title, master_id)]."""
+    rng = random.Random(seed)
+    ids = list(masters)
+    crawl = []
+    for _ in range(count):
+        master_id = rng.choice(ids)
+        words = masters[master_id].split()
+        rng.shuffle(words)
+        if rng.random() < 0.3:
+            words = words[:-2]
+        if rng.random() < 0.3:
+            words.append(rng.choice(["(Renewed)", "with Offers", "| Free Delivery", "New"]))
+        crawl.append((" ".join(words), master_id))
+    return crawl
+
+def pairs(n):
+    return n * (n - 1) // 2
+
+def cluster_quality(resolutions, labels):
+    """Pairwise precision/recall of the candidate clusters against the true (held-out) masters."""
+    cells = Counter()
+    clusters = Counter()
+    truth = Counter()
+    for resolution, label in zip(resolutions, labels):
+        if resolution["candidate_id"] is None:
+            continue
+        cells[(resolution["candidate_id"], label)] += 1
+        clusters[resolution["candidate_id"]] += 1
+        truth[label] += 1
+    together = sum(pairs(n) for n in cells.values())
+    predicted = sum(pairs(n) for n in clusters.values())
+    actual = sum(pairs(n) for n in truth.values())
+    return {
+        "pair_precision": round(together / predicted, 4) if predicted else 1.0,
+        "pair_recall": round(together / actual, 4) if actual else 1.0,
+        "clusters": len(clusters),
+        "true_new_masters": len(truth),
+    }
+
+def run(catalog_size, n_titles, new_ratio=0.2):
+    """
+    Holds `new_ratio` of a synthetic catalog back as unknown products, resolves a crawl of
+    variants of every master, then resolves the same crawl again (memo hits).
+    """
+    masters = synthetic_catalog(catalog_size)
+    ids = list(masters)
+    known = {master_id: masters[master_id] for master_id in ids[int(len(ids) * new_ratio):]}
+    crawl = labeled_crawl(masters, n_titles)
+    resolver = EntityResolver(known)
+
+    t0 = time.perf_counter()
+    resolutions = list(resolver.resolve_many(title for title, _ in crawl))
+    first_seconds = time.perf_counter() - t0
+    comparisons = resolver.counters["comparisons"]
+    first_memo_hits = resolver.counters["memo_hits"]
+
+    t0 = time.perf_counter()
+    list(resolver.resolve_many(title for title, _ in crawl))
+    second_seconds = time.perf_counter() - t0
+
+    unknown = [(r, label) for r, (_, label) in zip(resolutions, crawl) if label not in known]
+    matched_known = [(r, label) for r, (_, label) in zip(resolutions, crawl) if label in known]
+    return {
+        "catalog_size": len(known),
+        "titles": n_titles,
+        "first_pass_us_per_title": round(first_seconds / n_titles * 1e6, 1),
+        "cluster_comparisons_per_unmatched_title": round(comparisons / max(len(unknown), 1), 2),
+        "second_pass_us_per_title": round(second_seconds / n_titles * 1e6, 1),
+        "second_pass_memo_hit_rate": round((resolver.counters["memo_hits"] - first_memo_hits) / n_titles, 3),
+        "known_matched_correctly": round(sum(r["master_id"] == label for r, label in matched_known) / max(len(matched_known), 1), 4),
+        "unknown_matched_to_a_master": sum(r["master_id"] is not None for r, _ in unknown),
+        **cluster_quality([r for r, _ in unknown], [label for _, label in unknown]),
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_resolution.py [--catalog-size 5000] [--titles 2000,10000,50000]
+    # Cost per title should stay roughly flat as the crawl grows (near-linear clustering).
+    args = sys.argv[1:]
+    catalog_size = int(args[args.index("--catalog-size") + 1]) if "--catalog-size" in args else 5000
+    sizes = [int(n) for n in args[args.index("--titles") + 1].split(",")] if "--titles" in args else [2000, 10000, 50000]
+    for n_titles in sizes:
+        print(json.dumps(run(catalog_size, n_titles)))
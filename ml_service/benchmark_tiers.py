@@ -0,0 +1,70 @@
+import sys
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+from price_predictor import TIERS, FORECAST_DAYS, forecast_prices
+from benchmark_engines import synthetic_series, forecast_errors
+
+
+def run_tier(tier, start_date, Y):
+    """
+    Cold-fits every series with the tier's settings (model store off) and forecasts the holdout.
+    Each series is cut to the tier's history window, like get_historical_data does.
+    """
+    settings = TIERS[tier]
+    history, actual = Y[:, -(settings['history_days'] + FORECAST_DAYS):-FORECAST_DAYS], Y[:, -FORECAST_DAYS:]
+    ds = pd.date_range(start_date + pd.Timedelta(days=Y.shape[1] - FORECAST_DAYS - history.shape[1]), periods=history.shape[1], freq="D")
+
+    # The first fit in a process pays for loading the Stan model; keep it out of the numbers
+    forecast_prices("warmup", pd.DataFrame({"ds": ds, "y": history[0]}), "prophet", tier)
+
+    yhat = np.zeros_like(actual)
+    widths = []
+    latencies = []
+    for i, values in enumerate(history):
+        df = pd.DataFrame({"ds": ds, "y": values})
+        t0 = time.perf_counter()
+        forecast = forecast_prices(f"series-{i}", df, "prophet", tier)
+        latencies.append(time.perf_counter() - t0)
+        yhat[i] = forecast["yhat"].to_numpy()
+        widths.append(float(((forecast["yhat_upper"] - forecast["yhat_lower"]) / forecast["yhat"]).mean()))
+
+    mae, mape = forecast_errors(actual, yhat)
+    p95_ms = float(np.percentile(latencies, 95) * 1000)
+    return {
+        "tier": tier,
+        "series": int(Y.shape[0]),
+        "history_days": settings['history_days'],
+        "p50_ms": round(float(np.percentile(latencies, 50) * 1000), 1),
+        "p95_ms": round(p95_ms, 1),
+        "target_p95_ms": settings['target_p95_ms'],
+        "within_target": p95_ms <= settings['target_p95_ms'],
+        "mae": round(mae, 2),
+        "mape_pct": round(mape, 3),
+        "mean_interval_width_pct": round(float(np.mean(widths)) * 100, 2),
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_tiers.py [--series 20] [--tiers interactive,standard,thorough]
+    # One JSON line per tier; exits with status 1 when a tier misses its p95 latency target.
+    args = sys.argv[1:]
+    n_series = int(args[args.index("--series") + 1]) if "--series" in args else 20
+    tiers = args[args.index("--tiers") + 1].split(",") if "--tiers" in args else list(TIERS)
+
+    os.environ["PRICE_MODEL_STORE"] = "off" # Targets are for cold fits
+    longest = max(TIERS[tier]['history_days'] for tier in tiers)
+    start_date, Y = synthetic_series(n_series, n_days=longest + FORECAST_DAYS)
+
+    missed = []
+    for tier in tiers:
+        report = run_tier(tier, start_date, Y)
+        print(json.dumps(report))
+        if not report["within_target"]:
+            missed.append(tier)
+
+    if missed:
+        print(json.dumps({"missed_targets": missed}))
+        sys.exit(1)
@@ -0,0 +1,352 @@
+import sys
+import os
+import json
+from collections import Counter, OrderedDict
+from product_matcher import MasterIndex, MasterCatalog, find_master_match, _is_model_number
+from title_normalizer import normalize_title, score_titles, CAPACITY_TOKEN_REGEX
+
+# --- RESOLUTION CONFIGURATION ---
+# Unmatched titles are joined when their pairwise score reaches CLUSTER_THRESHOLD. Each title is
+# only compared with titles sharing one of its KEYS_PER_TITLE rarest tokens (its blocking keys),
+# and with at most MAX_BLOCK_COMPARISONS of the most recent titles per key, so a crawl batch
+# costs near-linear time however many titles share a generic word.
+CLUSTER_THRESHOLD = 90
+KEYS_PER_TITLE = 3
+MAX_BLOCK_COMPARISONS = 50
+MAX_MEMO_ENTRIES = 100_000
+
+
+def blocking_keys(normalized, catalog=None, keys_per_title=KEYS_PER_TITLE):
+    """
+    The tokens a title is blocked on: its rarest tokens by catalog frequency, model numbers
+    and other digit-bearing tokens first. Capacities ("256gb", "8gbram") are never keys: they
+    are shared by unrelated products, and capacity conflicts are caught when scoring anyway.
+    """
+    def rank(token):
+        frequency = len(catalog.posting_rows(token)) if catalog is not None else 0
+        return (not _is_model_number(token), not any(c.isdigit() for c in token), frequency)
+
+    tokens = [t for t in dict.fromkeys(normalized.tokens) if not CAPACITY_TOKEN_REGEX.fullmatch(t)]
+    return sorted(tokens, key=rank)[:keys_per_title]
+
+
+class EntityResolver:
+    """
+    Streaming resolution of scraped titles against a master catalog.
+
+    resolve() handles one title at a time:
+      - titles resolved before (same normalized text) are answered from the memo, without
+        scoring the catalog again,
+      - otherwise the title is matched with find_master_match,
+      - a title without a match is clustered with earlier unmatched titles: it is scored
+        against the titles sharing one of its blocking keys and merged (union-find) with
+        every cluster it reaches CLUSTER_THRESHOLD with.
+
+    The clusters are candidate new master products (see candidates()). promote() adds one to
+    the catalog; memoized unmatched titles are then re-checked against new masters only.
+    Clustering is single-linkage: titles can join through an intermediate title, but never
+    across a storage/RAM conflict, which score_titles caps below every threshold.
+    Not thread-safe; feed it from one consumer.
+    """
+
+    def __init__(self, master_products=None, threshold=90, cluster_threshold=CLUSTER_THRESHOLD,
+                 max_block_comparisons=MAX_BLOCK_COMPARISONS, max_memo_entries=MAX_MEMO_ENTRIES):
+        if isinstance(master_products, MasterIndex):
+            self.index = master_products
+        else:
+            self.index = MasterIndex(master_products or {})
+        self.threshold = threshold
+        self.cluster_threshold = cluster_threshold
+        self.max_block_comparisons = max_block_comparisons
+        self.max_memo_entries = max_memo_entries
+
+        self._memo = OrderedDict() # normalized text -> (master_id, score) of a matched title
+        self._nodes = [] # unmatched titles: {"title", "text", "count", "generation"}
+        self._node_ids = {} # normalized text -> node id
+        self._parent = []
+        self._size = []
+        self._first = [] # root -> oldest node id of its cluster (the stable candidate ID)
+        self._blocks = {} # blocking key -> node ids, oldest first
+        self._promoted = {} # node id -> master ID, for titles of promoted clusters
+        self._added = [] # (generation, master_id, title) of masters added through promote()
+        self.generation = 0
+        self.counters = Counter()
+
+    # --- Union-find ---
+
+    def _find(self, node):
+        root = node
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[node] != root: # Path compression
+            self._parent[node], node = root, self._parent[node]
+        return root
+
+    def _union(self, a, b):
+        a, b = self._find(a), self._find(b)
+        if a == b:
+            return a
+        if self._size[a] < self._size[b]: # Union by size keeps the trees shallow
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size[b]
+        self._first[a] = min(self._first[a], self._first[b])
+        return a
+
+    def candidate_id(self, node):
+        return f"CAND{self._first[self._find(node)]:07d}"
+
+    # --- Memo ---
+
+    def _remember(self, text, master_id, score):
+        self._memo[text] = (master_id, score)
+        self._memo.move_to_end(text)
+        while len(self._memo) > self.max_memo_entries:
+            self._memo.popitem(last=False)
+
+    def _match_new_masters(self, node):
+        """Scores a memoized unmatched title against the masters promoted since it was last checked."""
+        entry = self._nodes[node]
+        best_id, best_score = None, 0
+        for generation, master_id, title in self._added:
+            if generation > entry["generation"]:
+                score = score_titles(entry["title"], title)
+                if score > best_score:
+                    best_id, best_score = master_id, score
+        entry["generation"] = self.generation
+        return (best_id, best_score) if best_score >= self.threshold else (None, 0)
+
+    # --- Resolution ---
+
+    def resolve(self, title):
+        """
+        Resolves one scraped title. Returns {"title", "master_id", "score", "candidate_id",
+        "resolution"}, where resolution is "memo" (matched before), "matched", "promoted"
+        (its cluster became a master), "clustered" (joined an existing candidate) or "new"
+        (started a candidate of its own).
+        """
+        normalized = normalize_title(title)
+        text = normalized.text
+        result = {"title": title, "master_id": None, "score": 0, "candidate_id": None}
+
+        if text in self._memo:
+            self._memo.move_to_end(text)
+            self.counters["memo_hits"] += 1
+            result["master_id"], result["score"] = self._memo[text]
+            return dict(result, resolution="memo")
+
+        node = self._node_ids.get(text)
+        if node is not None:
+            self.counters["memo_hits"] += 1
+            self._nodes[node]["count"] += 1
+            if node in self._promoted:
+                return dict(result, master_id=self._promoted[node], resolution="promoted")
+            if self._nodes[node]["generation"] < self.generation:
+                master_id, score = self._match_new_masters(node)
+                if master_id is not None:
+                    self._promoted[node] = master_id
+                    return dict(result, master_id=master_id, score=score, resolution="matched")
+            return dict(result, candidate_id=self.candidate_id(node), resolution="memo")
+
+        master_id, score = find_master_match(title, None, self.threshold, index=self.index)
+        if master_id is not None:
+            self.counters["matched"] += 1
+            self._remember(text, master_id, score)
+            return dict(result, master_id=master_id, score=score, resolution="matched")
+
+        node = self._add_node(title, normalized)
+        joined = self._cluster(node, normalized)
+        self.counters["clustered" if joined else "new"] += 1
+        return dict(result, candidate_id=self.candidate_id(node), resolution="clustered" if joined else "new")
+
+    def resolve_many(self, titles):
+        """Generator over resolve() for a stream of titles."""
+        for title in titles:
+            yield self.resolve(title)
+
+    def _add_node(self, title, normalized):
+        node = len(self._nodes)
+        self._nodes.append({"title": title, "text": normalized.text, "count": 1, "generation": self.generation})
+        self._node_ids[normalized.text] = node
+        self._parent.append(node)
+        self._size.append(1)
+        self._first.append(node)
+        return node
+
+    def _cluster(self, node, normalized):
+        """Scores the new node against its blocks (newest first) and merges every match. True if it joined one."""
+        title = self._nodes[node]["title"]
+        joined = False
+        seen = set()
+        for key in blocking_keys(normalized, self.index.catalog):
+            block = self._blocks.setdefault(key, [])
+            for other in reversed(block[-self.max_block_comparisons:]):
+                if other in seen or other in self._promoted:
+                    continue
+                seen.add(other)
+                if self._find(other) == self._find(node):
+                    continue # Already merged through another title
+                self.counters["comparisons"] += 1
+                if score_titles(title, self._nodes[other]["title"]) >= self.cluster_threshold:
+                    self._union(node, other)
+                    joined = True
+            block.append(node)
+        return joined
+
+    # --- Candidates ---
+
+    def _clusters(self):
+        """root -> member node ids, for clusters that were not promoted."""
+        clusters = {}
+        for node in range(len(self._nodes)):
+            if node not in self._promoted:
+                clusters.setdefault(self._find(node), []).append(node)
+        return clusters
+
+    def _representative(self, members):
+        """The most often seen member title; ties go to the shortest, then the oldest."""
+        return min(members, key=lambda n: (-self._nodes[n]["count"], len(self._nodes[n]["title"]), n))
+
+    def candidates(self, min_size=2):
+        """
+        Candidate new master products: clusters seen at least `min_size` times, largest first.
+        Returns [{candidate_id, title, size, titles}]; `title` is the representative title.
+        """
+        result = []
+        for root, members in self._clusters().items():
+            size = sum(self._nodes[n]["count"] for n in members)
+            if size < min_size:
+                continue
+            result.append({
+                "candidate_id": self.candidate_id(root),
+                "title": self._nodes[self._representative(members)]["title"],
+                "size": size,
+                "titles": [self._nodes[n]["title"] for n in sorted(members)],
+            })
+        result.sort(key=lambda c: (-c["size"], c["candidate_id"]))
+        return result
+
+    def promote(self, candidate_id, master_id, master_title=None):
+        """
+        Adds a candidate to the catalog as `master_id` (titled by its representative unless
+        `master_title` is given). Its titles resolve to the new master from now on, and the
+        other unmatched titles are checked against it the next time they are seen.
+        Returns the master title, or None for an unknown candidate.
+        """
+        for root, members in self._clusters().items():
+            if self.candidate_id(root) != candidate_id:
+                continue
+            master_title = master_title or self._nodes[self._representative(members)]["title"]
+            self.index.add(master_id, master_title)
+            self.generation += 1
+            self._added.append((self.generation, master_id, master_title))
+            for node in members:
+                self._promoted[node] = master_id
+            self.counters["promoted"] += 1
+            return master_title
+        return None
+
+    def stats(self):
+        resolved = self.counters["memo_hits"] + self.counters["matched"] + self.counters["clustered"] + self.counters["new"]
+        return dict(self.counters,
+                    resolved=resolved,
+                    memo_hit_rate=round(self.counters["memo_hits"] / resolved, 3) if resolved else None,
+                    unmatched_titles=len(self._nodes) - len(self._promoted),
+                    candidates=len(self.candidates()),
+                    memo_entries=len(self._memo))
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """Writes the memo and the unmatched-title clusters to a JSON file (atomically)."""
+        state = {
+            "generation": self.generation,
+            "memo": [[text, master_id, score] for text, (master_id, score) in self._memo.items()],
+            "nodes": [[n["title"], n["count"], n["generation"], self._find(i), self._promoted.get(i)]
+                      for i, n in enumerate(self._nodes)],
+            "added": self._added,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """Restores the state written by save() on top of this resolver's catalog. Returns self."""
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        self.generation = state["generation"]
+        self._added = [tuple(entry) for entry in state["added"]]
+        for _, master_id, title in self._added:
+            if master_id not in self.index.catalog: # Promoted masters live only in the saved state
+                self.index.add(master_id, title)
+        for text, master_id, score in state["memo"]:
+            self._remember(text, master_id, score)
+        for title, count, generation, _, master_id in state["nodes"]:
+            normalized = normalize_title(title)
+            node = self._add_node(title, normalized)
+            self._nodes[node].update(count=count, generation=generation)
+            if master_id is not None:
+                self._promoted[node] = master_id
+            for key in blocking_keys(normalized, self.index.catalog):
+                self._blocks.setdefault(key, []).append(node)
+        for node, (_, _, _, root, _) in enumerate(state["nodes"]):
+            self._union(node, root)
+        return self
+
+
+def load_catalog(path):
+    """A compiled MasterCatalog file (see MasterCatalog.save) or a JSON object of ID -> title."""
+    with open(path, 'rb') as f:
+        compiled = f.read(4) == b"MCAT"
+    if compiled:
+        return MasterCatalog.load(path)
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def _read_titles(stream):
+    """Accepts NDJSON objects with a 'title' field, or plain lines of text."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            yield json.loads(line).get("title") or ""
+        else:
+            yield line
+
+
+if __name__ == "__main__":
+    # Usage: python entity_resolution.py [titles.ndjson|-] --catalog catalog.json|catalog.mcat
+    #        [--state resolver_state.json] [--threshold 90] [--cluster-threshold 90] [--min-size 2] [--resolutions]
+    # Prints the candidate new masters as NDJSON (or every title's resolution with --resolutions);
+    # the stats go to stderr. --state carries the memo and clusters over to the next crawl.
+    args = sys.argv[1:]
+    if "--catalog" not in args:
+        print(json.dumps({"status": "error", "message": "Usage: entity_resolution.py [titles] --catalog FILE"}))
+        sys.exit(1)
+    threshold = int(args[args.index("--threshold") + 1]) if "--threshold" in args else 90
+    cluster_threshold = int(args[args.index("--cluster-threshold") + 1]) if "--cluster-threshold" in args else CLUSTER_THRESHOLD
+    min_size = int(args[args.index("--min-size") + 1]) if "--min-size" in args else 2
+    state_path = args[args.index("--state") + 1] if "--state" in args else None
+    source = args[0] if args and not args[0].startswith("--") else "-"
+
+    resolver = EntityResolver(load_catalog(args[args.index("--catalog") + 1]), threshold, cluster_threshold)
+    if state_path and os.path.exists(state_path):
+        resolver.load(state_path)
+
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        for resolution in resolver.resolve_many(_read_titles(stream)):
+            if "--resolutions" in args:
+                print(json.dumps(resolution))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    if "--resolutions" not in args:
+        for candidate in resolver.candidates(min_size):
+            print(json.dumps(candidate))
+    if state_path:
+        resolver.save(state_path)
+    print(json.dumps({"stats": resolver.stats()}), file=sys.stderr)
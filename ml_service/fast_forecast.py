@@ -0,0 +1,113 @@
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+# Matches Prophet's default interval_width, so yhat_lower/yhat_upper mean the same thing
+DEFAULT_INTERVAL_WIDTH = 0.80
+HUBER_K = 1.345 # Standard Huber tuning constant (95% efficiency on Gaussian noise)
+
+
+def _design_matrix(start_date, n_points, horizon):
+    """
+    Builds the regression design for history and forecast days:
+    intercept, linear trend and six day-of-week dummies (Monday is the baseline).
+    """
+    days = np.arange(n_points + horizon)
+    # Scale the trend to roughly [0, 1] so the normal equations stay well conditioned
+    trend = days / max(n_points - 1, 1)
+    weekdays = (pd.Timestamp(start_date).dayofweek + days) % 7
+
+    X = np.zeros((n_points + horizon, 8))
+    X[:, 0] = 1.0
+    X[:, 1] = trend
+    for d in range(1, 7):
+        X[:, 1 + d] = weekdays == d
+    return X[:n_points], X[n_points:]
+
+def forecast_many(Y, start_date, horizon=14, interval_width=DEFAULT_INTERVAL_WIDTH, n_iter=6):
+    """
+    Forecasts many aligned daily price series at once.
+
+    Each row of `Y` (shape [n_series, n_days], NaN for missing days) is fitted with a robust
+    (Huber IRLS) linear trend plus weekly seasonality. All series share one design matrix,
+    so every step is a batched NumPy operation rather than a per-series loop.
+
+    Returns a dict of [n_series, horizon] arrays: 'yhat', 'yhat_lower' and 'yhat_upper',
+    where the bounds are analytic prediction intervals of the given width.
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    n_series, n_points = Y.shape
+    X, X_future = _design_matrix(start_date, n_points, horizon)
+    n_params = X.shape[1]
+
+    valid = ~np.isnan(Y)
+    Y0 = np.where(valid, Y, 0.0)
+    weights = valid.astype(float)
+    ridge = 1e-8 * np.eye(n_params) # Keeps XtWX invertible when a weekday has no observations
+
+    for _ in range(n_iter):
+        XtWX = np.einsum('kn,np,nq->kpq', weights, X, X) + ridge
+        XtWy = np.einsum('kn,np->kp', weights * Y0, X)
+        beta = np.linalg.solve(XtWX, XtWy[..., None])[..., 0]
+
+        residuals = np.where(valid, Y0 - beta @ X.T, np.nan)
+        # Robust scale per series (MAD), guarded against perfectly flat series
+        scale = 1.4826 * np.nanmedian(np.abs(residuals), axis=1, keepdims=True)
+        scale = np.maximum(scale, 1e-9 * np.maximum(np.nanmean(np.abs(Y), axis=1, keepdims=True), 1.0))
+        abs_scaled = np.abs(np.nan_to_num(residuals)) / scale
+        weights = np.where(valid, np.minimum(1.0, HUBER_K / np.maximum(abs_scaled, 1e-12)), 0.0)
+
+    # Residual variance of the weighted fit, then the usual OLS prediction variance
+    # sigma^2 * (1 + x' (X'WX)^-1 x) for every forecast day
+    n_eff = valid.sum(axis=1)
+    dof = np.maximum(n_eff - n_params, 1)
+    sigma2 = np.nansum(weights * np.nan_to_num(residuals) ** 2, axis=1) / dof
+
+    XtWX_inv = np.linalg.inv(XtWX)
+    leverage = np.einsum('hp,kpq,hq->kh', X_future, XtWX_inv, X_future)
+    std = np.sqrt(sigma2[:, None] * (1.0 + leverage))
+
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    yhat = beta @ X_future.T
+    return {
+        "yhat": yhat,
+        "yhat_lower": yhat - z * std,
+        "yhat_upper": yhat + z * std,
+    }
+
+def frame_to_series(df):
+    """
+    Converts a 'ds'/'y' history frame into (start_date, values) on a daily grid,
+    with NaN for days that have no observation.
+    """
+    daily = df.set_index(pd.to_datetime(df['ds']).dt.normalize())['y']
+    daily = daily.groupby(level=0).mean().asfreq('D')
+    return daily.index[0], daily.to_numpy(dtype=float)
+
+def forecast_frames(dfs, horizon=14, interval_width=DEFAULT_INTERVAL_WIDTH):
+    """
+    Forecasts many 'ds'/'y' history frames; returns one Prophet-style forecast frame of `horizon`
+    rows per input. Frames on the same daily grid (same first day and length, as histories read
+    over the same window usually are) go through a single forecast_many call.
+    """
+    series = [frame_to_series(df) for df in dfs]
+    grids = {}
+    for i, (start_date, values) in enumerate(series):
+        grids.setdefault((start_date, len(values)), []).append(i)
+
+    frames = [None] * len(series)
+    for (start_date, n_days), members in grids.items():
+        result = forecast_many(np.stack([series[i][1] for i in members]), start_date, horizon, interval_width)
+        ds = pd.date_range(start_date + pd.Timedelta(days=n_days), periods=horizon, freq='D')
+        for row, i in enumerate(members):
+            frames[i] = pd.DataFrame({
+                'ds': ds,
+                'yhat': result['yhat'][row],
+                'yhat_lower': result['yhat_lower'][row],
+                'yhat_upper': result['yhat_upper'][row],
+            })
+    return frames
+
+def forecast_frame(df, horizon=14, interval_width=DEFAULT_INTERVAL_WIDTH):
+    """Forecasts a single 'ds'/'y' history frame; returns a Prophet-style forecast frame of `horizon` rows."""
+    return forecast_frames([df], horizon, interval_width)[0]
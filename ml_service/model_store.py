@@ -0,0 +1,221 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from prophet.serialize import model_to_json, model_from_json
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_store")
+# Refit from the previous parameters when at most this many new days have arrived
+MAX_NEW_POINTS_FOR_WARM_START = 7
+# Other processes may share the directory; re-list it this often to pick up their files
+RESCAN_EVERY_SAVES = 256
+
+
+def history_fingerprint(df):
+    """Returns a stable hash of a 'ds'/'y' history frame, used to detect unchanged data."""
+    digest = hashlib.sha1()
+    digest.update(df['ds'].values.astype('datetime64[s]').astype('int64').tobytes())
+    digest.update(df['y'].values.astype('float64').tobytes())
+    return digest.hexdigest()
+
+def warm_start_params(model):
+    """
+    Extracts the fitted parameters of a Prophet model in the shape Prophet.fit(init=...) expects,
+    so a refit on slightly extended data starts from the previous optimum.
+    """
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        if model.mcmc_samples == 0:
+            params[name] = model.params[name][0][0]
+        else:
+            params[name] = np.mean(model.params[name])
+    for name in ['delta', 'beta']:
+        if model.mcmc_samples == 0:
+            params[name] = model.params[name][0]
+        else:
+            params[name] = np.mean(model.params[name], axis=0)
+    return params
+
+
+class ModelStore:
+    """
+    On-disk store of fitted Prophet models keyed by product ID, with a small in-memory cache
+    in front of it. Each entry remembers the fingerprint of the history it was fitted on, so
+    an unchanged history can skip the fit entirely. The disk side is bounded by entry count
+    and total size; the least recently used files are evicted first, from an in-memory index
+    of the files that is rebuilt from the directory every RESCAN_EVERY_SAVES saves.
+    """
+
+    def __init__(self, directory=DEFAULT_STORE_DIR, max_entries=5000, max_bytes=512 * 1024 * 1024, max_memory_entries=64):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict() # key -> entry dict with a deserialized 'model'
+        self._lock = threading.Lock()
+        self._files = OrderedDict() # path -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._saves_since_scan = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".json")
+
+    def _scan(self):
+        """Rebuilds the file index from the directory, oldest modification time first."""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        self._files = OrderedDict((path, size) for _, size, path in files)
+        self._total_bytes = sum(size for _, size, _ in files)
+        self._saves_since_scan = 0
+
+    def _touch(self, path, size):
+        self._total_bytes += size - self._files.pop(path, 0)
+        self._files[path] = size
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def load(self, key):
+        """Returns the stored entry ({fingerprint, n_points, last_ds, model}) or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                raw = json.load(f)
+                size = os.fstat(f.fileno()).st_size
+            os.utime(path) # Mark as recently used for other processes' eviction
+        except (OSError, ValueError):
+            return None
+
+        try:
+            entry = {
+                "fingerprint": raw["fingerprint"],
+                "n_points": raw["n_points"],
+                "last_ds": raw["last_ds"],
+                "model": model_from_json(raw["model"]),
+            }
+        except Exception:
+            # Corrupt or written by an incompatible Prophet version: treat as a miss
+            return None
+
+        with self._lock:
+            self._remember(key, entry)
+            self._touch(path, size)
+        return entry
+
+    def save(self, key, fingerprint, df, model):
+        entry = {
+            "fingerprint": fingerprint,
+            "n_points": len(df),
+            "last_ds": str(df['ds'].max()),
+            "model": model,
+        }
+        raw = dict(entry, key=key, model=model_to_json(model))
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(raw, f)
+        os.replace(tmp_path, path) # Atomic, so concurrent readers never see half a file
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self._remember(key, entry)
+            self._touch(path, size)
+            self._saves_since_scan += 1
+            rescan = self._saves_since_scan >= RESCAN_EVERY_SAVES
+        self.evict(rescan)
+
+    def evict(self, rescan=False):
+        """
+        Deletes least recently used models until the store is within its count and size limits.
+        With `rescan`, the file index is first rebuilt from the directory.
+        """
+        with self._lock:
+            if rescan:
+                self._scan()
+            victims = []
+            while self._files and (len(self._files) > self.max_entries or self._total_bytes > self.max_bytes):
+                path, size = self._files.popitem(last=False)
+                self._total_bytes -= size
+                victims.append(path)
+        for path in victims:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_or_fit(self, key, df, build_model, fit_kwargs=None):
+        """
+        Returns a fitted model for `df`:
+          - the stored model as-is when the history fingerprint is unchanged,
+          - a warm-started refit when only a few new days were appended,
+          - a full fit from `build_model()` otherwise.
+        `fit_kwargs` are passed on to model.fit (e.g. sampler settings).
+        """
+        fit_kwargs = fit_kwargs or {}
+        fingerprint = history_fingerprint(df)
+        entry = self.load(key)
+
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            return entry["model"]
+
+        model = build_model()
+        init = None
+        if entry is not None:
+            new_points = int((df['ds'] > np.datetime64(entry["last_ds"])).sum())
+            if 0 < new_points <= MAX_NEW_POINTS_FOR_WARM_START:
+                init = warm_start_params(entry["model"])
+
+        try:
+            model.fit(df, init=init, **fit_kwargs) if init is not None else model.fit(df, **fit_kwargs)
+        except Exception:
+            if init is None:
+                raise
+            # Parameter shapes no longer match (e.g. a different seasonality setup): fit from scratch
+            model = build_model()
+            model.fit(df, **fit_kwargs)
+
+        try:
+            self.save(key, fingerprint, df, model)
+        except OSError:
+            pass # A read-only or full disk should not break predictions
+        return model
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_default_store():
+    """
+    Returns the process-wide store, or None when disabled with PRICE_MODEL_STORE=off.
+    The location can be changed with PRICE_MODEL_STORE_DIR.
+    """
+    global _default_store
+    if os.environ.get("PRICE_MODEL_STORE", "on").lower() in ("off", "0", "false"):
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ModelStore(os.environ.get("PRICE_MODEL_STORE_DIR", DEFAULT_STORE_DIR))
+        return _default_store
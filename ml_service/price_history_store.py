@@ -0,0 +1,321 @@
+import sys
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "price_history")
+
+# One record per observed price: UTC epoch seconds and the price. Sorted by time within a series.
+POINT_DTYPE = np.dtype([('ts', '<i8'), ('price', '<f8')])
+
+
+def normalize_product_name(product):
+    """Matches the PriceHistory convention: product names are stored lowercased and trimmed."""
+    return str(product).lower().strip()
+
+def _to_epoch_seconds(dates):
+    """Converts datetimes, ISO strings or Mongo extended-JSON dates to UTC epoch seconds."""
+    values = []
+    for d in dates:
+        if isinstance(d, dict):
+            # Mongo extended JSON: {"$date": "2024-01-01T00:00:00Z"}, {"$date": 1704067200000}
+            # or {"$date": {"$numberLong": "1704067200000"}}; numeric forms are milliseconds
+            d = d.get("$date")
+            if isinstance(d, dict):
+                d = int(d.get("$numberLong")) / 1000.0
+            elif isinstance(d, (int, float)):
+                d = d / 1000.0
+        if isinstance(d, (int, float)):
+            d = pd.Timestamp(d, unit='s', tz='UTC')
+        values.append(d)
+    stamps = pd.to_datetime(pd.Series(values), utc=True, format='mixed').dt.tz_localize(None)
+    return stamps.to_numpy().astype('datetime64[s]').astype('int64')
+
+
+class PriceHistoryStore:
+    """
+    Append-only, memory-mapped price history keyed by (product, retailer).
+
+    Every series lives in its own flat binary file of POINT_DTYPE records, sharded into
+    subdirectories by hash. Reads memory-map the file and slice the requested time range with
+    a binary search, so only the touched pages are loaded. A small catalog file lists the
+    series so products can be looked up without scanning the directory; it is re-read when
+    its mtime or size changes, so long-running readers see series imported by another process.
+
+    Series are keyed by the PriceHistory product name (the search query). API callers know a
+    product by its master product ID instead, so a second file maps IDs to names (see
+    import_products_jsonl); reads accept either.
+
+    Appends are safe across threads of one process; use a single writer process per store.
+    """
+
+    def __init__(self, directory=DEFAULT_HISTORY_DIR):
+        self.directory = directory
+        self._catalog_path = os.path.join(directory, "catalog.jsonl")
+        self._catalog = None # product -> {retailer: relative file path}
+        self._catalog_stamp = None # (mtime_ns, size) of catalog.jsonl when it was read
+        self._ids_path = os.path.join(directory, "product_ids.jsonl")
+        self._ids = None # master product ID -> product name
+        self._ids_stamp = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # --- Catalog ---
+
+    def _file_stamp(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _catalog_file_stamp(self):
+        return self._file_stamp(self._catalog_path)
+
+    def _load_catalog(self):
+        stamp = self._catalog_file_stamp()
+        if self._catalog is not None and stamp == self._catalog_stamp:
+            return self._catalog
+        catalog = {}
+        if stamp is not None:
+            with open(self._catalog_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        catalog.setdefault(entry["product"], {})[entry["retailer"]] = entry["file"]
+        self._catalog = catalog
+        self._catalog_stamp = stamp
+        return catalog
+
+    def _series_file(self, product, retailer, create=False):
+        product = normalize_product_name(product)
+        catalog = self._load_catalog()
+        relative = catalog.get(product, {}).get(retailer)
+        if relative is None:
+            if not create:
+                return None
+            digest = hashlib.sha1(f"{product}\x1f{retailer}".encode('utf-8')).hexdigest()
+            relative = os.path.join(digest[:2], digest + ".bin")
+            os.makedirs(os.path.join(self.directory, digest[:2]), exist_ok=True)
+            with open(self._catalog_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"product": product, "retailer": retailer, "file": relative}) + "\n")
+            catalog.setdefault(product, {})[retailer] = relative
+            if self._catalog is catalog:
+                self._catalog_stamp = self._catalog_file_stamp() # Our own write needs no re-read
+        return os.path.join(self.directory, relative)
+
+    def _load_ids(self):
+        stamp = self._file_stamp(self._ids_path)
+        if self._ids is not None and stamp == self._ids_stamp:
+            return self._ids
+        ids = {}
+        if stamp is not None:
+            with open(self._ids_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        ids[entry["id"]] = entry["product"]
+        self._ids = ids
+        self._ids_stamp = stamp
+        return ids
+
+    def product_name(self, product):
+        """The stored product name for a master product ID or a product name."""
+        return self._load_ids().get(str(product).strip()) or normalize_product_name(product)
+
+    def products(self):
+        return list(self._load_catalog().keys())
+
+    def retailers(self, product):
+        return list(self._load_catalog().get(self.product_name(product), {}).keys())
+
+    # --- Writes ---
+
+    def append(self, product, retailer, timestamps, prices):
+        """
+        Appends observations to a series. `timestamps` are epoch seconds (or anything
+        _to_epoch_seconds accepts). In-order appends are a plain file append; out-of-order
+        points trigger a one-off merge rewrite of that series.
+        """
+        ts = np.asarray(timestamps)
+        if ts.dtype.kind not in 'iu':
+            ts = _to_epoch_seconds(timestamps)
+        points = np.empty(len(ts), dtype=POINT_DTYPE)
+        points['ts'] = ts
+        points['price'] = np.asarray(prices, dtype=float)
+        if len(points) == 0:
+            return
+        points = points[np.argsort(points['ts'], kind='stable')]
+
+        with self._lock:
+            path = self._series_file(product, retailer, create=True)
+            existing = self._map(path)
+            if existing is None or len(existing) == 0 or points['ts'][0] >= existing['ts'][-1]:
+                with open(path, 'ab') as f:
+                    f.write(points.tobytes())
+                return
+
+            merged = np.concatenate([np.array(existing), points])
+            merged = merged[np.argsort(merged['ts'], kind='stable')]
+            del existing # Release the mapping before replacing the file
+            tmp_path = path + ".tmp"
+            merged.tofile(tmp_path)
+            os.replace(tmp_path, path)
+
+    # --- Reads ---
+
+    def _map(self, path):
+        if path is None or not os.path.exists(path):
+            return None
+        # A writer may be halfway through an append: map whole records only
+        count = os.path.getsize(path) // POINT_DTYPE.itemsize
+        if count == 0:
+            return None
+        return np.memmap(path, dtype=POINT_DTYPE, mode='r', shape=(count,))
+
+    def read(self, product, retailer, start=None, end=None):
+        """
+        Returns the [start, end) slice of a series as a read-only, memory-mapped POINT_DTYPE array
+        (no copy), or an empty array if the series does not exist.
+        """
+        points = self._map(self._series_file(self.product_name(product), retailer))
+        if points is None:
+            return np.empty(0, dtype=POINT_DTYPE)
+        lo = 0 if start is None else np.searchsorted(points['ts'], _to_epoch_seconds([start])[0], side='left')
+        hi = len(points) if end is None else np.searchsorted(points['ts'], _to_epoch_seconds([end])[0], side='left')
+        return points[lo:hi]
+
+    def read_frame(self, product, retailer=None, start=None, end=None, daily=True):
+        """
+        Returns the history as the 'ds'/'y' frame Prophet expects. With no retailer, all
+        retailers of the product are combined. With `daily`, points are reduced to the
+        lowest price per calendar day (what a shopper could have paid that day).
+        """
+        retailers = [retailer] if retailer else self.retailers(product)
+        parts = [self.read(product, r, start, end) for r in retailers]
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return pd.DataFrame({'ds': pd.Series(dtype='datetime64[ns]'), 'y': pd.Series(dtype=float)})
+
+        points = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        df = pd.DataFrame({
+            'ds': points['ts'].astype('datetime64[s]'),
+            'y': points['price'],
+        })
+        if daily:
+            df = df.groupby(df['ds'].dt.floor('D'), sort=True)['y'].min().reset_index()
+        elif len(parts) > 1:
+            df = df.sort_values(by='ds', kind='stable').reset_index(drop=True)
+        return df
+
+    # --- Bulk import ---
+
+    def import_jsonl(self, stream, flush_points=200000):
+        """
+        Streams a JSON-lines export of PriceHistory documents
+        ({productName, source, prices: [{price, date}]}) into the store.
+        Points are buffered per series and flushed whenever `flush_points` are pending,
+        so memory stays bounded regardless of the export size. Returns (documents, points).
+        """
+        pending = {}
+        pending_points = 0
+        documents = 0
+        total_points = 0
+
+        def flush():
+            for (product, retailer), (dates, prices) in pending.items():
+                self.append(product, retailer, _to_epoch_seconds(dates), prices)
+            pending.clear()
+
+        for line in stream:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            prices = [p for p in doc.get("prices", []) if p.get("price") is not None and p.get("date") is not None]
+            if not prices or not doc.get("productName") or not doc.get("source"):
+                continue
+
+            dates, values = pending.setdefault((normalize_product_name(doc["productName"]), doc["source"]), ([], []))
+            dates.extend(p["date"] for p in prices)
+            values.extend(p["price"] for p in prices)
+            documents += 1
+            pending_points += len(prices)
+            total_points += len(prices)
+
+            if pending_points >= flush_points:
+                flush()
+                pending_points = 0
+
+        flush()
+        return documents, total_points
+
+    def import_products_jsonl(self, stream):
+        """
+        Records master product ID -> name pairs from a JSON-lines export of Product documents
+        ({masterProductId, name}), so reads by ID find the history stored under the name.
+        Returns the number of new or changed pairs.
+        """
+        known = self._load_ids()
+        entries = []
+        for line in stream:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            product_id, name = doc.get("masterProductId"), doc.get("name")
+            if product_id and name and known.get(str(product_id)) != normalize_product_name(name):
+                entries.append({"id": str(product_id), "product": normalize_product_name(name)})
+        if entries:
+            with self._lock, open(self._ids_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+        return len(entries)
+
+
+_default_store = None
+
+def get_default_history_store():
+    """
+    Returns the store at PRICE_HISTORY_DIR (default ml_service/price_history), or None when
+    no store has been created there yet, in which case callers fall back to simulated data.
+    """
+    global _default_store
+    directory = os.environ.get("PRICE_HISTORY_DIR", DEFAULT_HISTORY_DIR)
+    if not os.path.isdir(directory):
+        return None
+    if _default_store is None or _default_store.directory != directory:
+        _default_store = PriceHistoryStore(directory)
+    return _default_store
+
+
+if __name__ == "__main__":
+    # Usage:
+    #   python price_history_store.py import <price_history.jsonl|-> [--dir DIR]
+    #   python price_history_store.py import-products <products.jsonl|-> [--dir DIR]
+    #   python price_history_store.py show <product name> [retailer] [--dir DIR]
+    args = sys.argv[1:]
+    directory = args[args.index("--dir") + 1] if "--dir" in args else os.environ.get("PRICE_HISTORY_DIR", DEFAULT_HISTORY_DIR)
+    args = [a for i, a in enumerate(args) if a != "--dir" and (i == 0 or args[i - 1] != "--dir")]
+    store = PriceHistoryStore(directory)
+
+    if len(args) >= 2 and args[0] == "import":
+        if args[1] == "-":
+            documents, points = store.import_jsonl(sys.stdin)
+        else:
+            with open(args[1], encoding='utf-8') as f:
+                documents, points = store.import_jsonl(f)
+        print(json.dumps({"status": "success", "documents": documents, "points": points}))
+    elif len(args) >= 2 and args[0] == "import-products":
+        if args[1] == "-":
+            products = store.import_products_jsonl(sys.stdin)
+        else:
+            with open(args[1], encoding='utf-8') as f:
+                products = store.import_products_jsonl(f)
+        print(json.dumps({"status": "success", "products": products}))
+    elif len(args) >= 2 and args[0] == "show":
+        df = store.read_frame(args[1], args[2] if len(args) > 2 else None)
+        print(df.to_string(index=False))
+    else:
+        print(json.dumps({"status": "error", "message": "Usage: price_history_store.py import <file> | import-products <file> | show <product> [retailer] [--dir DIR]"}))
@@ -1,12 +1,68 @@
 # File: ml_service/price_predictor.py
 import sys
+import os
 import json
+import threading
+import socket
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from prophet import Prophet
 import random
 from datetime import datetime, timedelta
+from model_store import get_default_store
+from fast_forecast import forecast_frame, forecast_frames
+from price_history_store import get_default_history_store
 
-def get_historical_data(product_id, current_price):
+# Forecasting backends: 'prophet' (default) or 'numpy' (robust trend + weekly seasonality, see fast_forecast.py)
+ENGINES = ('prophet', 'numpy')
+DEFAULT_ENGINE = os.environ.get("PRICE_FORECAST_ENGINE", "prophet")
+FORECAST_DAYS = 14
+HISTORY_DAYS = 90
+
+# --- LATENCY TIERS ---
+# Each tier trades forecast quality for latency. target_p95_ms is the cold-fit latency (no stored
+# model) the tier is meant to stay under on one core; benchmark_tiers.py measures and checks it.
+#   interactive: page views. MAP fit, weekly seasonality only, 60 days, 200 interval samples.
+#   standard:    API default. MAP fit with the original seasonality setup over 90 days.
+#   thorough:    offline reports. MCMC sampling (2 chains x 300 draws) over 180 days, so the
+#                interval also covers trend and seasonality uncertainty.
+# Every tier predicts only the FORECAST_DAYS future rows, never the history.
+# fit_kwargs go to Prophet.fit (the sampler settings for MCMC).
+TIERS = {
+    'interactive': {'mcmc_samples': 0, 'uncertainty_samples': 200, 'daily_seasonality': False,
+                    'weekly_seasonality': True, 'history_days': 60, 'fit_kwargs': {}, 'target_p95_ms': 500},
+    'standard': {'mcmc_samples': 0, 'uncertainty_samples': 1000, 'daily_seasonality': True,
+                 'weekly_seasonality': True, 'history_days': HISTORY_DAYS, 'fit_kwargs': {}, 'target_p95_ms': 1500},
+    'thorough': {'mcmc_samples': 300, 'uncertainty_samples': 1000, 'daily_seasonality': True,
+                 'weekly_seasonality': True, 'history_days': 180,
+                 'fit_kwargs': {'chains': 2, 'show_progress': False}, 'target_p95_ms': 25000},
+}
+DEFAULT_TIER = os.environ.get("PRICE_FORECAST_TIER", "standard")
+
+def get_tier(tier=None):
+    """Returns (name, settings) of the tier, defaulting to PRICE_FORECAST_TIER."""
+    tier = tier or DEFAULT_TIER
+    if tier not in TIERS:
+        raise ValueError(f"Unknown forecast tier '{tier}'. Use one of: {', '.join(TIERS)}.")
+    return tier, TIERS[tier]
+
+def get_historical_data(product_id, current_price, history_days=HISTORY_DAYS):
+    """
+    Returns the product's last `history_days` days of prices as a Pandas DataFrame with 'ds' and 'y' columns.
+    Reads the local price-history store when it has enough data for the product,
+    otherwise falls back to a simulated history around the current price.
+    """
+    store = get_default_history_store()
+    if store is not None:
+        start = pd.Timestamp.now().normalize() - pd.Timedelta(days=history_days)
+        df = store.read_frame(product_id, start=start)
+        if len(df) >= 10:
+            return df
+
+    return simulate_historical_data(product_id, current_price, history_days)
+
+def simulate_historical_data(product_id, current_price, history_days=HISTORY_DAYS):
     """
     Generates a simulated historical price dataset for a product.
     Returns a Pandas DataFrame with 'ds' and 'y' columns.
@@ -16,24 +72,93 @@ def get_historical_data(product_id, current_price):
     base_price = current_price 
     data = []
     today = datetime.now()
-    for i in range(90): # 90 days of historical data
+    for i in range(history_days): # 90 days of historical data by default
         date = today - timedelta(days=i)
+        day = date.strftime('%Y-%m-%d')
+        # Seed the noise per product and day so a day's simulated price stays the same between
+        # calls (repeated checks then see an unchanged history and can reuse the fitted model)
+        rng = random.Random(f"{product_id}:{day}")
         # Introduce some trend and noise around the current price
         # Simulate a slight upward trend over time (so past prices were lower) or random fluctuation
-        price = base_price * (1 - random.uniform(-0.05, 0.05)) # +/- 5% fluctuation
-        data.append([date.strftime('%Y-%m-%d'), round(price, 2)])
+        price = base_price * (1 - rng.uniform(-0.05, 0.05)) # +/- 5% fluctuation
+        data.append([day, round(price, 2)])
     
     df = pd.DataFrame(data, columns=['ds', 'y'])
     df['ds'] = pd.to_datetime(df['ds'])
     return df.sort_values(by='ds')
 
-def get_price_recommendation(product_id, current_price):
+def build_prophet_model(tier=None):
+    """Creates an unfitted Prophet model with the tier's fitting and seasonality settings."""
+    _, settings = get_tier(tier)
+    return Prophet(
+        daily_seasonality=settings['daily_seasonality'],
+        yearly_seasonality=False,
+        weekly_seasonality=settings['weekly_seasonality'],
+        mcmc_samples=settings['mcmc_samples'],
+        uncertainty_samples=settings['uncertainty_samples'],
+    )
+
+def fit_prophet_model(product_id, df, tier=None):
+    """
+    Returns a Prophet model fitted on `df`, going through the local model store when enabled:
+    an unchanged history reuses the stored model, a few new days warm-start the refit.
+    Models are stored per tier, since each tier fits a differently configured model.
+    """
+    tier, settings = get_tier(tier)
+    store = get_default_store()
+    if store is None:
+        m = build_prophet_model(tier)
+        m.fit(df, **settings['fit_kwargs'])
+        return m
+    return store.get_or_fit(f"{product_id}|{tier}", df, lambda: build_prophet_model(tier), settings['fit_kwargs'])
+
+def forecast_prices(product_id, df, engine=None, tier=None):
+    """
+    Forecasts the next FORECAST_DAYS days of `df` with the chosen engine and tier.
+    Returns a frame of future rows with 'ds', 'yhat', 'yhat_lower' and 'yhat_upper'.
+    """
+    engine = engine or DEFAULT_ENGINE
+    if engine == 'numpy':
+        return forecast_frame(df, horizon=FORECAST_DAYS)
+    if engine != 'prophet':
+        raise ValueError(f"Unknown forecasting engine '{engine}'. Use one of: {', '.join(ENGINES)}.")
+
+    # Implement and train the Prophet model (or reuse the stored one if the history is unchanged)
+    m = fit_prophet_model(product_id, df, tier)
+    # Predict only the next 14 days: predicting the history rows too costs as much again
+    future = m.make_future_dataframe(periods=FORECAST_DAYS, include_history=False)
+    return m.predict(future)
+
+def build_recommendation(current_price, min_predicted_price):
+    """Turns the predicted minimum price into the buy/wait advice returned to the API."""
+    advice = "UNKNOWN"
+    message = ""
+
+    # Decision threshold: Is the current price more than 5% higher than the predicted minimum?
+    if current_price > min_predicted_price * 1.05:
+        advice = "WAIT"
+        potential_saving = round(current_price - min_predicted_price, 2)
+        message = f"The price is likely to drop. You could save approximately ₹{potential_saving} by waiting."
+    else:
+        advice = "BUY NOW"
+        message = "This is a good price. It's not expected to drop significantly in the near future."
+
+    return {
+        "advice": advice,
+        "message": message,
+        "min_predicted_price": min_predicted_price
+    }
+
+def get_price_recommendation(product_id, current_price, engine=None, tier=None):
     """
     Analyzes historical price data and provides a buy/wait recommendation.
+    `engine` selects the forecasting backend ('prophet' or 'numpy'); defaults to PRICE_FORECAST_ENGINE.
+    `tier` selects the latency tier (see TIERS); defaults to PRICE_FORECAST_TIER.
     """
     try:
-        # 1. Get and prepare historical data
-        df = get_historical_data(product_id, current_price)
+        # 1. Get and prepare historical data (the tier decides how far back to look)
+        tier, settings = get_tier(tier)
+        df = get_historical_data(product_id, current_price, settings['history_days'])
         
         if df.empty or len(df) < 10:
             return {
@@ -42,35 +167,14 @@ def get_price_recommendation(product_id, current_price):
                 "min_predicted_price": None
             }
 
-        # 2. Implement and train the Prophet model
-        m = Prophet(daily_seasonality=True, yearly_seasonality=False, weekly_seasonality=True)
-        m.fit(df)
+        # 2. Fit the model and forecast future prices
+        forecast = forecast_prices(product_id, df, engine, tier)
 
-        # 3. Forecast future prices
-        future = m.make_future_dataframe(periods=14) # Predict for the next 14 days
-        forecast = m.predict(future)
-
-        # 4. Actionable Logic: Extract insights from the forecast
+        # 3. Actionable Logic: Extract insights from the forecast
         # Get the minimum predicted price over the forecast period (from the lower bound of the uncertainty interval)
-        min_predicted_price = round(forecast['yhat_lower'].tail(14).min(), 2)
-
-        advice = "UNKNOWN"
-        message = ""
+        min_predicted_price = round(float(forecast['yhat_lower'].min()), 2)
 
-        # Decision threshold: Is the current price more than 5% higher than the predicted minimum?
-        if current_price > min_predicted_price * 1.05:
-            advice = "WAIT"
-            potential_saving = round(current_price - min_predicted_price, 2)
-            message = f"The price is likely to drop. You could save approximately ₹{potential_saving} by waiting."
-        else:
-            advice = "BUY NOW"
-            message = "This is a good price. It's not expected to drop significantly in the near future."
-
-        return {
-            "advice": advice,
-            "message": message,
-            "min_predicted_price": min_predicted_price
-        }
+        return build_recommendation(current_price, min_predicted_price)
 
     except Exception as e:
         return {
@@ -79,17 +183,182 @@ def get_price_recommendation(product_id, current_price):
             "min_predicted_price": None
         }
 
+def get_price_recommendations(requests, engine=None, tier=None):
+    """
+    Recommendations for many (product_id, current_price) pairs, in order. With the numpy
+    engine the histories are forecast together (see fast_forecast.forecast_frames); Prophet
+    fits every product on its own, as get_price_recommendation does.
+    """
+    requests = list(requests)
+    if (engine or DEFAULT_ENGINE) != 'numpy':
+        return [get_price_recommendation(product_id, current_price, engine, tier) for product_id, current_price in requests]
+
+    results = [None] * len(requests)
+    histories = {}
+    try:
+        tier, settings = get_tier(tier)
+        for i, (product_id, current_price) in enumerate(requests):
+            df = get_historical_data(product_id, current_price, settings['history_days'])
+            if df.empty or len(df) < 10:
+                results[i] = {
+                    "advice": "INSUFFICIENT_DATA",
+                    "message": "Not enough historical data to make a reliable prediction.",
+                    "min_predicted_price": None
+                }
+            else:
+                histories[i] = df
+        forecasts = forecast_frames(histories.values(), horizon=FORECAST_DAYS)
+    except Exception:
+        # Let each product fail (or succeed) on its own
+        return [get_price_recommendation(product_id, current_price, engine, tier) for product_id, current_price in requests]
+
+    for i, forecast in zip(histories, forecasts):
+        min_predicted_price = round(float(forecast['yhat_lower'].min()), 2)
+        results[i] = build_recommendation(requests[i][1], min_predicted_price)
+    return results
+
+
+def handle_request(request):
+    """
+    Runs one prediction request (a dict with 'productId', 'currentPrice' and optionally
+    'productName', 'engine' and 'tier').
+    History is looked up by 'productName' when given, else by 'productId' (which the price
+    history store maps to a name, see PriceHistoryStore.import_products_jsonl).
+    The optional 'id' field is echoed back so callers can match responses.
+    """
+    product_id = request.get("productId")
+    current_price = request.get("currentPrice")
+
+    if product_id and current_price is not None:
+        try:
+            product = request.get("productName") or product_id
+            response = get_price_recommendation(product, float(current_price), request.get("engine"), request.get("tier"))
+        except (TypeError, ValueError):
+            response = {"advice": "ERROR", "message": "'currentPrice' must be a number."}
+    else:
+        response = {"advice": "ERROR", "message": "Missing 'productId' or 'currentPrice' in input."}
+
+    if "id" in request:
+        response["id"] = request["id"]
+    return response
+
+def _handle_line(line):
+    """Parses one NDJSON line and returns the JSON-encoded response line."""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+    except ValueError as e:
+        return json.dumps({"advice": "ERROR", "message": f"Invalid JSON request: {str(e)}"})
+    return json.dumps(handle_request(request))
+
+def _serve_lines(lines, write_line, executor, max_pending):
+    """
+    Dispatches every non-empty line to the worker pool and writes each response as soon as it
+    is ready (so responses may come back out of order; use 'id' to match them).
+    At most `max_pending` requests are in flight; reading blocks until a slot frees up.
+    """
+    slots = threading.BoundedSemaphore(max_pending)
+
+    def run(line):
+        try:
+            write_line(_handle_line(line))
+        finally:
+            slots.release()
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        slots.acquire()
+        executor.submit(run, line)
+
+    # Wait for every in-flight request of this stream before returning
+    for _ in range(max_pending):
+        slots.acquire()
+
+def serve_stdio(max_workers=4):
+    """
+    Persistent worker mode: reads newline-delimited JSON requests on stdin and streams one
+    JSON response per line on stdout. Imports and the Stan backend stay warm between calls.
+    """
+    write_lock = threading.Lock()
+
+    def write_line(text):
+        with write_lock:
+            sys.stdout.write(text + "\n")
+            sys.stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        _serve_lines(sys.stdin, write_line, executor, max_workers * 2)
+
+def serve_unix_socket(socket_path, max_workers=4):
+    """
+    Same protocol as serve_stdio, but over a local Unix socket. Every connection can send any
+    number of requests; all connections share one bounded worker pool.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("Unix sockets are not supported on this platform; use stdin mode.")
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    class PredictionHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            write_lock = threading.Lock()
+
+            def write_line(text):
+                with write_lock:
+                    self.wfile.write((text + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+            lines = (raw.decode("utf-8") for raw in self.rfile)
+            _serve_lines(lines, write_line, executor, max_workers * 2)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, PredictionHandler)
+    server.daemon_threads = True
+    try:
+        print(f"Price predictor listening on {socket_path}", file=sys.stderr)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        executor.shutdown(wait=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
 
 if __name__ == "__main__":
-    # This script expects a JSON string with 'productId' and 'currentPrice'
+    # One-shot mode expects a JSON string with 'productId' and 'currentPrice'
     # e.g., python price_predictor.py '{"productId": "some-product-123", "currentPrice": 12000}'
-    input_data = json.loads(sys.argv[1])
-    product_id = input_data.get("productId")
-    current_price = input_data.get("currentPrice")
+    # Worker mode keeps the process alive and reads NDJSON requests:
+    #   python price_predictor.py --serve [--workers 4]
+    #   python price_predictor.py --serve --socket /tmp/price_predictor.sock [--workers 4]
+    # --tier interactive|standard|thorough sets the tier for requests without a 'tier' field.
+    # Options may come before or after the JSON request, e.g.
+    #   python price_predictor.py --tier interactive '{"productId": "some-product-123", "currentPrice": 12000}'
+    args = sys.argv[1:]
+    options = {}
+    positional = []
+    i = 0
+    while i < len(args):
+        if args[i] in ("--tier", "--workers", "--socket") and i + 1 < len(args):
+            options[args[i]] = args[i + 1]
+            i += 2
+        else:
+            positional.append(args[i])
+            i += 1
+    if "--tier" in options:
+        DEFAULT_TIER, _ = get_tier(options["--tier"])
 
-    if product_id and current_price is not None:
-        recommendation = get_price_recommendation(product_id, float(current_price))
-        print(json.dumps(recommendation))
+    if "--serve" in positional:
+        workers = int(options.get("--workers", 4))
+        if "--socket" in options:
+            serve_unix_socket(options["--socket"], max_workers=workers)
+        else:
+            serve_stdio(max_workers=workers)
+    elif positional:
+        print(_handle_line(positional[0]))
     else:
-        error_msg = {"advice": "ERROR", "message": "Missing 'productId' or 'currentPrice' in input."}
-        print(json.dumps(error_msg))
\ No newline at end of file
+        print(json.dumps({"advice": "ERROR", "message": "Usage: price_predictor.py [--tier TIER] '<json request>' | price_predictor.py --serve [--socket PATH] [--workers N] [--tier TIER]"}))
@@ -1,36 +1,512 @@
-import re
-from thefuzz import fuzz
-
-# Pre-compiled regex for efficiency
-PUNCTUATION_REGEX = re.compile(r'[^\w\s]')
-# Common stop words found in product titles
-STOP_WORDS = set([
-    'a', 'an', 'the', 'and', 'or', 'in', 'on', 'for', 'with', 'of', 'at', 
-    'by', 'new', 'latest', 'model', 'gb', 'ram', 'storage'
-])
+import os
+import json
+import math
+import heapq
+from collections import defaultdict
+import numpy as np
+from rapidfuzz import process as rf_process, fuzz as rf_fuzz
+from thefuzz import fuzz, utils as fuzz_utils
+from title_normalizer import clean_text, normalize_title, score_titles, apply_conflict_cap, STOP_WORDS
 
 def clean_title(title):
     """
-    Cleans a product title for fuzzy matching.
+    Cleans a product title for fuzzy matching (see title_normalizer.normalize_title).
     - Converts to lowercase
     - Removes punctuation
-    - Removes common stop words
+    - Removes common stop words and retailer noise
+    - Canonicalizes units and storage/RAM sizes ("256 GB" -> "256gb", "8GB RAM" -> "8gbram")
     """
-    title = title.lower()
-    title = PUNCTUATION_REGEX.sub('', title)
-    title = ' '.join([word for word in title.split() if word not in STOP_WORDS])
-    return title.strip()
+    return clean_text(title)
 
 def match_title_score(title1, title2):
     """
     Calculates a fuzzy matching score between two cleaned product titles
-    using token_set_ratio, which is robust to word order.
+    using token_set_ratio, which is robust to word order. Titles stating different
+    storage or RAM sizes are capped below the matching thresholds.
+    """
+    return score_titles(title1, title2)
+
+def _is_model_number(token):
+    """Model numbers mix letters and digits (e.g. 'wh1000xm5', 's24', 'i7')."""
+    return any(c.isdigit() for c in token) and any(c.isalpha() for c in token)
+
+def _set_ratio_upper_bound(tokens1, tokens2):
+    """
+    Cheap upper bound on the rounded fuzz.token_set_ratio of two token sets, computed from
+    string lengths only: ratio(a, b) can never exceed 200 * min(len) / (len(a) + len(b)).
+    """
+    sect = tokens1 & tokens2
+    diff1 = tokens1 - tokens2
+    diff2 = tokens2 - tokens1
+    return _length_upper_bound(len(sect), sum(len(t) for t in sect), len(diff1), sum(len(t) for t in diff1),
+                               len(diff2), sum(len(t) for t in diff2))
+
+def _length_upper_bound(sect_count, sect_chars, diff1_count, diff1_chars, diff2_count, diff2_chars):
+    """_set_ratio_upper_bound from token counts and character totals of the intersection and both differences."""
+    if sect_count and (not diff1_count or not diff2_count):
+        return 100
+
+    def joined_length(count, chars):
+        return chars + max(count - 1, 0)
+
+    sect_len = joined_length(sect_count, sect_chars)
+    sep = 1 if sect_count else 0
+    len1 = sect_len + sep + joined_length(diff1_count, diff1_chars)
+    len2 = sect_len + sep + joined_length(diff2_count, diff2_chars)
+
+    def bound(a, b):
+        return 200.0 * min(a, b) / (a + b) if a + b else 0.0
+
+    best = max(bound(len1, len2), bound(sect_len, len1) if sect_count else 0.0, bound(sect_len, len2) if sect_count else 0.0)
+    return math.floor(best + 0.5) # thefuzz rounds scores to the nearest integer
+
+
+# Bump whenever clean_title changes, so catalogs saved with the old rules are rebuilt
+CLEAN_TITLE_VERSION = 3
+
+CATALOG_MAGIC = b"MCAT"
+CATALOG_FORMAT_VERSION = 1
+_CATALOG_ALIGN = 64
+
+
+def _pack_strings(strings):
+    """Packs strings into one UTF-8 byte buffer plus an (n + 1) offset table."""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class MasterCatalog:
     """
-    cleaned_title1 = clean_title(title1)
-    cleaned_title2 = clean_title(title2)
-    return fuzz.token_set_ratio(cleaned_title1, cleaned_title2)
+    Compiled master catalog: titles are cleaned and tokenized once and kept in flat,
+    array-backed buffers instead of per-title Python objects.
 
-def find_master_match(scraped_title, master_products_dict, min_score_threshold=90):
+    Layout (every table is a NumPy array, offsets have one extra trailing entry):
+      - ids / titles: UTF-8 byte buffers with offset tables (master IDs and cleaned titles)
+      - tokens: per-title token IDs (int32) with an offset table
+      - vocab: the sorted token strings, so a token's ID is found by binary search
+      - postings: for every token ID, the rows containing it (CSR layout)
+      - id_order: rows sorted by master ID, for binary-search lookups by ID
+
+    save() writes all tables into a single file; load() memory-maps it, so any number of
+    matcher processes share one copy through the OS page cache and startup does no parsing.
+    Rows added after loading live in a small in-memory delta; removals only flip an
+    in-memory flag. Both are folded into the arrays by the next save().
+    """
+
+    def __init__(self):
+        self._tables = {
+            "ids_blob": np.zeros(0, dtype=np.uint8), "ids_offsets": np.zeros(1, dtype=np.int64),
+            "titles_blob": np.zeros(0, dtype=np.uint8), "titles_offsets": np.zeros(1, dtype=np.int64),
+            "token_ids": np.zeros(0, dtype=np.int32), "token_offsets": np.zeros(1, dtype=np.int64),
+            "vocab_blob": np.zeros(0, dtype=np.uint8), "vocab_offsets": np.zeros(1, dtype=np.int64),
+            "postings_rows": np.zeros(0, dtype=np.int32), "postings_offsets": np.zeros(1, dtype=np.int64),
+            "id_order": np.zeros(0, dtype=np.int64),
+        }
+        self._base_rows = 0
+        self._base_alive = None # None means every base row is alive
+        # Rows added since the last load/save
+        self._delta_ids = []
+        self._delta_titles = []
+        self._delta_tokens = []
+        self._delta_alive = []
+        self._delta_postings = defaultdict(list)
+        self._delta_rows_by_id = {}
+        self._alive_count = 0
+        self._lengths = None # (per-vocab-token, per-base-row) character counts, derived on first use
+
+    @classmethod
+    def from_dict(cls, master_products_dict):
+        """Builds a catalog from {master_id: raw title}, keeping the dict's order."""
+        catalog = cls()
+        for master_id, master_title in master_products_dict.items():
+            catalog.add(master_id, master_title)
+        return catalog
+
+    # --- Size and row access ---
+
+    def __len__(self):
+        return self._alive_count
+
+    @property
+    def row_count(self):
+        """Total rows including removed ones; row numbers are stable until the next save()."""
+        return self._base_rows + len(self._delta_ids)
+
+    def __contains__(self, master_id):
+        return self._find_row(master_id) is not None
+
+    def is_alive(self, row):
+        if row >= self._base_rows:
+            return self._delta_alive[row - self._base_rows]
+        return self._base_alive is None or bool(self._base_alive[row])
+
+    def _blob_string(self, blob, offsets, i):
+        return blob[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8')
+
+    def master_id(self, row):
+        if row >= self._base_rows:
+            return self._delta_ids[row - self._base_rows]
+        return self._blob_string(self._tables["ids_blob"], self._tables["ids_offsets"], row)
+
+    def cleaned_title(self, row):
+        if row >= self._base_rows:
+            return self._delta_titles[row - self._base_rows]
+        return self._blob_string(self._tables["titles_blob"], self._tables["titles_offsets"], row)
+
+    def tokens(self, row):
+        """The row's distinct cleaned tokens, in title order."""
+        if row >= self._base_rows:
+            return self._delta_tokens[row - self._base_rows]
+        t = self._tables
+        ids = t["token_ids"][t["token_offsets"][row]:t["token_offsets"][row + 1]]
+        return [self._blob_string(t["vocab_blob"], t["vocab_offsets"], i) for i in ids]
+
+    def rows(self):
+        """Alive row numbers in catalog order."""
+        return [row for row in range(self.row_count) if self.is_alive(row)]
+
+    def items(self):
+        """Yields (master_id, cleaned title) for every alive row, like dict.items()."""
+        for row in self.rows():
+            yield self.master_id(row), self.cleaned_title(row)
+
+    def cleaned_titles(self):
+        return [self.cleaned_title(row) for row in self.rows()]
+
+    # --- Token lengths ---
+
+    def _length_tables(self):
+        """
+        Character length of every vocab token, and the total token characters of every base
+        row, computed once from the byte tables (UTF-8 continuation bytes do not count).
+        """
+        if self._lengths is None:
+            t = self._tables
+            starts = (t["vocab_blob"] & 0xC0) != 0x80
+            chars = np.zeros(len(starts) + 1, dtype=np.int64)
+            np.cumsum(starts, out=chars[1:])
+            vocab_lengths = np.diff(chars[t["vocab_offsets"]])
+            row_chars = np.zeros(len(t["token_ids"]) + 1, dtype=np.int64)
+            np.cumsum(vocab_lengths[t["token_ids"]], out=row_chars[1:])
+            self._lengths = (vocab_lengths, np.diff(row_chars[t["token_offsets"]]))
+        return self._lengths
+
+    def upper_bounds(self, query_tokens, rows):
+        """
+        _set_ratio_upper_bound of the query token set against each row's tokens. Base rows are
+        bounded from token IDs and precomputed lengths, without decoding any strings.
+        """
+        query_tokens = frozenset(query_tokens)
+        query_chars = sum(len(token) for token in query_tokens)
+        rows = np.asarray(rows, dtype=np.int64)
+        bounds = np.zeros(len(rows), dtype=np.int64)
+
+        base = rows < self._base_rows
+        if base.any():
+            t = self._tables
+            vocab_lengths, row_chars = self._length_tables()
+            base_rows = rows[base]
+            starts = t["token_offsets"][base_rows]
+            counts = t["token_offsets"][base_rows + 1] - starts
+            # Every token ID of every row, flattened, with the position of its row
+            segment = np.repeat(np.arange(len(base_rows)), counts)
+            positions = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+            token_ids = t["token_ids"][positions]
+            query_ids = [i for i in (self._vocab_id(token) for token in query_tokens) if i is not None]
+            shared = np.isin(token_ids, query_ids)
+            sect_count = np.bincount(segment, weights=shared, minlength=len(base_rows)).astype(np.int64)
+            sect_chars = np.bincount(segment, weights=shared * vocab_lengths[token_ids], minlength=len(base_rows)).astype(np.int64)
+            bounds[base] = [
+                _length_upper_bound(sc, sch, len(query_tokens) - sc, query_chars - sch, n - sc, rc - sch)
+                for sc, sch, n, rc in zip(sect_count.tolist(), sect_chars.tolist(), counts.tolist(), row_chars[base_rows].tolist())
+            ]
+        for i in np.flatnonzero(~base).tolist():
+            bounds[i] = _set_ratio_upper_bound(query_tokens, frozenset(self.tokens(int(rows[i]))))
+        return bounds.tolist()
+
+    # --- Lookups ---
+
+    def _bisect_blob(self, blob, offsets, order, key):
+        """Binary search for `key` (bytes) among blob strings sorted by `order` (None = already sorted)."""
+        lo, hi = 0, len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = mid if order is None else order[mid]
+            value = blob[offsets[i]:offsets[i + 1]].tobytes()
+            if value < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(offsets) - 1:
+            i = lo if order is None else order[lo]
+            if blob[offsets[i]:offsets[i + 1]].tobytes() == key:
+                return int(i)
+        return None
+
+    def _vocab_id(self, token):
+        t = self._tables
+        return self._bisect_blob(t["vocab_blob"], t["vocab_offsets"], None, token.encode('utf-8'))
+
+    def _find_row(self, master_id):
+        row = self._delta_rows_by_id.get(master_id)
+        if row is not None:
+            return row
+        t = self._tables
+        row = self._bisect_blob(t["ids_blob"], t["ids_offsets"], t["id_order"], str(master_id).encode('utf-8'))
+        if row is not None and self.is_alive(row):
+            return row
+        return None
+
+    def posting_rows(self, token):
+        """Alive rows whose cleaned title contains `token`, ascending, as an int64 array."""
+        rows = np.zeros(0, dtype=np.int64)
+        vocab_id = self._vocab_id(token)
+        if vocab_id is not None:
+            t = self._tables
+            rows = t["postings_rows"][t["postings_offsets"][vocab_id]:t["postings_offsets"][vocab_id + 1]].astype(np.int64)
+            if self._base_alive is not None:
+                rows = rows[self._base_alive[rows].astype(bool)]
+        delta_rows = [row for row in self._delta_postings.get(token, ()) if self.is_alive(row)]
+        if delta_rows:
+            rows = np.concatenate([rows, np.array(delta_rows, dtype=np.int64)])
+        return rows
+
+    # --- Updates ---
+
+    def add(self, master_id, master_title):
+        """Adds a master product (replacing any existing entry with the same ID)."""
+        self.remove(master_id)
+        cleaned = clean_title(master_title)
+        row = self.row_count
+        tokens = list(dict.fromkeys(cleaned.split()))
+        self._delta_ids.append(master_id)
+        self._delta_titles.append(cleaned)
+        self._delta_tokens.append(tokens)
+        self._delta_alive.append(True)
+        self._delta_rows_by_id[master_id] = row
+        for token in tokens:
+            self._delta_postings[token].append(row)
+        self._alive_count += 1
+        return row
+
+    def remove(self, master_id):
+        """Removes a master product; returns True if it was present."""
+        row = self._find_row(master_id)
+        if row is None:
+            return False
+        if row >= self._base_rows:
+            self._delta_alive[row - self._base_rows] = False
+            del self._delta_rows_by_id[master_id]
+        else:
+            if self._base_alive is None:
+                self._base_alive = np.ones(self._base_rows, dtype=np.uint8)
+            self._base_alive[row] = 0
+        self._alive_count -= 1
+        return True
+
+    # --- Persistence ---
+
+    def _compiled_tables(self):
+        """Folds the delta and removals into fresh, compact tables."""
+        rows = self.rows()
+        ids = [str(self.master_id(row)) for row in rows]
+        titles = [self.cleaned_title(row) for row in rows]
+        row_tokens = [self.tokens(row) for row in rows]
+
+        vocab = sorted({token for tokens in row_tokens for token in tokens}, key=lambda s: s.encode('utf-8'))
+        vocab_ids = {token: i for i, token in enumerate(vocab)}
+        token_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(tokens) for tokens in row_tokens], out=token_offsets[1:])
+        token_ids = np.fromiter((vocab_ids[token] for tokens in row_tokens for token in tokens),
+                                dtype=np.int32, count=int(token_offsets[-1]))
+
+        # CSR postings: stable sort of (token id) over every token occurrence keeps rows ascending
+        row_of_token = np.repeat(np.arange(len(rows), dtype=np.int32), np.diff(token_offsets))
+        order = np.argsort(token_ids, kind='stable')
+        postings_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(token_ids, minlength=len(vocab)), out=postings_offsets[1:])
+
+        ids_blob, ids_offsets = _pack_strings(ids)
+        titles_blob, titles_offsets = _pack_strings(titles)
+        vocab_blob, vocab_offsets = _pack_strings(vocab)
+        id_order = np.array(sorted(range(len(ids)), key=lambda i: ids[i].encode('utf-8')), dtype=np.int64)
+
+        return {
+            "ids_blob": ids_blob, "ids_offsets": ids_offsets,
+            "titles_blob": titles_blob, "titles_offsets": titles_offsets,
+            "token_ids": token_ids, "token_offsets": token_offsets,
+            "vocab_blob": vocab_blob, "vocab_offsets": vocab_offsets,
+            "postings_rows": row_of_token[order], "postings_offsets": postings_offsets,
+            "id_order": id_order,
+        }
+
+    def save(self, path):
+        """
+        Writes the catalog to `path` atomically. Processes that already mapped the old file
+        keep reading it until they reload.
+        """
+        tables = self._compiled_tables()
+
+        layout = {}
+        position = 0
+        for name, array in tables.items():
+            layout[name] = {"dtype": array.dtype.str, "length": int(array.shape[0]), "offset": position}
+            position += array.nbytes
+            position += -position % _CATALOG_ALIGN
+        header = json.dumps({
+            "format": CATALOG_FORMAT_VERSION,
+            "clean_title_version": CLEAN_TITLE_VERSION,
+            "rows": int(tables["ids_offsets"].shape[0] - 1),
+            "tables": layout,
+        }).encode('utf-8')
+        data_start = len(CATALOG_MAGIC) + 8 + len(header)
+        data_start += -data_start % _CATALOG_ALIGN
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(CATALOG_MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for name, array in tables.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a catalog written by save(). Only the header is read eagerly."""
+        with open(path, 'rb') as f:
+            if f.read(len(CATALOG_MAGIC)) != CATALOG_MAGIC:
+                raise ValueError(f"{path} is not a master catalog file.")
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_length))
+
+        if header["format"] != CATALOG_FORMAT_VERSION or header["clean_title_version"] != CLEAN_TITLE_VERSION:
+            raise ValueError(f"{path} was built with different cleaning rules or format; rebuild it.")
+
+        data_start = len(CATALOG_MAGIC) + 8 + header_length
+        data_start += -data_start % _CATALOG_ALIGN
+        catalog = cls()
+        for name, spec in header["tables"].items():
+            if spec["length"] == 0:
+                catalog._tables[name] = np.zeros(0, dtype=spec["dtype"])
+                continue
+            catalog._tables[name] = np.memmap(path, dtype=spec["dtype"], mode='r',
+                                              offset=data_start + spec["offset"], shape=(spec["length"],))
+        catalog._base_rows = header["rows"]
+        catalog._alive_count = header["rows"]
+        return catalog
+
+
+class MasterIndex:
+    """
+    Inverted index over cleaned master titles, used to prune the candidates that
+    find_master_match has to score. It reads the postings of a MasterCatalog (built on the
+    fly when given a plain dict), so a memory-mapped catalog needs no index build.
+
+    Candidates are the masters sharing at least one (not overly common) token with the
+    scraped title, ranked by IDF-weighted overlap with extra weight for model numbers and
+    the brand (first token). Only the top `max_candidates` are scored, strongest
+    length-based upper bound first, and scoring stops once no remaining candidate can beat
+    the best score found.
+
+    Tolerance vs the exhaustive scan: masters that share no token with the scraped title
+    (or only tokens present in more than `common_token_ratio` of the catalog, when rarer
+    tokens also match) are never scored, and neither are candidates beyond `max_candidates`.
+    Such masters could only win through character-level similarity between different
+    words. Within the scored candidates the result (best ID, score and tie-break order) is
+    identical to the exhaustive scan.
+    """
+
+    def __init__(self, master_products=None, max_candidates=200, common_token_ratio=0.2):
+        self.max_candidates = max_candidates
+        self.common_token_ratio = common_token_ratio
+        if isinstance(master_products, MasterCatalog):
+            self.catalog = master_products
+        else:
+            self.catalog = MasterCatalog.from_dict(master_products or {})
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def add(self, master_id, master_title):
+        self.catalog.add(master_id, master_title)
+
+    def remove(self, master_id):
+        return self.catalog.remove(master_id)
+
+    def candidates(self, cleaned_title):
+        """Returns candidate rows for a cleaned title, best-overlap first."""
+        tokens = cleaned_title.split()
+        if not tokens:
+            return []
+
+        n = max(len(self.catalog), 1)
+        common_df = max(1, int(n * self.common_token_ratio))
+        postings = {token: self.catalog.posting_rows(token) for token in set(tokens)}
+        query_tokens = sorted(postings, key=lambda t: len(postings[t]))
+
+        matched_rows = []
+        row_weights = []
+        for token in query_tokens:
+            rows = postings[token]
+            if not len(rows):
+                continue
+            # Very common tokens ("apple", "laptop") add little signal but a lot of work;
+            # only use them when nothing rarer matched
+            if len(rows) > common_df and matched_rows:
+                continue
+            weight = math.log(1 + n / len(rows))
+            if _is_model_number(token):
+                weight *= 2
+            if token == tokens[0]:
+                weight += 1.0 # Brand key: titles usually start with the brand
+            matched_rows.append(rows)
+            row_weights.append(np.full(len(rows), weight))
+
+        if not matched_rows:
+            return []
+
+        # Sum the weights per row with NumPy instead of a per-posting Python loop
+        rows, inverse = np.unique(np.concatenate(matched_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(row_weights))
+        if len(rows) > self.max_candidates:
+            top = np.argpartition(-scores, self.max_candidates - 1)[:self.max_candidates]
+            rows, scores = rows[top], scores[top]
+        return rows[np.argsort(-scores, kind='stable')].tolist()
+
+    def find(self, scraped_title, min_score_threshold=90):
+        """Same contract as find_master_match, scoring only the pruned candidate set."""
+        normalized = normalize_title(scraped_title)
+        cleaned = normalized.text
+        query_tokens = frozenset(normalized.tokens)
+
+        rows = self.candidates(cleaned)
+        bounded = list(zip(self.catalog.upper_bounds(query_tokens, rows), rows))
+        bounded.sort(key=lambda item: (-item[0], item[1]))
+
+        best_row = None
+        highest_score = 0
+        for upper_bound, row in bounded:
+            if upper_bound < highest_score:
+                break # Sorted by bound: nothing left can beat the current best
+            if upper_bound == highest_score and best_row is not None and row > best_row:
+                continue # Could at best tie, and ties go to the earlier master
+            score = fuzz.token_set_ratio(cleaned, self.catalog.cleaned_title(row))
+            score = apply_conflict_cap(score, normalized.tokens, self.catalog.tokens(row))
+            # Ties go to the earlier master, like the insertion-ordered exhaustive scan
+            if score > highest_score or (score == highest_score and best_row is not None and row < best_row):
+                highest_score = score
+                best_row = row
+
+        if best_row is not None and highest_score >= min_score_threshold:
+            return (self.catalog.master_id(best_row), highest_score)
+        return (None, 0)
+
+
+def find_master_match(scraped_title, master_products_dict, min_score_threshold=90, index=None):
     """
     Finds the best matching master product for a scraped title.
 
@@ -39,11 +515,16 @@ def find_master_match(scraped_title, master_products_dict, min_score_threshold=9
         master_products_dict (dict): A dictionary of master products where keys are
                                      Master Product IDs and values are their titles.
         min_score_threshold (int): The minimum score to be considered a match.
+        index (MasterIndex): Optional index built from master_products_dict. When given,
+                             only the index's candidate set is scored (see MasterIndex).
 
     Returns:
         A tuple containing (master_product_id, confidence_score) if a match is found,
         otherwise (None, 0).
     """
+    if index is not None:
+        return index.find(scraped_title, min_score_threshold)
+
     best_match_id = None
     highest_score = 0
 
@@ -58,6 +539,89 @@ def find_master_match(scraped_title, master_products_dict, min_score_threshold=9
     else:
         return (None, 0)
 
+def _catalog_arrays(catalog):
+    """Returns (master_ids, cleaned_titles) for a dict of raw titles, a MasterCatalog or a MasterIndex."""
+    if isinstance(catalog, MasterIndex):
+        catalog = catalog.catalog
+    if isinstance(catalog, MasterCatalog):
+        rows = catalog.rows()
+        return [catalog.master_id(row) for row in rows], [catalog.cleaned_title(row) for row in rows]
+    return list(catalog.keys()), [clean_title(title) for title in catalog.values()]
+
+def _cap_conflicts(row_scores, cols, query_tokens, cleaned_masters):
+    """Applies the storage/RAM conflict cap to row_scores[cols] in place; True if any score dropped."""
+    capped = False
+    for col in cols:
+        score = apply_conflict_cap(int(row_scores[col]), query_tokens, cleaned_masters[col].split())
+        if score < row_scores[col]:
+            row_scores[col] = score
+            capped = True
+    return capped
+
+def match_many(scraped_titles, catalog, top_k=1, threshold=90, workers=-1, max_cells=64 * 1024 * 1024):
+    """
+    Matches many scraped titles against a catalog in one go.
+
+    The full score matrix is computed by rapidfuzz's native cdist with token_set_ratio,
+    split across `workers` cores (-1 = all), in row chunks of at most `max_cells` scores so
+    memory stays bounded for large catalogs. Scores are identical to match_title_score.
+
+    Args:
+        scraped_titles (list): Raw scraped titles.
+        catalog (dict | MasterCatalog | MasterIndex): Master products (ID -> raw title), or a
+                                      compiled catalog/index whose cleaned titles are reused.
+        top_k (int): Number of matches to return per scraped title.
+        threshold (int): Minimum score to count as a match.
+
+    Returns:
+        A tuple of NumPy arrays, each of shape (len(scraped_titles), top_k), best match first:
+        (master_ids, scores, indices). Slots without a match at or above the threshold hold
+        None / 0 / -1. Equal scores are ordered by catalog position, like find_master_match.
+    """
+    master_ids, cleaned_masters = _catalog_arrays(catalog)
+    # thefuzz applies full_process to both sides of every comparison; do it once here instead
+    choices = [fuzz_utils.full_process(title) for title in cleaned_masters]
+    normalized_queries = [normalize_title(title) for title in scraped_titles]
+    queries = [fuzz_utils.full_process(normalized.text) for normalized in normalized_queries]
+
+    n_queries = len(queries)
+    indices = np.full((n_queries, top_k), -1, dtype=np.int64)
+    scores = np.zeros((n_queries, top_k), dtype=np.int16)
+    k = min(top_k, len(choices))
+    min_score = max(threshold, 1) # A zero score is never a match, as in find_master_match
+
+    rows_per_chunk = max(1, max_cells // max(len(choices), 1))
+    for start in range(0, n_queries if k else 0, rows_per_chunk):
+        chunk = queries[start:start + rows_per_chunk]
+        # The cutoff applies before rounding, so let through scores that round up to the threshold
+        matrix = rf_process.cdist(chunk, choices, scorer=rf_fuzz.token_set_ratio,
+                                  score_cutoff=max(threshold - 0.5, 0), dtype=np.float32, workers=workers)
+        matrix = np.rint(matrix).astype(np.int16) # thefuzz rounds scores to integers
+        kth_scores = np.partition(matrix, -k, axis=1)[:, -k]
+
+        for row in range(len(chunk)):
+            # Every column scoring at least the k-th best, then (score desc, catalog position asc)
+            # so ties come out in catalog order
+            cols = np.flatnonzero(matrix[row] >= max(kth_scores[row], min_score))
+            query_tokens = normalized_queries[start + row].tokens
+            if _cap_conflicts(matrix[row], cols, query_tokens, cleaned_masters):
+                # A capped score may have been in the top k: re-rank among every column that passed
+                cols = np.flatnonzero(matrix[row] >= min_score)
+                _cap_conflicts(matrix[row], cols, query_tokens, cleaned_masters)
+                cols = cols[matrix[row, cols] >= min_score]
+            row_scores = matrix[row, cols]
+            order = np.lexsort((cols, -row_scores))[:k]
+            indices[start + row, :len(order)] = cols[order]
+            scores[start + row, :len(order)] = row_scores[order]
+
+    match_ids = np.full(indices.shape, None, dtype=object)
+    matched = indices >= 0
+    if matched.any():
+        ids_array = np.empty(len(master_ids), dtype=object)
+        ids_array[:] = master_ids
+        match_ids[matched] = ids_array[indices[matched]]
+    return match_ids, scores, indices
+
 # --- Example Usage ---
 if __name__ == '__main__':
     # Simulate a master product database
@@ -0,0 +1,369 @@
+import sys
+import os
+import json
+import math
+import time
+import heapq
+import random
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from fast_forecast import forecast_many, DEFAULT_INTERVAL_WIDTH
+from price_history_store import PriceHistoryStore, DEFAULT_HISTORY_DIR
+
+# --- REFRESH CONFIGURATION ---
+# A (product, retailer) pair's refresh priority is volatility x staleness x demand: the price move
+# we expect to have missed since its last scrape, weighted by how many users look at it. The pair
+# is due when that reaches CHANGE_THRESHOLD_PCT, i.e. a pair with a daily volatility of v% (from
+# its forecast interval) is due every CHANGE_THRESHOLD_PCT / v days, sooner for popular products,
+# and always within [MIN_INTERVAL_HOURS, MAX_INTERVAL_HOURS] so no pair is scraped too often or
+# starved.
+SCRAPES_PER_HOUR = int(os.environ.get("REFRESH_SCRAPES_PER_HOUR", "600"))
+CHANGE_THRESHOLD_PCT = 1.0
+MIN_INTERVAL_HOURS = 1.0
+MAX_INTERVAL_HOURS = 24.0
+DEMAND_WEIGHT = 0.5 # interval / (1 + DEMAND_WEIGHT * log1p(views per day))
+DEFAULT_VOLATILITY_PCT = 2.0 # Pairs without enough history count as volatile until we know better
+VOLATILITY_HISTORY_DAYS = 30
+MIN_HISTORY_DAYS = 10
+HOUR = 3600
+
+
+def band_volatility(yhat, yhat_lower, yhat_upper, interval_width=DEFAULT_INTERVAL_WIDTH):
+    """
+    Daily price volatility in percent implied by a forecast interval: the mean relative width of
+    the band divided by the width of the same interval of a standard normal. Accepts arrays of
+    shape [horizon] or [n_series, horizon] (Prophet frame columns work too).
+    """
+    yhat = np.asarray(yhat, dtype=float)
+    width = (np.asarray(yhat_upper, dtype=float) - np.asarray(yhat_lower, dtype=float)) / np.maximum(np.abs(yhat), 1e-9)
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    return np.mean(width, axis=-1) / (2 * z) * 100
+
+def refresh_interval_hours(volatility_pct, demand=0.0, threshold_pct=CHANGE_THRESHOLD_PCT):
+    """Hours between scrapes of a pair with the given daily volatility and demand (views per day)."""
+    if volatility_pct is None or not np.isfinite(volatility_pct):
+        volatility_pct = DEFAULT_VOLATILITY_PCT
+    hours = 24.0 * threshold_pct / max(volatility_pct, 1e-6)
+    hours /= 1 + DEMAND_WEIGHT * math.log1p(max(demand, 0.0))
+    return min(max(hours, MIN_INTERVAL_HOURS), MAX_INTERVAL_HOURS)
+
+def estimate_volatility(series, start_ts, end_ts, history_days=VOLATILITY_HISTORY_DAYS):
+    """
+    Volatility of many price series at once, from a batched NumPy forecast of their last
+    `history_days` days. `series` is a list of (timestamps, prices) arrays; days without an
+    observation carry the last seen price forward. Returns an array with NaN for series that
+    have fewer than MIN_HISTORY_DAYS days.
+    """
+    n_days = history_days
+    grid_start = end_ts - n_days * 86400
+    Y = np.full((len(series), n_days), np.nan)
+    for i, (ts, prices) in enumerate(series):
+        ts = np.asarray(ts)
+        keep = (ts >= max(start_ts, grid_start)) & (ts < end_ts)
+        if not keep.any():
+            continue
+        days = ((ts[keep] - grid_start) // 86400).astype(int)
+        row = Y[i]
+        for day, price in zip(days, np.asarray(prices)[keep]):
+            row[day] = price if np.isnan(row[day]) else min(row[day], price) # Lowest price of the day
+        observed = ~np.isnan(row)
+        first = int(np.argmax(observed))
+        filled = np.maximum.accumulate(np.where(observed, np.arange(n_days), 0))
+        row[first:] = row[filled[first:]]
+
+    volatility = np.full(len(series), np.nan)
+    enough = (~np.isnan(Y)).sum(axis=1) >= MIN_HISTORY_DAYS
+    if enough.any():
+        forecast = forecast_many(Y[enough], pd.Timestamp(grid_start, unit='s'), horizon=14)
+        volatility[enough] = band_volatility(forecast['yhat'], forecast['yhat_lower'], forecast['yhat_upper'])
+    return volatility
+
+
+class RefreshScheduler:
+    """
+    Decides which (product, retailer) pairs to re-scrape next.
+
+    Every pair sits in a min-heap keyed by the time it becomes due (see refresh_interval_hours).
+    Unlike a priority recomputed from "staleness so far", the due time does not change as the
+    clock moves, so the heap never needs rebuilding: next_jobs() pops the earliest due pairs,
+    and an updated volatility or demand re-pushes the pair (older heap entries are skipped).
+    """
+
+    def __init__(self, scrapes_per_hour=SCRAPES_PER_HOUR, threshold_pct=CHANGE_THRESHOLD_PCT):
+        self.scrapes_per_hour = scrapes_per_hour
+        self.threshold_pct = threshold_pct
+        self._items = {} # (product, retailer) -> {volatility, demand, last_scraped, due, version, master_title}
+        self._heap = [] # (due, version, key)
+
+    def __len__(self):
+        return len(self._items)
+
+    def _push(self, key):
+        item = self._items[key]
+        item["version"] += 1
+        interval = refresh_interval_hours(item["volatility"], item["demand"], self.threshold_pct)
+        item["due"] = item["last_scraped"] + interval * HOUR
+        heapq.heappush(self._heap, (item["due"], item["version"], key))
+
+    def add(self, product, retailer, last_scraped, volatility_pct=None, demand=0.0, master_title=None):
+        """Tracks a pair. `last_scraped` is epoch seconds; a missing volatility counts as DEFAULT_VOLATILITY_PCT."""
+        key = (product, retailer)
+        self._items[key] = {"volatility": volatility_pct, "demand": demand, "last_scraped": last_scraped,
+                            "due": None, "version": 0, "master_title": master_title}
+        self._push(key)
+
+    def update(self, product, retailer, volatility_pct=None, demand=None):
+        """Applies a new forecast volatility and/or demand to a tracked pair."""
+        item = self._items[(product, retailer)]
+        if volatility_pct is not None and np.isfinite(volatility_pct):
+            item["volatility"] = volatility_pct
+        if demand is not None:
+            item["demand"] = demand
+        self._push((product, retailer))
+
+    def mark_scraped(self, product, retailer, at):
+        self._items[(product, retailer)]["last_scraped"] = at
+        self._push((product, retailer))
+
+    def overdue(self, now):
+        return sum(item["due"] <= now for item in self._items.values())
+
+    def next_jobs(self, now, limit=None, fill=False):
+        """
+        Pops up to `limit` pairs (default: one hour of budget) that are due by `now`, earliest
+        first, and schedules each one's next refresh as if it were scraped at `now`. With
+        `fill=True` the rest of the budget goes to the pairs due soonest after `now`. Returns
+        scrape jobs in the shape `scraper.py --batch` reads ({query, retailer, master_title}),
+        plus the tracked `product` key.
+        """
+        limit = self.scrapes_per_hour if limit is None else limit
+        jobs = []
+        while self._heap and len(jobs) < limit:
+            due, version, key = self._heap[0]
+            item = self._items.get(key)
+            if item is None or version != item["version"]:
+                heapq.heappop(self._heap) # Superseded by a later update
+                continue
+            if due > now and not fill:
+                break
+            heapq.heappop(self._heap)
+            product, retailer = key
+            jobs.append({"query": item["master_title"] or product, "retailer": retailer, "product": product,
+                         "master_title": item["master_title"], "overdue_hours": round((now - due) / HOUR, 2)})
+            self.mark_scraped(product, retailer, now)
+        return jobs
+
+def scheduler_from_history(store, now, scrapes_per_hour=SCRAPES_PER_HOUR, demand=None):
+    """
+    Builds a scheduler for every series in a PriceHistoryStore: the last point of a series is its
+    last scrape, and its volatility comes from estimate_volatility. `demand` maps product names
+    (or (product, retailer)) to views per day.
+    """
+    demand = demand or {}
+    keys, series = [], []
+    for product in store.products():
+        for retailer in store.retailers(product):
+            points = store.read(product, retailer)
+            if len(points):
+                keys.append((product, retailer))
+                series.append((points['ts'], points['price']))
+
+    volatility = estimate_volatility(series, 0, now) if series else []
+    scheduler = RefreshScheduler(scrapes_per_hour)
+    for (product, retailer), (ts, _), vol in zip(keys, series, volatility):
+        views = demand.get((product, retailer), demand.get(product, 0.0))
+        scheduler.add(product, retailer, int(ts[-1]), None if np.isnan(vol) else float(vol), views)
+    return scheduler
+
+
+# --- Simulation ---
+
+def synthetic_histories(n_products, days, seed=5):
+    """
+    Step-function price histories like the ones retailers produce: most products change price
+    every few weeks, some every few days, a few several times a day (flash sales). Returns
+    ({key: (timestamps, prices)}, {key: views per day}, start_ts).
+    """
+    rng = random.Random(seed)
+    start = 1_700_000_000 - 1_700_000_000 % 86400
+    end = start + days * 86400
+    regimes = [(0.6, 1 / 20, 0.02), (0.3, 1 / 3, 0.05), (0.1, 3.0, 0.08)] # (share, changes per day, typical size)
+    histories, demand = {}, {}
+    for i in range(n_products):
+        share, rate, size = rng.choices(regimes, weights=[r[0] for r in regimes])[0]
+        base = price = round(rng.uniform(500, 150000))
+        ts, prices = [start], [price]
+        t = start
+        while True:
+            t += rng.expovariate(rate / 86400)
+            if t >= end:
+                break
+            # Mean-reverting steps: sales come and go around the list price
+            price = round(max(base * 0.5, price * (1 + rng.gauss(0, size)) * 0.8 + base * 0.2))
+            if price != prices[-1]:
+                ts.append(int(t))
+                prices.append(price)
+        key = (f"product-{i:05d}", rng.choice(["Amazon.in", "Flipkart"]))
+        histories[key] = (np.array(ts, dtype=np.int64), np.array(prices, dtype=float))
+        demand[key] = rng.paretovariate(1.2) - 1 # Few products get most of the views
+    return histories, demand, start
+
+def recorded_histories(store):
+    """Every series of a PriceHistoryStore as {(product, retailer): (timestamps, prices)} plus its start."""
+    histories = {}
+    for product in store.products():
+        for retailer in store.retailers(product):
+            points = store.read(product, retailer)
+            if len(points) > 1:
+                histories[(product, retailer)] = (np.array(points['ts']), np.array(points['price']))
+    start = min(int(ts[0]) for ts, _ in histories.values()) if histories else 0
+    return histories, {}, start
+
+def simulate(histories, demand, start_ts, end_ts, scrapes_per_hour, policy="volatility", warmup_days=VOLATILITY_HISTORY_DAYS):
+    """
+    Replays recorded price histories hour by hour with a fixed scrape budget. Each scrape sees
+    the true price at that moment; a change counts as detected when the next scrape after it
+    shows a different price from the previous scrape. Returns detection counts and delays,
+    plus the share of (pair, hour) samples in which the last scraped price was wrong.
+
+    policy: "volatility" (RefreshScheduler, volatility re-estimated daily from the prices
+    observed so far) or "round_robin" (every pair in turn, the current behaviour).
+    The first `warmup_days` of every history are treated as already known.
+    """
+    keys = list(histories)
+    sim_start = start_ts + warmup_days * 86400
+    observed = {key: ([], []) for key in keys} # What the scraper has seen: (timestamps, prices)
+    last_seen = {}
+    for key in keys:
+        ts, prices = histories[key]
+        known = ts < sim_start
+        observed[key][0].extend(ts[known].tolist())
+        observed[key][1].extend(prices[known].tolist())
+        last_seen[key] = (sim_start, prices[known][-1] if known.any() else None)
+
+    def true_price(key, t):
+        ts, prices = histories[key]
+        i = np.searchsorted(ts, t, side='right') - 1
+        return prices[i] if i >= 0 else None
+
+    def refresh_volatility(scheduler, now):
+        vol = estimate_volatility([(np.array(observed[k][0]), np.array(observed[k][1])) for k in keys], start_ts, now)
+        for key, v in zip(keys, vol):
+            scheduler.update(key[0], key[1], None if np.isnan(v) else float(v))
+
+    scheduler = None
+    if policy == "volatility":
+        scheduler = RefreshScheduler(scrapes_per_hour)
+        for key in keys:
+            scheduler.add(key[0], key[1], sim_start, None, demand.get(key, 0.0))
+        refresh_volatility(scheduler, sim_start)
+    elif policy != "round_robin":
+        raise ValueError(f"Unknown policy '{policy}'. Use 'volatility' or 'round_robin'.")
+
+    delays, weighted_delays, weights = [], 0.0, 0.0
+    stale, weighted_stale, samples, weighted_samples = 0, 0.0, 0, 0.0
+    scrapes = 0
+    cursor = 0
+    for now in range(sim_start, end_ts, HOUR):
+        if scheduler is not None:
+            if (now - sim_start) % 86400 == 0 and now > sim_start:
+                refresh_volatility(scheduler, now)
+            batch = [(job["product"], job["retailer"]) for job in scheduler.next_jobs(now)]
+        else:
+            batch = [keys[(cursor + i) % len(keys)] for i in range(min(scrapes_per_hour, len(keys)))]
+            cursor = (cursor + len(batch)) % len(keys)
+
+        for key in batch:
+            scrapes += 1
+            price = true_price(key, now)
+            previous_at, previous_price = last_seen[key]
+            if price != previous_price:
+                ts, _ = histories[key]
+                changed_at = ts[np.searchsorted(ts, now, side='right') - 1] # Latest change before this scrape
+                delay_hours = (now - max(changed_at, previous_at)) / HOUR
+                delays.append(delay_hours)
+                weight = 1 + demand.get(key, 0.0)
+                weighted_delays += weight * delay_hours
+                weights += weight
+            last_seen[key] = (now, price)
+            observed[key][0].append(now)
+            observed[key][1].append(price)
+
+        for key in keys:
+            weight = 1 + demand.get(key, 0.0)
+            wrong = last_seen[key][1] != true_price(key, now + HOUR - 1) # Just before the next round
+            stale += wrong
+            weighted_stale += weight * wrong
+            samples += 1
+            weighted_samples += weight
+
+    changes = sum(int(((ts >= sim_start) & (ts < end_ts)).sum()) for ts, _ in histories.values())
+    return {
+        "policy": policy,
+        "pairs": len(keys),
+        "scrapes_per_hour": scrapes_per_hour,
+        "scrapes": scrapes,
+        "price_changes": changes,
+        "changes_detected": len(delays),
+        "detected_per_100_scrapes": round(len(delays) * 100 / scrapes, 2) if scrapes else None,
+        "mean_detection_delay_hours": round(float(np.mean(delays)), 2) if delays else None,
+        "p90_detection_delay_hours": round(float(np.percentile(delays, 90)), 2) if delays else None,
+        "demand_weighted_delay_hours": round(weighted_delays / weights, 2) if weights else None,
+        "stale_price_share": round(stale / samples, 4) if samples else None,
+        "demand_weighted_stale_share": round(weighted_stale / weighted_samples, 4) if weighted_samples else None,
+    }
+
+
+def _read_demand(path):
+    """NDJSON lines of {product, retailer?, demand}: views per day."""
+    demand = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                key = (entry["product"].lower().strip(), entry["retailer"]) if entry.get("retailer") else entry["product"].lower().strip()
+                demand[key] = float(entry.get("demand", 0))
+    return demand
+
+
+if __name__ == "__main__":
+    # Usage:
+    #   python refresh_scheduler.py plan [--budget 600] [--hours 1] [--demand demand.ndjson] [--fill] [--dir DIR]
+    #       Prints the next hours' due scrape jobs as NDJSON, e.g. | python ../scraping_service/scraper.py --batch -
+    #       --fill spends each hour's whole budget, pulling in the pairs due soonest.
+    #   python refresh_scheduler.py simulate [--products 500] [--days 60] [--budget 50] [--recorded] [--dir DIR]
+    #       Replays synthetic (or the store's recorded) histories under both policies.
+    args = sys.argv[1:]
+    budget = int(args[args.index("--budget") + 1]) if "--budget" in args else None
+    directory = args[args.index("--dir") + 1] if "--dir" in args else os.environ.get("PRICE_HISTORY_DIR", DEFAULT_HISTORY_DIR)
+
+    if args and args[0] == "plan":
+        hours = int(args[args.index("--hours") + 1]) if "--hours" in args else 1
+        demand = _read_demand(args[args.index("--demand") + 1]) if "--demand" in args else None
+        now = int(time.time())
+        scheduler = scheduler_from_history(PriceHistoryStore(directory), now, budget or SCRAPES_PER_HOUR, demand)
+        overdue = scheduler.overdue(now)
+        emitted = 0
+        for hour in range(hours):
+            for job in scheduler.next_jobs(now + hour * HOUR, fill="--fill" in args):
+                print(json.dumps(job))
+                emitted += 1
+        print(json.dumps({"summary": {"pairs": len(scheduler), "jobs": emitted, "overdue_at_start": overdue}}), file=sys.stderr)
+    elif args and args[0] == "simulate":
+        days = int(args[args.index("--days") + 1]) if "--days" in args else 60
+        if "--recorded" in args:
+            histories, demand, start = recorded_histories(PriceHistoryStore(directory))
+            if not histories:
+                print(json.dumps({"status": "error", "message": f"No recorded histories in {directory}."}))
+                sys.exit(1)
+            end = max(int(ts[-1]) for ts, _ in histories.values()) + 86400
+        else:
+            n_products = int(args[args.index("--products") + 1]) if "--products" in args else 500
+            histories, demand, start = synthetic_histories(n_products, days)
+            end = start + days * 86400
+        budget = budget or max(1, len(histories) // 10)
+        for policy in ("round_robin", "volatility"):
+            print(json.dumps(simulate(histories, demand, start, end, budget, policy)))
+    else:
+        print(json.dumps({"status": "error", "message": "Usage: refresh_scheduler.py plan [--budget N] [--hours N] [--demand FILE] [--fill] | simulate [--products N] [--days N] [--budget N] [--recorded] [--dir DIR]"}))
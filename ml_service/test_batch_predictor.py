@@ -0,0 +1,62 @@
+import io
+import json
+import time
+import batch_predictor
+
+# Run with: python -m pytest ml_service
+# The workers are forked, so they see the stubbed predictor patched in below.
+
+
+def stub_recommendation(product_id, current_price, engine=None, tier=None):
+    if product_id == "slow":
+        time.sleep(120)
+    return {"advice": "BUY NOW", "message": "stub", "min_predicted_price": current_price}
+
+def run(monkeypatch, records, **kwargs):
+    monkeypatch.setattr(batch_predictor, "get_price_recommendation", stub_recommendation)
+    start = time.perf_counter()
+    results = [(record["productId"], result) for record, result, _ in batch_predictor.predict_batch(records, **kwargs)]
+    return results, time.perf_counter() - start
+
+RECORDS = [{"productId": product_id, "currentPrice": 100} for product_id in ["a", "slow", "b", "c", "d"]]
+
+def assert_only_slow_timed_out(results):
+    assert [product_id for product_id, _ in results] == ["a", "slow", "b", "c", "d"]
+    for product_id, result in results:
+        if product_id == "slow":
+            assert result["advice"] == "ERROR" and "timed out" in result["message"]
+        else:
+            assert result["advice"] == "BUY NOW"
+
+def test_slow_item_times_out_in_its_worker(monkeypatch):
+    results, seconds = run(monkeypatch, RECORDS, max_workers=2, chunk_size=2, item_timeout=1)
+    assert_only_slow_timed_out(results)
+    assert seconds < 20
+
+def test_slow_item_times_out_from_the_parent_without_sigalrm(monkeypatch):
+    monkeypatch.setattr(batch_predictor, "HAS_SIGALRM", False)
+    monkeypatch.setattr(batch_predictor, "PARENT_TIMEOUT_SLACK", 1)
+    results, seconds = run(monkeypatch, RECORDS, max_workers=2, chunk_size=2, item_timeout=1)
+    # The hung worker is killed and the items after it still run on a fresh pool
+    assert_only_slow_timed_out(results)
+    assert seconds < 20
+
+def test_malformed_records_get_their_own_errors(monkeypatch):
+    monkeypatch.setattr(batch_predictor, "get_price_recommendation", stub_recommendation)
+    lines = ['{"productId": "a", "currentPrice": 1}', '{"productId": bad', '[1]', '{"productId": "b", "currentPrice": 2}']
+    out = io.StringIO()
+    summary = batch_predictor.run_batch(io.StringIO("\n".join(lines) + "\n"), out, max_workers=1, item_timeout=5)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["advice"] for r in results] == ["BUY NOW", "ERROR", "ERROR", "BUY NOW"]
+    assert "line 2" in results[1]["message"]
+    assert (summary["items"], summary["failed"]) == (4, 2)
+
+def test_numpy_records_are_forecast_together_with_the_same_results(tmp_path, monkeypatch):
+    monkeypatch.setenv("PRICE_HISTORY_DIR", str(tmp_path / "none")) # Simulated histories
+    records = [{"productId": f"p{i}", "currentPrice": 1000 * (i + 1), "engine": "numpy", "tier": "interactive"} for i in range(5)]
+    records.insert(2, {"productId": "bad", "currentPrice": "n/a", "engine": "numpy"})
+    results = [result for _, result, _ in batch_predictor.predict_batch(records, max_workers=2, chunk_size=4)]
+    assert results[2]["advice"] == "ERROR"
+    expected = [batch_predictor.get_price_recommendation(r["productId"], float(r["currentPrice"]), "numpy", "interactive")
+                for r in records if r["productId"] != "bad"]
+    assert results[:2] + results[3:] == expected
@@ -0,0 +1,36 @@
+from entity_resolution import EntityResolver
+
+# Run with: python -m pytest ml_service
+
+CATALOG = {
+    "M1": "Apple iPhone 15 128GB Black",
+    "M2": "Samsung Galaxy S24 256GB Onyx Black",
+}
+UNKNOWN_TITLES = [
+    "Sony WH-1000XM5 Wireless Noise Cancelling Headphones Black",
+    "Sony WH-1000XM5 Wireless Over Ear Noise Cancelling Headphones Black",
+]
+
+
+def promoted_resolver():
+    resolver = EntityResolver(CATALOG)
+    results = [resolver.resolve(title) for title in UNKNOWN_TITLES]
+    assert [r["resolution"] for r in results] == ["new", "clustered"]
+    assert resolver.promote(results[0]["candidate_id"], "NEW1") is not None
+    return resolver
+
+def test_promoted_master_matches_new_titles():
+    resolver = promoted_resolver()
+    result = resolver.resolve("Sony WH-1000XM5 Noise Cancelling Wireless Headphones - Black")
+    assert (result["master_id"], result["resolution"]) == ("NEW1", "matched")
+
+def test_save_load_round_trip_keeps_promoted_masters(tmp_path):
+    path = str(tmp_path / "resolver.json")
+    promoted_resolver().save(path)
+    restored = EntityResolver(CATALOG).load(path)
+
+    assert restored.resolve(UNKNOWN_TITLES[1])["master_id"] == "NEW1"
+    # A title never seen before must match the promoted master, not start a duplicate candidate
+    result = restored.resolve("Sony WH-1000XM5 Noise Cancelling Wireless Headphones - Black")
+    assert (result["master_id"], result["resolution"]) == ("NEW1", "matched")
+    assert restored.candidates(min_size=1) == []
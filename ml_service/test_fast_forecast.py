@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+from fast_forecast import forecast_frame, forecast_frames
+
+# Run with: python -m pytest ml_service
+WEEKLY = np.array([0, -150, -200, -100, 50, 250, 150]) # Monday first
+
+
+def fixed_series(days=90, start="2026-01-05", seed=3):
+    """A rising price with a weekly pattern and seeded noise; 2026-01-05 is a Monday."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(days)
+    y = 40000 + 20 * t + WEEKLY[t % 7] + rng.normal(0, 80, days)
+    return pd.DataFrame({"ds": pd.date_range(start, periods=days, freq="D"), "y": y})
+
+def test_numpy_engine_agrees_with_prophet_on_a_fixed_series():
+    df = fixed_series()
+    model = Prophet(daily_seasonality=False, weekly_seasonality=True, yearly_seasonality=False, uncertainty_samples=1000)
+    model.fit(df)
+    expected = model.predict(model.make_future_dataframe(periods=14, include_history=False))
+    forecast = forecast_frame(df, horizon=14)
+
+    assert (forecast["ds"].values == expected["ds"].values).all()
+    assert np.max(np.abs(forecast["yhat"] - expected["yhat"]) / expected["yhat"]) < 0.005
+    width, expected_width = forecast["yhat_upper"] - forecast["yhat_lower"], expected["yhat_upper"] - expected["yhat_lower"]
+    assert 0.5 < width.mean() / expected_width.mean() < 2
+    # Both recover the weekly pattern, so they agree on the cheapest day (what the advice depends on)
+    assert forecast.loc[forecast["yhat"].idxmin(), "ds"] == expected.loc[expected["yhat"].idxmin(), "ds"]
+
+def test_forecast_frames_match_single_forecasts_across_grids():
+    frames = [fixed_series(seed=1), fixed_series(seed=2), fixed_series(60, "2026-02-01", seed=4), fixed_series(seed=5).iloc[::2]]
+    for batched, df in zip(forecast_frames(frames, horizon=7), frames):
+        single = forecast_frame(df, horizon=7)
+        assert (batched["ds"].values == single["ds"].values).all()
+        for column in ("yhat", "yhat_lower", "yhat_upper"):
+            np.testing.assert_allclose(batched[column], single[column], rtol=1e-9)
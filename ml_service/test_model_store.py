@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from prophet import Prophet
+import model_store
+from model_store import ModelStore, history_fingerprint
+
+# Run with: python -m pytest ml_service
+
+
+class RecordingProphet(Prophet):
+    """A Prophet that records how it was fitted."""
+
+    fits = []
+
+    def fit(self, df, **kwargs):
+        RecordingProphet.fits.append(kwargs.get("init"))
+        return super().fit(df, **kwargs)
+
+def build_model():
+    return RecordingProphet(daily_seasonality=False, weekly_seasonality=False, yearly_seasonality=False)
+
+def history(days, start="2026-01-01"):
+    ds = pd.date_range(start, periods=days, freq="D")
+    return pd.DataFrame({"ds": ds, "y": 50000 + 100 * np.sin(np.arange(days))})
+
+@pytest.fixture(autouse=True)
+def clear_fits():
+    RecordingProphet.fits.clear()
+
+@pytest.fixture(scope="module")
+def fitted_model():
+    model = build_model()
+    model.fit(history(30))
+    return model
+
+def test_fingerprint_changes_with_the_history():
+    df = history(30)
+    assert history_fingerprint(df) == history_fingerprint(df.copy())
+    changed = df.copy()
+    changed.loc[5, "y"] += 1
+    assert history_fingerprint(changed) != history_fingerprint(df)
+    assert history_fingerprint(history(31)) != history_fingerprint(df)
+
+def test_unchanged_history_skips_the_fit(tmp_path):
+    df = history(30)
+    model = ModelStore(str(tmp_path)).get_or_fit("p1", df, build_model)
+    assert RecordingProphet.fits == [None]
+    # A fresh store (as in a new process) reads the saved model back instead of fitting
+    again = ModelStore(str(tmp_path)).get_or_fit("p1", df, build_model)
+    assert len(RecordingProphet.fits) == 1
+    assert again.params["k"].tolist() == model.params["k"].tolist()
+
+def test_few_new_days_warm_start_and_many_refit_cold(tmp_path):
+    store = ModelStore(str(tmp_path))
+    store.get_or_fit("p1", history(30), build_model)
+    store.get_or_fit("p1", history(33), build_model)
+    assert RecordingProphet.fits[0] is None
+    assert set(RecordingProphet.fits[1]) == {"k", "m", "sigma_obs", "delta", "beta"}
+    store.get_or_fit("p1", history(33 + model_store.MAX_NEW_POINTS_FOR_WARM_START + 1), build_model)
+    assert RecordingProphet.fits[2] is None
+
+def test_eviction_drops_least_recently_used(tmp_path, fitted_model):
+    df = history(30)
+    store = ModelStore(str(tmp_path), max_entries=2, max_memory_entries=0)
+    store.save("a", "fa", df, fitted_model)
+    store.save("b", "fb", df, fitted_model)
+    assert store.load("a") is not None # "b" is now the least recently used
+    store.save("c", "fc", df, fitted_model)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(store._path(key)) for key in ("a", "c"))
+    assert store.load("b") is None
+
+def test_eviction_respects_the_size_limit_and_files_from_earlier_runs(tmp_path, fitted_model):
+    df = history(30)
+    ModelStore(str(tmp_path)).save("old", "f", df, fitted_model)
+    size = os.path.getsize(os.path.join(tmp_path, os.listdir(tmp_path)[0]))
+    store = ModelStore(str(tmp_path), max_bytes=int(size * 1.5))
+    store.save("new", "f", df, fitted_model)
+    assert os.listdir(tmp_path) == [os.path.basename(store._path("new"))]
+
+def test_rescan_picks_up_files_written_by_other_stores(tmp_path, fitted_model, monkeypatch):
+    monkeypatch.setattr(model_store, "RESCAN_EVERY_SAVES", 2)
+    df = history(30)
+    store = ModelStore(str(tmp_path), max_entries=2)
+    other = ModelStore(str(tmp_path))
+    other.save("x", "f", df, fitted_model)
+    other.save("y", "f", df, fitted_model)
+    store.save("a", "f", df, fitted_model)
+    assert len(os.listdir(tmp_path)) == 3 # Not rescanned yet
+    store.save("b", "f", df, fitted_model)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(store._path(key)) for key in ("a", "b"))
@@ -0,0 +1,51 @@
+from thefuzz import fuzz, utils as fuzz_utils
+from benchmark_match_accuracy import load_corpus
+from product_matcher import find_master_match, MasterIndex, MasterCatalog, _set_ratio_upper_bound
+from title_normalizer import normalize_title
+
+# Run with: python -m pytest ml_service
+
+
+def corpus_catalog():
+    pairs = load_corpus()
+    titles = sorted({p["master"] for p in pairs} | {p["scraped"] for p in pairs})
+    return [p["scraped"] for p in pairs], {f"M{i:03d}": title for i, title in enumerate(titles)}
+
+def test_canonical_tokens_survive_full_process():
+    # The index bounds work on canonical tokens, thefuzz scores full_process'd text
+    _, catalog = corpus_catalog()
+    for title in catalog.values():
+        normalized = normalize_title(title)
+        assert fuzz_utils.full_process(normalized.text).split() == list(normalized.tokens)
+
+def test_upper_bound_holds_on_corpus():
+    _, catalog = corpus_catalog()
+    normalized = [normalize_title(title) for title in catalog.values()]
+    for a in normalized:
+        for b in normalized:
+            assert fuzz.token_set_ratio(a.text, b.text) <= _set_ratio_upper_bound(frozenset(a.tokens), frozenset(b.tokens))
+
+def test_index_matches_exhaustive_scan_on_corpus(tmp_path):
+    scraped, catalog = corpus_catalog()
+    path = str(tmp_path / "catalog.mcat")
+    MasterCatalog.from_dict(catalog).save(path)
+    indexes = [MasterIndex(catalog, max_candidates=len(catalog)), MasterIndex(MasterCatalog.load(path), max_candidates=len(catalog))]
+    for threshold in (0, 90):
+        for title in scraped + list(catalog.values()):
+            expected = find_master_match(title, catalog, threshold)
+            for index in indexes:
+                assert find_master_match(title, catalog, threshold, index=index) == expected, title
+
+def test_catalog_upper_bounds_match_string_bounds(tmp_path):
+    # Mapped rows are bounded from token IDs and byte tables; delta rows from their strings
+    _, catalog = corpus_catalog()
+    catalog["U1"] = "Café Müller Über Laptop 15.6 Inch"
+    path = str(tmp_path / "catalog.mcat")
+    MasterCatalog.from_dict(catalog).save(path)
+    mapped = MasterCatalog.load(path)
+    mapped.add("D1", "Dell Inspiron 15 3520 Café Edition")
+    rows = mapped.rows()
+    for title in ["Müller Café laptop", "Dell Inspiron 15 3520 16GB RAM", "unrelated words only"]:
+        query_tokens = frozenset(normalize_title(title).tokens)
+        expected = [_set_ratio_upper_bound(query_tokens, frozenset(mapped.tokens(row))) for row in rows]
+        assert mapped.upper_bounds(query_tokens, rows) == expected
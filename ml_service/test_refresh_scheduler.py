@@ -0,0 +1,46 @@
+from refresh_scheduler import (RefreshScheduler, refresh_interval_hours, synthetic_histories, simulate,
+                               MIN_INTERVAL_HOURS, MAX_INTERVAL_HOURS, HOUR)
+
+# Run with: python -m pytest ml_service
+NOW = 1_700_000_000
+
+
+def test_interval_is_clamped():
+    assert refresh_interval_hours(1000.0) == MIN_INTERVAL_HOURS
+    assert refresh_interval_hours(12.0, demand=1e9) == MIN_INTERVAL_HOURS
+    assert refresh_interval_hours(0.0) == MAX_INTERVAL_HOURS
+    assert refresh_interval_hours(0.01) == MAX_INTERVAL_HOURS
+    assert MIN_INTERVAL_HOURS < refresh_interval_hours(2.0) < MAX_INTERVAL_HOURS
+    assert refresh_interval_hours(None) == refresh_interval_hours(float("nan")) == refresh_interval_hours(2.0)
+
+def test_next_jobs_pops_only_due_pairs():
+    scheduler = RefreshScheduler(scrapes_per_hour=10)
+    scheduler.add("stale", "Amazon.in", NOW - 30 * HOUR, volatility_pct=1.0) # Due 6 hours ago
+    scheduler.add("fresh", "Amazon.in", NOW, volatility_pct=1.0) # Due in 24 hours
+    scheduler.add("volatile", "Flipkart", NOW - 2 * HOUR, volatility_pct=24.0, master_title="Volatile Master")
+    jobs = scheduler.next_jobs(NOW)
+    assert [(job["product"], job["retailer"]) for job in jobs] == [("stale", "Amazon.in"), ("volatile", "Flipkart")]
+    assert jobs[1]["query"] == "Volatile Master"
+    assert scheduler.next_jobs(NOW) == []
+    assert scheduler.overdue(NOW) == 0
+
+def test_next_jobs_fill_spends_the_budget():
+    scheduler = RefreshScheduler(scrapes_per_hour=2)
+    for i in range(3):
+        scheduler.add(f"p{i}", "Amazon.in", NOW - i * HOUR, volatility_pct=1.0)
+    assert scheduler.next_jobs(NOW) == []
+    jobs = scheduler.next_jobs(NOW, fill=True)
+    assert [job["product"] for job in jobs] == ["p2", "p1"] # Soonest due first
+    assert all(job["overdue_hours"] < 0 for job in jobs)
+
+def test_next_jobs_skips_superseded_entries():
+    scheduler = RefreshScheduler()
+    scheduler.add("p", "Amazon.in", NOW - 30 * HOUR, volatility_pct=1.0)
+    scheduler.update("p", "Amazon.in", volatility_pct=2.0)
+    assert len(scheduler.next_jobs(NOW)) == 1
+
+def test_simulate_stays_within_budget():
+    histories, demand, start = synthetic_histories(20, 40)
+    result = simulate(histories, demand, start, start + 40 * 86400, 5)
+    assert result["pairs"] == 20
+    assert 0 < result["scrapes"] <= 5 * 10 * 24
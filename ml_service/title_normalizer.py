@@ -0,0 +1,159 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+from thefuzz import fuzz
+
+# Shared by product_matcher (catalog matching) and scraping_service/scraper.py (scrape
+# validation), so a title is cleaned and scored the same way on both sides.
+
+# One scan over the lowercased title: a number with a unit ("256gb", "256 gb", "256-gb",
+# '15.6"'), or a word whose inner hyphens/apostrophes/dots are kept for now ("wh-1000xm5", "mso'21", "15.6")
+# Canonical tokens are letters and digits only, so thefuzz's full_process (which splits on every
+# other character) sees exactly the same tokens as the index; decimal points are written as
+# DECIMAL_MARK ("15.6" -> "15p6").
+TOKEN_REGEX = re.compile(
+    r'(?P<qty>\d+(?:\.\d+)?)\s*-?\s*(?P<unit>gb|tb|mah|hz|inches|inch|"|cm|mm|kg|mp|w)(?![a-z0-9])'
+    r"|(?P<word>[a-z0-9]+(?:[-'.][a-z0-9]+)*)"
+)
+UNIT_ALIASES = {'inches': 'inch', '"': 'inch'}
+DECIMAL_MARK = 'p'
+
+# Common stop words found in product titles
+STOP_WORDS = frozenset([
+    'a', 'an', 'the', 'and', 'or', 'in', 'on', 'for', 'with', 'of', 'at',
+    'by', 'new', 'latest', 'model', 'gb', 'ram', 'storage'
+])
+# Retailer boilerplate that says nothing about which product it is
+NOISE_WORDS = frozenset(['fhd', 'display', 'home', 'student', 'backlit', 'kb', 'antiglare', 'ms', 'office'])
+MSO_REGEX = re.compile(r"mso\d*")
+OS_WORDS = frozenset(['windows', 'win'])
+
+# Words right after a capacity that say what it measures
+RAM_WORDS = frozenset(['ram', 'memory', 'ddr3', 'ddr4', 'ddr5', 'lpddr4', 'lpddr4x', 'lpddr5', 'lpddr5x'])
+STORAGE_WORDS = frozenset(['ssd', 'storage', 'rom', 'hdd', 'emmc', 'nvme'])
+GPU_WORDS = frozenset(['graphics', 'gddr5', 'gddr6', 'vram'])
+# A bare capacity at least this large (or in TB) is storage; smaller ones are RAM when the title
+# also has a larger capacity ("16 GB/512 GB SSD"), storage otherwise
+MIN_BARE_STORAGE_GB = 64
+
+# Capped score for titles that state different storage or RAM sizes (256GB vs 512GB):
+# below every matching threshold, however similar the rest of the title is
+CONFLICT_SCORE_CAP = 70
+
+TITLE_CACHE_SIZE = 65536
+
+NormalizedTitle = namedtuple('NormalizedTitle', ['text', 'tokens', 'storage', 'ram'])
+NormalizedTitle.__doc__ = """
+text: canonical tokens joined by spaces (what the fuzzy scorers compare)
+tokens: the canonical tokens as a tuple
+storage / ram: frozensets of capacities in GB stated in the title
+"""
+
+
+def _number_text(value):
+    return f"{value:g}".replace('.', DECIMAL_MARK)
+
+def _capacity_gb(qty, unit):
+    return float(qty) * (1024 if unit == 'tb' else 1)
+
+def _tokenize(title):
+    """Scans the title once. Returns [(kind, value, unit)]; kind is 'qty' or 'word'."""
+    raw = []
+    for m in TOKEN_REGEX.finditer(title.lower()):
+        if m.group('qty') is not None:
+            raw.append(('qty', m.group('qty'), UNIT_ALIASES.get(m.group('unit'), m.group('unit'))))
+        else:
+            # Join hyphenated/apostrophe'd model numbers ("wh-1000xm5" -> "wh1000xm5");
+            # keep decimal points only between digits ("15.6" -> "15p6")
+            word = m.group('word').replace('-', '').replace("'", '')
+            word = re.sub(r'\.(?!\d)|(?<!\d)\.', '', word).replace('.', DECIMAL_MARK)
+            raw.append(('word', word, None))
+    return raw
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def normalize_title(title):
+    """
+    Canonicalizes a product title into a NormalizedTitle. Results are memoized: the same
+    master titles are normalized for every scraped title they are compared against.
+
+    - lowercase, punctuation dropped, hyphenated model numbers joined ("wh1000xm5")
+    - stop words and retailer noise ("with MS Office", "MSO'21", "Windows 11", "FHD") removed
+    - units canonicalized: "256GB", "256 GB", "256-GB" -> "256gb"; '15.6"' -> "15p6inch"
+    - capacities classified by the word that follows, or by size: "8GB RAM" -> "8gbram",
+      "4GB Graphics" -> "4gbgpu", "512GB SSD" / bare "256GB" -> "512gb" / "256gb"
+    """
+    raw = _tokenize(title or "")
+    capacities = [_capacity_gb(value, unit) for kind, value, unit in raw if kind == 'qty' and unit in ('gb', 'tb')]
+    largest = max(capacities, default=0)
+
+    tokens = []
+    storage = set()
+    ram = set()
+    skip_number = False
+    for i, (kind, value, unit) in enumerate(raw):
+        if kind == 'qty':
+            skip_number = False
+            if unit not in ('gb', 'tb'):
+                tokens.append(f"{_number_text(float(value))}{unit}")
+                continue
+            gb = _capacity_gb(value, unit)
+            following = raw[i + 1][1] if i + 1 < len(raw) and raw[i + 1][0] == 'word' else None
+            if following in GPU_WORDS:
+                tokens.append(f"{_number_text(gb)}gbgpu")
+            elif following in RAM_WORDS or (following not in STORAGE_WORDS and unit == 'gb'
+                                            and gb < MIN_BARE_STORAGE_GB and gb < largest):
+                ram.add(gb)
+                tokens.append(f"{_number_text(gb)}gbram")
+            else:
+                storage.add(gb)
+                tokens.append(f"{_number_text(float(value))}{unit}")
+            continue
+
+        if skip_number and value.replace(DECIMAL_MARK, '').isdigit():
+            skip_number = False # The version after "windows"
+            continue
+        skip_number = value in OS_WORDS
+        if value in STOP_WORDS or value in NOISE_WORDS or skip_number or MSO_REGEX.fullmatch(value):
+            continue
+        tokens.append(value)
+
+    return NormalizedTitle(" ".join(tokens), tuple(tokens), frozenset(storage), frozenset(ram))
+
+def clean_text(title):
+    """The canonical text of a title (normalize_title(title).text)."""
+    return normalize_title(title).text
+
+def capacity_conflict(tokens1, tokens2):
+    """
+    True when both titles state a storage size, or both state a RAM size, and they share none
+    (works on canonical tokens, so it also applies to cleaned titles stored in a catalog).
+    """
+    storage1, ram1 = _capacities(tokens1)
+    storage2, ram2 = _capacities(tokens2)
+    return bool((storage1 and storage2 and not storage1 & storage2) or (ram1 and ram2 and not ram1 & ram2))
+
+CAPACITY_TOKEN_REGEX = re.compile(r"\d+(?:p\d+)?(?:gb|tb)(?:ram)?")
+
+def _capacities(tokens):
+    storage = set()
+    ram = set()
+    for token in tokens:
+        if CAPACITY_TOKEN_REGEX.fullmatch(token):
+            if token.endswith('ram'):
+                ram.add(token)
+            else:
+                storage.add(_number_text(_capacity_gb(token[:-2].replace(DECIMAL_MARK, '.'), token[-2:])))
+    return storage, ram
+
+def apply_conflict_cap(score, tokens1, tokens2):
+    return min(score, CONFLICT_SCORE_CAP) if score > CONFLICT_SCORE_CAP and capacity_conflict(tokens1, tokens2) else score
+
+def score_titles(title1, title2):
+    """
+    token_set_ratio of the normalized titles (0-100, robust to word order), capped at
+    CONFLICT_SCORE_CAP when they state different storage or RAM sizes.
+    """
+    normalized1 = normalize_title(title1)
+    normalized2 = normalize_title(title2)
+    score = fuzz.token_set_ratio(normalized1.text, normalized2.text)
+    return apply_conflict_cap(score, normalized1.tokens, normalized2.tokens)
@@ -0,0 +1,386 @@
+import sys
+import os
+import json
+import time
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for service_dir in ("scraping_service", "ml_service"):
+    if os.path.join(ROOT_DIR, service_dir) not in sys.path:
+        sys.path.append(os.path.join(ROOT_DIR, service_dir))
+
+from scraper import DriverPool
+from scrape_scheduler import ScrapeScheduler
+
+# --- PIPELINE CONFIGURATION ---
+# scrape (threads) -> match (processes) -> forecast (processes), joined by bounded queues.
+# A full queue blocks the stage feeding it, so a slow forecaster slows scraping down instead of
+# buffering the whole crawl in memory. Process stages take up to BATCH_SIZE queued items per
+# task to amortize the inter-process round trip.
+DEFAULT_RETAILERS = ['Amazon.in', 'Flipkart']
+SCRAPE_WORKERS = 4
+MATCH_WORKERS = 1
+FORECAST_WORKERS = 2
+QUEUE_SIZE = 64
+BATCH_SIZE = 8
+MATCH_THRESHOLD = 90
+
+_DONE = object() # End-of-stream marker passed down the queues
+
+
+# --- Worker processes ---
+# Module-level so they can be pickled; each worker process loads its own catalog/models once.
+
+_worker_index = None
+
+def _init_match_worker(catalog_path):
+    global _worker_index
+    from product_matcher import MasterIndex
+    from entity_resolution import load_catalog
+    _worker_index = MasterIndex(load_catalog(catalog_path) if catalog_path else {})
+
+def _match_batch(titles, threshold):
+    """Returns ([(master_id, score)], busy_seconds) for a batch of scraped titles."""
+    from product_matcher import find_master_match
+    start = time.perf_counter()
+    matches = [find_master_match(title, None, threshold, index=_worker_index) for title in titles]
+    return matches, time.perf_counter() - start
+
+def _forecast_batch(requests, engine, tier):
+    """
+    Returns ([recommendation], busy_seconds) for a batch of (product name, current_price).
+    With the numpy engine the batch is forecast in one go (price_predictor.get_price_recommendations).
+    """
+    from price_predictor import get_price_recommendations
+    start = time.perf_counter()
+    priced = [(product, price) for product, price in requests if price is not None]
+    recommendations = iter(get_price_recommendations(priced, engine, tier))
+    results = [next(recommendations) if price is not None else
+               {"advice": "ERROR", "message": "The scraped price is not a number.", "min_predicted_price": None}
+               for _, price in requests]
+    return results, time.perf_counter() - start
+
+def _scraped_price(item):
+    try:
+        return float(item["price"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class StageMetrics:
+    """Counters of one stage; busy_seconds is summed over its workers."""
+
+    def __init__(self, name, workers, in_queue):
+        self.name = name
+        self.workers = workers
+        self.in_queue = in_queue
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+
+    def record(self, items, seconds, errors=0):
+        with self._lock:
+            self.processed += items
+            self.errors += errors
+            self.busy_seconds += seconds
+
+    def sample_depth(self):
+        depth = self.in_queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+        return depth
+
+    def as_dict(self, elapsed):
+        depth = self.sample_depth()
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": depth,
+                "max_queue_depth": self.max_depth,
+                "processed": self.processed,
+                "errors": self.errors,
+                "items_per_second": round(self.processed / elapsed, 2) if elapsed > 0 else None,
+                "utilization": round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed > 0 else None,
+            }
+
+
+class Pipeline:
+    """
+    In-process scrape -> match -> forecast pipeline over a stream of queries.
+
+    Each query is fanned out to its retailer (or every retailer in `retailers`) and scraped by
+    `scrape_workers` threads through a ScrapeScheduler (cache, rate limits, driver pool).
+    Successful scrapes are matched to a master product by `match_workers` processes, then
+    forecast by `forecast_workers` processes (price_predictor, with the given engine and tier).
+    Failed scrapes and malformed queries skip the later stages. Forecasts are keyed by product
+    name (the query's master_title, else the query itself), like the price-history store;
+    master_id is only carried along. Results come out as soon as they are ready, so their
+    order may differ from the input; echo an 'id' to match them up.
+    """
+
+    def __init__(self, catalog_path=None, retailers=None, scrape_workers=SCRAPE_WORKERS, match_workers=MATCH_WORKERS,
+                 forecast_workers=FORECAST_WORKERS, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 threshold=MATCH_THRESHOLD, engine=None, tier=None, scheduler=None):
+        self.catalog_path = catalog_path
+        self.retailers = retailers or DEFAULT_RETAILERS
+        self.scrape_workers = scrape_workers
+        self.match_workers = match_workers
+        self.forecast_workers = forecast_workers
+        self.batch_size = batch_size
+        self.threshold = threshold
+        self.engine = engine
+        self.tier = tier
+        self.scheduler = scheduler or ScrapeScheduler(pool=DriverPool(size=scrape_workers))
+
+        self.scrape_queue = queue.Queue(maxsize=queue_size)
+        self.match_queue = queue.Queue(maxsize=queue_size)
+        self.forecast_queue = queue.Queue(maxsize=queue_size)
+        self.out_queue = queue.Queue(maxsize=queue_size)
+        self.metrics = {
+            "scrape": StageMetrics("scrape", scrape_workers, self.scrape_queue),
+            "match": StageMetrics("match", match_workers, self.match_queue),
+            "forecast": StageMetrics("forecast", forecast_workers, self.forecast_queue),
+            "output": StageMetrics("output", 1, self.out_queue),
+        }
+        self._start = None
+        self._scrapers_left = scrape_workers
+        self._lock = threading.Lock()
+
+    # --- Stages ---
+
+    def _feed(self, queries):
+        # The _DONE markers must go out however the input ends, or every later stage waits forever
+        try:
+            for query in queries:
+                if not isinstance(query, dict) or query.get("status") == "error" or not query.get("query"):
+                    self.metrics["scrape"].record(0, 0.0, errors=1)
+                    self.out_queue.put(query if isinstance(query, dict) and query.get("status") == "error" else
+                                       {"status": "error", "message": "Each query needs a non-empty 'query'.", "input": query})
+                    continue
+                for retailer in ([query["retailer"]] if query.get("retailer") else self.retailers):
+                    self.scrape_queue.put(dict(query, retailer=retailer)) # Blocks while the scrapers are behind
+        except Exception as e:
+            self.out_queue.put({"status": "error", "message": f"Failed to read the queries: {str(e)}"})
+        finally:
+            for _ in range(self.scrape_workers):
+                self.scrape_queue.put(_DONE)
+
+    def _scrape_worker(self):
+        metrics = self.metrics["scrape"]
+        try:
+            while True:
+                job = self.scrape_queue.get()
+                if job is _DONE:
+                    break
+                start = time.perf_counter()
+                try:
+                    result = dict(self.scheduler.run_job(job))
+                except Exception as e:
+                    result = {"status": "error", "message": f"An unexpected error occurred: {str(e)}"}
+                result.pop("metrics", None)
+                item = dict(result, query=job.get("query"), retailer=job.get("retailer"))
+                if "id" in job:
+                    item["id"] = job["id"]
+                if job.get("master_title"):
+                    item["master_title"] = job["master_title"]
+                failed = item.get("status") != "success"
+                metrics.record(1, time.perf_counter() - start, errors=int(failed))
+                (self.out_queue if failed else self.match_queue).put(item)
+        finally:
+            with self._lock:
+                self._scrapers_left -= 1
+                last = self._scrapers_left == 0
+            if last:
+                self.match_queue.put(_DONE)
+
+    def _next_batch(self, in_queue):
+        """Blocks for one item, then takes whatever else is queued up to batch_size. Returns (batch, done)."""
+        item = in_queue.get()
+        if item is _DONE:
+            return [], True
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = in_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _process_stage(self, name, in_queue, out_queue, executor, workers, submit, apply):
+        """
+        Feeds batches from `in_queue` to a process pool with at most 2 batches per worker in
+        flight (further items wait in `in_queue`, which then blocks its producer). A collector
+        thread applies the results in submission order and pushes the items to `out_queue`.
+        """
+        metrics = self.metrics[name]
+        in_flight = queue.Queue(maxsize=workers * 2) # Its bound is the backpressure on the pool
+
+        def collect():
+            try:
+                while True:
+                    entry = in_flight.get()
+                    if entry is _DONE:
+                        break
+                    batch, future = entry
+                    try:
+                        results, busy = future.result()
+                        errors = 0
+                    except Exception as e:
+                        results, busy, errors = [e] * len(batch), 0.0, len(batch)
+                    for item, result in zip(batch, results):
+                        out_queue.put(apply(item, result))
+                    metrics.record(len(batch), busy, errors)
+            finally:
+                out_queue.put(_DONE)
+
+        collector = threading.Thread(target=collect, name=f"{name}-collector", daemon=True)
+        collector.start()
+        try:
+            done = False
+            while not done:
+                batch, done = self._next_batch(in_queue)
+                if batch:
+                    metrics.sample_depth()
+                    try:
+                        future = submit(executor, batch)
+                    except Exception as e:
+                        # e.g. a bad field in one item; fail the batch through the collector like a worker error
+                        future = Future()
+                        future.set_exception(e)
+                    in_flight.put((batch, future))
+        finally:
+            in_flight.put(_DONE)
+            collector.join()
+
+    def _apply_match(self, item, result):
+        if isinstance(result, Exception):
+            return dict(item, master_id=None, master_score=0, match_error=str(result))
+        master_id, score = result
+        return dict(item, master_id=master_id, master_score=score)
+
+    def _apply_forecast(self, item, result):
+        if isinstance(result, Exception):
+            result = {"advice": "ERROR", "message": f"An error occurred during prediction: {str(result)}", "min_predicted_price": None}
+        return dict(item, recommendation=result)
+
+    # --- Running ---
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._start if self._start else 0.0
+        return {"elapsed_seconds": round(elapsed, 3),
+                "stages": {name: metrics.as_dict(elapsed) for name, metrics in self.metrics.items()}}
+
+    def run(self, queries, on_result, metrics_interval=None, on_metrics=None):
+        """
+        Runs every query through the pipeline, calling on_result(item) from the calling thread
+        as items come out. With `metrics_interval`, on_metrics(stats) is called that often
+        from a background thread. Returns the final stats.
+        """
+        self._start = time.perf_counter()
+        self._scrapers_left = self.scrape_workers # The last scraper to finish closes the match stage
+        threads = [threading.Thread(target=self._feed, args=(queries,), name="feeder", daemon=True)]
+        threads += [threading.Thread(target=self._scrape_worker, name=f"scraper-{i}", daemon=True)
+                    for i in range(self.scrape_workers)]
+
+        with ProcessPoolExecutor(self.match_workers, initializer=_init_match_worker, initargs=(self.catalog_path,)) as matchers, \
+             ProcessPoolExecutor(self.forecast_workers) as forecasters:
+            threads.append(threading.Thread(target=self._process_stage, name="match", daemon=True, args=(
+                "match", self.match_queue, self.forecast_queue, matchers, self.match_workers,
+                lambda executor, batch: executor.submit(_match_batch, [item.get("title") or "" for item in batch], self.threshold),
+                self._apply_match)))
+            threads.append(threading.Thread(target=self._process_stage, name="forecast", daemon=True, args=(
+                "forecast", self.forecast_queue, self.out_queue, forecasters, self.forecast_workers,
+                lambda executor, batch: executor.submit(_forecast_batch, [
+                    (item.get("master_title") or item["query"], _scraped_price(item)) for item in batch
+                ], self.engine, self.tier),
+                self._apply_forecast)))
+
+            stop_reporting = threading.Event()
+            if metrics_interval and on_metrics:
+                def report():
+                    while not stop_reporting.wait(metrics_interval):
+                        on_metrics(self.stats())
+                threads.append(threading.Thread(target=report, name="metrics", daemon=True))
+
+            for thread in threads:
+                thread.start()
+            try:
+                while True:
+                    item = self.out_queue.get()
+                    if item is _DONE:
+                        break
+                    self.metrics["output"].record(1, 0.0)
+                    on_result(item)
+            finally:
+                stop_reporting.set()
+        return self.stats()
+
+    def close(self):
+        self.scheduler.close()
+
+
+def _read_queries(stream):
+    """
+    NDJSON objects ({query, retailer?, master_title?, id?}) or plain query lines.
+    A line that is not valid JSON comes out as an error item, which the pipeline passes through.
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith("{"):
+            yield {"query": line}
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {"status": "error", "message": f"Invalid JSON on line {line_number}: {str(e)}", "line": line_number}
+
+
+if __name__ == "__main__":
+    # Usage: python pipeline.py [queries.ndjson|-] [--catalog catalog.json|catalog.mcat]
+    #        [--retailers Amazon.in,Flipkart] [--scrape-workers 4] [--match-workers 1] [--forecast-workers 2]
+    #        [--queue-size 64] [--batch-size 8] [--threshold 90] [--engine prophet|numpy]
+    #        [--tier interactive|standard|thorough] [--metrics-interval SECONDS]
+    # Enriched results go to stdout as NDJSON; per-stage metrics (and the final summary) to stderr.
+    args = sys.argv[1:]
+
+    def option(name, default=None, cast=str):
+        return cast(args[args.index(name) + 1]) if name in args else default
+
+    pipeline = Pipeline(
+        catalog_path=option("--catalog"),
+        retailers=option("--retailers", None, lambda s: s.split(",")),
+        scrape_workers=option("--scrape-workers", SCRAPE_WORKERS, int),
+        match_workers=option("--match-workers", MATCH_WORKERS, int),
+        forecast_workers=option("--forecast-workers", FORECAST_WORKERS, int),
+        queue_size=option("--queue-size", QUEUE_SIZE, int),
+        batch_size=option("--batch-size", BATCH_SIZE, int),
+        threshold=option("--threshold", MATCH_THRESHOLD, int),
+        engine=option("--engine"),
+        tier=option("--tier"),
+    )
+    source = args[0] if args and not args[0].startswith("--") else "-"
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+
+    def emit(item):
+        sys.stdout.write(json.dumps(item) + "\n")
+        sys.stdout.flush()
+
+    def report(stats):
+        print(json.dumps({"metrics": stats}), file=sys.stderr, flush=True)
+
+    try:
+        summary = pipeline.run(_read_queries(stream), emit, option("--metrics-interval", None, float), report)
+    finally:
+        pipeline.close()
+        if stream is not sys.stdin:
+            stream.close()
+    print(json.dumps({"summary": summary}), file=sys.stderr)
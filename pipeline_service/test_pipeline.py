@@ -0,0 +1,82 @@
+import io
+import json
+import threading
+import pytest
+from pipeline import Pipeline, _read_queries
+import price_predictor # Importable once pipeline has set up the service paths
+
+# Run with: python -m pytest pipeline_service
+CATALOG = {"MP1": "Dell Inspiron 15 3520 Laptop Intel Core i5-1235U 16GB RAM 512GB SSD Platinum Silver",
+           "MP2": "Apple iPhone 15 Pro Max (256GB) - Natural Titanium"}
+
+
+class StubScheduler:
+    """Stands in for ScrapeScheduler: 'boom' raises, 'missing' is not found, anything else succeeds."""
+
+    def __init__(self):
+        self.closed = False
+
+    def run_job(self, job):
+        if job["query"] == "boom":
+            raise RuntimeError("driver crashed")
+        if job["query"] == "missing":
+            return {"status": "error", "message": "No matching product found."}
+        return {"status": "success", "title": "Dell Inspiron 15 3520 Laptop i5-1235U 16GB 512GB SSD", "price": "45990"}
+
+    def close(self):
+        self.closed = True
+
+def stub_recommendation(product, price, engine=None, tier=None):
+    return {"advice": "BUY NOW", "product": product, "price": price, "min_predicted_price": price}
+
+@pytest.fixture
+def make_pipeline(tmp_path, monkeypatch):
+    # Worker processes are forked, so they see the stubbed forecaster too
+    monkeypatch.setattr(price_predictor, "get_price_recommendation", stub_recommendation)
+    catalog_path = tmp_path / "catalog.json"
+    catalog_path.write_text(json.dumps(CATALOG))
+    def make(**options):
+        options = dict(dict(retailers=["Flipkart"], scrape_workers=2, queue_size=2, batch_size=2), **options)
+        return Pipeline(str(catalog_path), scheduler=StubScheduler(), **options)
+    return make
+
+def run_lines(pipeline, text, timeout=60):
+    # In a thread, so a deadlocked pipeline fails the test instead of hanging the run
+    results, outcome = [], {}
+    thread = threading.Thread(target=lambda: outcome.update(stats=pipeline.run(_read_queries(io.StringIO(text)), results.append)),
+                              daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "The pipeline did not finish"
+    return results, outcome["stats"]
+
+def test_pipeline_matches_and_forecasts_good_scrapes(make_pipeline):
+    results, stats = run_lines(make_pipeline(), '{"query": "Dell Inspiron", "id": 7, "master_title": "Dell Inspiron 15 3520"}\nDell laptop\n')
+    assert len(results) == 2
+    assert all(result["status"] == "success" and result["master_id"] == "MP1" for result in results)
+    by_query = {result["query"]: result for result in results}
+    assert by_query["Dell Inspiron"]["id"] == 7
+    assert by_query["Dell Inspiron"]["recommendation"]["product"] == "Dell Inspiron 15 3520" # Keyed by master_title
+    assert by_query["Dell laptop"]["recommendation"] == stub_recommendation("Dell laptop", 45990.0)
+    assert stats["stages"]["forecast"]["processed"] == 2
+
+def test_pipeline_passes_failures_through_as_errors(make_pipeline):
+    text = "\n".join(["Dell laptop", '{"query": bad', '{"retailer": "Flipkart"}', "boom", "missing"]) + "\n"
+    results, stats = run_lines(make_pipeline(), text)
+    assert len(results) == 5
+    errors = [result for result in results if result["status"] == "error"]
+    assert len(errors) == 4
+    assert not any("recommendation" in result for result in errors)
+    assert any(result.get("line") == 2 for result in errors)
+    assert any("driver crashed" in result["message"] for result in errors)
+    assert stats["stages"]["scrape"]["errors"] == 4
+    assert stats["stages"]["match"]["processed"] == 1
+
+def test_pipeline_ends_on_empty_input_and_when_every_scrape_fails(make_pipeline):
+    pipeline = make_pipeline()
+    assert run_lines(pipeline, "")[0] == []
+    results, stats = run_lines(pipeline, "boom\nmissing\nboom\n") # Same pipeline again: the scraper count resets
+    assert [result["status"] for result in results] == ["error"] * 3
+    assert stats["stages"]["match"]["processed"] == 0
+    pipeline.close()
+    assert pipeline.scheduler.closed
@@ -9,49 +9,97 @@ const pythonExecutable = path.join(__dirname, '..', 'ml_service', 'venv', 'Scrip
 // Path to the predictor script
 const predictorScript = path.join(__dirname, '..', 'ml_service', 'price_predictor.py');
 
-// Utility function to execute the Python ML script
-function runPythonPredictor(productId, currentPrice) {
+// Number of concurrent predictions the persistent worker runs at once
+const predictorWorkers = parseInt(process.env.PREDICTOR_WORKERS || '4', 10);
+const PREDICTION_TIMEOUT_MS = 30000; // ML models can take a while, 30 seconds per request
+
+// --- PERSISTENT PREDICTOR WORKER ---
+// One long-lived Python process (price_predictor.py --serve) answers NDJSON requests on stdin,
+// so we only pay for the interpreter start and the pandas/Prophet imports once.
+let predictorProcess = null;
+let stdoutBuffer = '';
+let nextRequestId = 1;
+const pendingRequests = new Map(); // request id -> { resolve, reject, timer }
+
+function failPendingRequests(error) {
+    for (const pending of pendingRequests.values()) {
+        clearTimeout(pending.timer);
+        pending.reject(error);
+    }
+    pendingRequests.clear();
+}
+
+function handlePredictorLine(line) {
+    if (!line.trim()) return;
+
+    let response;
+    try {
+        response = JSON.parse(line);
+    } catch (e) {
+        console.error("ML output was not valid JSON:", line);
+        return;
+    }
+
+    const pending = pendingRequests.get(response.id);
+    if (!pending) return; // Request already timed out
+
+    pendingRequests.delete(response.id);
+    clearTimeout(pending.timer);
+    delete response.id;
+    pending.resolve(response);
+}
+
+function getPredictorProcess() {
+    if (predictorProcess) return predictorProcess;
+
+    predictorProcess = spawn(pythonExecutable, [predictorScript, '--serve', '--workers', String(predictorWorkers)]);
+    stdoutBuffer = '';
+
+    predictorProcess.stdout.on('data', (data) => {
+        stdoutBuffer += data.toString();
+        const lines = stdoutBuffer.split('\n');
+        stdoutBuffer = lines.pop(); // Keep the trailing partial line for the next chunk
+        lines.forEach(handlePredictorLine);
+    });
+
+    predictorProcess.stdin.on('error', (err) => {
+        // The worker died mid-write; the 'close' handler rejects the pending requests
+        console.error(`Predictor stdin error: ${err.message}`);
+    });
+
+    predictorProcess.stderr.on('data', (data) => {
+        // Prophet/cmdstanpy log progress to stderr; surface it only for debugging
+        // console.error(`Predictor stderr: ${data}`);
+    });
+
+    predictorProcess.on('close', (code) => {
+        console.error(`Python ML worker exited with code ${code}.`);
+        predictorProcess = null;
+        failPendingRequests(new Error(`Predictor failed. Check logs. Code: ${code}`));
+    });
+
+    predictorProcess.on('error', (err) => {
+        console.error(`Failed to start predictor process: ${err.message}`);
+        predictorProcess = null;
+        failPendingRequests(new Error(`Failed to start predictor process: ${err.message}`));
+    });
+
+    return predictorProcess;
+}
+
+// Utility function to run a prediction on the persistent Python ML worker
+function runPythonPredictor(productId, currentPrice, productName) {
     return new Promise((resolve, reject) => {
-        const payload = JSON.stringify({ productId, currentPrice });
-
-        const pythonProcess = spawn(pythonExecutable, [predictorScript, payload], {
-            // ML models can take longer to load/run, extend timeout slightly
-            timeout: 30000, // 30 seconds
-            killSignal: 'SIGTERM'
-        });
-
-        let dataFromPython = '';
-        let errorFromPython = '';
-
-        pythonProcess.stdout.on('data', (data) => {
-            dataFromPython += data.toString();
-        });
-
-        pythonProcess.stderr.on('data', (data) => {
-            errorFromPython += data.toString();
-        });
-
-        pythonProcess.on('close', (code) => {
-            if (code === 0) {
-                try {
-                    resolve(JSON.parse(dataFromPython));
-                } catch (e) {
-                    console.error("ML output was not valid JSON:", dataFromPython);
-                    reject(new Error("Invalid data format from predictor."));
-                }
-            } else {
-                console.error(`Python ML script exited with code ${code}. Stderr: ${errorFromPython}`);
-                reject(new Error(`Predictor failed. Check logs. Code: ${code}`));
-            }
-        });
-
-        pythonProcess.on('error', (err) => {
-             if (err.code === 'ETIMEDOUT') {
-                reject(new Error("Prediction operation timed out after 30 seconds."));
-            } else {
-                reject(new Error(`Failed to start predictor process: ${err.message}`));
-            }
-        });
+        const id = nextRequestId++;
+        const worker = getPredictorProcess();
+
+        const timer = setTimeout(() => {
+            pendingRequests.delete(id);
+            reject(new Error("Prediction operation timed out after 30 seconds."));
+        }, PREDICTION_TIMEOUT_MS);
+
+        pendingRequests.set(id, { resolve, reject, timer });
+        worker.stdin.write(JSON.stringify({ id, productId, productName, currentPrice }) + '\n');
     });
 }
 
@@ -65,7 +113,9 @@ router.post('/:productId/recommendation', async (req, res) => {
     }
 
     try {
-        const recommendation = await runPythonPredictor(productId, parseFloat(currentPrice));
+        // Price history is stored under the product name, not the master product ID
+        const product = await Product.findOne({ masterProductId: productId });
+        const recommendation = await runPythonPredictor(productId, parseFloat(currentPrice), product ? product.name : undefined);
         res.status(200).json(recommendation);
     } catch (error) {
         console.error("Prediction API failure:", error.message);
@@ -0,0 +1,160 @@
+import sys
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import scraper
+from scraper import DriverPool, build_search_url, scrape_product_data
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Each scenario is one (query, retailer, master title) scrape against the recorded pages.
+# "site": "robot" serves the captcha page for every URL.
+SCENARIOS = {
+    'amazon': {'retailer': 'Amazon.in', 'query': 'Dell Inspiron 15 3520', 'master_title': 'Dell Inspiron 15 3520 Laptop'},
+    'amazon_variant': {'retailer': 'Amazon.in', 'query': 'Dell Inspiron 15 3520',
+                       'master_title': 'Dell Inspiron 15 3520 Laptop Intel Core i5-1235U 16GB RAM 512GB SSD Platinum Silver'},
+    'flipkart': {'retailer': 'Flipkart', 'query': 'Dell Inspiron 15 3520',
+                 'master_title': 'DELL Inspiron 3520 Intel Core i5 12th Gen 1235U 16 GB 512 GB SSD Windows 11 Home Thin and Light Laptop'},
+    'amazon_blocked': {'retailer': 'Amazon.in', 'query': 'Dell Inspiron 15 3520', 'master_title': 'Dell Inspiron 15 3520 Laptop', 'site': 'robot'},
+}
+
+
+def fixture_name(path):
+    """The recorded page served for a URL path: /s (Amazon search), /search and /p/ (Flipkart), /robot/* (captcha)."""
+    path = path.split("?")[0]
+    if path.startswith("/robot/"):
+        return "robot_check.html"
+    if path.endswith("/s"):
+        return "amazon_search.html"
+    if path.endswith("/search"):
+        return "flipkart_search.html"
+    if "/p/" in path:
+        return "flipkart_product.html"
+    return None
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves the recorded pages by route (see fixture_name)."""
+    delay_seconds = 0.0
+
+    def page(self, name):
+        """The body served for a fixture; tests override it to alter a recorded page."""
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+            return f.read()
+
+    def do_GET(self):
+        name = fixture_name(self.path)
+        if name is None:
+            self.send_error(404)
+            return
+        body = self.page(name)
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server(delay_seconds=0.0, handler=FixtureHandler):
+    """Starts the fixture server on a free local port. Returns (server, base_url)."""
+    handler = type("Handler", (handler,), {"delay_seconds": delay_seconds})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def run_scenario(name, scenario, base_url, runs, concurrency, pool):
+    site = f"{base_url}/robot" if scenario.get('site') == 'robot' else base_url
+    scraper.RETAILER_BASE_URLS[scenario['retailer']] = site
+    url = build_search_url(scenario['query'], scenario['retailer'])
+
+    def one(_):
+        t0 = time.perf_counter()
+        result = scrape_product_data(url, scenario['retailer'], scenario['master_title'], pool=pool)
+        return result, time.perf_counter() - t0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(one, range(runs)))
+    wall = time.perf_counter() - start
+
+    latencies = np.array([seconds for _, seconds in outcomes]) * 1000
+    phases, counters = {}, {}
+    for result, _ in outcomes:
+        metrics = result.get("metrics", {})
+        for phase, ms in metrics.get("phases_ms", {}).items():
+            phases[phase] = phases.get(phase, 0.0) + ms
+        for counter, value in metrics.get("counters", {}).items():
+            counters[counter] = counters.get(counter, 0) + value
+
+    return {
+        "scenario": name,
+        "runs": runs,
+        "success_rate": round(sum(r.get("status") == "success" for r, _ in outcomes) / runs, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "scrapes_per_second": round(runs / wall, 1),
+        "mean_phases_ms": {phase: round(total / runs, 2) for phase, total in sorted(phases.items())},
+        "mean_counters": {counter: round(total / runs, 2) for counter, total in sorted(counters.items())},
+        "sample": {k: v for k, v in outcomes[0][0].items() if k != "metrics"},
+    }
+
+def check_regressions(reports, baseline, tolerance):
+    """Compares reports to a saved baseline; returns a list of human-readable regressions."""
+    regressions = []
+    for report in reports:
+        base = baseline.get(report["scenario"])
+        if not base:
+            continue
+        if report["success_rate"] < base["success_rate"]:
+            regressions.append(f"{report['scenario']}: success rate {report['success_rate']} < {base['success_rate']}")
+        if report["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{report['scenario']}: p95 {report['p95_ms']}ms > {base['p95_ms']}ms +{tolerance:.0%}")
+        if report["scrapes_per_second"] < base["scrapes_per_second"] * (1 - tolerance):
+            regressions.append(f"{report['scenario']}: {report['scrapes_per_second']}/s < {base['scrapes_per_second']}/s -{tolerance:.0%}")
+    return regressions
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_scraper.py [--runs 50] [--concurrency 4] [--scenarios amazon,flipkart]
+    #        [--server-delay-ms 0] [--browser] [--save-baseline FILE] [--baseline FILE] [--tolerance 0.25]
+    # Replays fixtures/*.html from a local server. By default only the HTTP path is measured
+    # (browser fallbacks fail fast); --browser forces every scrape through Chrome instead.
+    args = sys.argv[1:]
+    runs = int(args[args.index("--runs") + 1]) if "--runs" in args else 50
+    concurrency = int(args[args.index("--concurrency") + 1]) if "--concurrency" in args else 4
+    names = args[args.index("--scenarios") + 1].split(",") if "--scenarios" in args else list(SCENARIOS)
+    delay_ms = float(args[args.index("--server-delay-ms") + 1]) if "--server-delay-ms" in args else 0.0
+    tolerance = float(args[args.index("--tolerance") + 1]) if "--tolerance" in args else 0.25
+
+    if "--browser" in args:
+        scraper.HTTP_FIRST = False
+        pool = DriverPool(size=concurrency)
+    else:
+        pool = DriverPool(size=concurrency, factory=lambda: None)
+
+    server, base_url = start_fixture_server(delay_ms / 1000)
+    try:
+        reports = [run_scenario(name, SCENARIOS[name], base_url, runs, concurrency, pool) for name in names]
+    finally:
+        server.shutdown()
+        pool.close()
+    for report in reports:
+        print(json.dumps(report))
+
+    if "--save-baseline" in args:
+        with open(args[args.index("--save-baseline") + 1], "w", encoding="utf-8") as f:
+            json.dump({r["scenario"]: {k: r[k] for k in ("success_rate", "p95_ms", "scrapes_per_second")} for r in reports}, f, indent=2)
+
+    if "--baseline" in args:
+        with open(args[args.index("--baseline") + 1], encoding="utf-8") as f:
+            regressions = check_regressions(reports, json.load(f), tolerance)
+        print(json.dumps({"regressions": regressions}))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,213 @@
+import sys
+import os
+import re
+import json
+import time
+import sqlite3
+import atexit
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape_cache.sqlite3")
+
+# --- CACHE CONFIGURATION ---
+# ttl: seconds a scraped price is served as fresh
+# stale: further seconds it may still be served (stale-while-revalidate) while a refresh runs
+RETAILER_TTLS = {
+    'Amazon.in': {'ttl': 15 * 60, 'stale': 6 * 3600},
+    'Flipkart': {'ttl': 15 * 60, 'stale': 6 * 3600},
+}
+DEFAULT_TTL = {'ttl': 10 * 60, 'stale': 3600}
+MAX_ENTRIES = int(os.environ.get("SCRAPER_CACHE_MAX_ENTRIES", "5000"))
+REFRESH_WORKERS = 2
+
+
+def normalize_key_part(text):
+    return re.sub(r"\s+", " ", (text or "").lower()).strip()
+
+def cache_key(query, retailer, master_title=None):
+    """Normalized query|retailer|master title, so trivially different spellings share an entry."""
+    return f"{normalize_key_part(query)}|{retailer}|{normalize_key_part(master_title)}"
+
+
+class ScrapeCache:
+    """
+    SQLite-backed cache in front of a scrape function.
+
+    get() returns a fresh entry straight away. Within the stale window it returns the last
+    good price and refreshes it in the background. Otherwise it scrapes. Identical requests
+    in flight (including background refreshes) share a single scrape. Only successful results
+    are stored, and the least recently used entries are evicted beyond `max_entries`.
+    The database runs in WAL mode, so several scraper processes can share one file.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttls=None, max_entries=MAX_ENTRIES, refresh_workers=REFRESH_WORKERS):
+        self.path = path
+        self.ttls = ttls or RETAILER_TTLS
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, retailer TEXT, result TEXT, fetched_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+        self._inflight = {} # key -> Future of the scrape in progress
+        self._inflight_lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers)
+        self._refreshes = set() # Futures of queued/running background refreshes
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "coalesced": 0, "refreshes": 0, "stored": 0, "evicted": 0}
+        self._counters_lock = threading.Lock()
+
+    def _count(self, name, n=1):
+        with self._counters_lock:
+            self._counters[name] += n
+
+    # --- Storage ---
+
+    def _load(self, key):
+        with self._db_lock:
+            row = self._conn.execute("SELECT result, fetched_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        return (json.loads(row[0]), row[1]) if row else (None, None)
+
+    def _store(self, key, retailer, result):
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, retailer, result, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                # Timings describe the original scrape, not a later cache hit
+                (key, retailer, json.dumps({k: v for k, v in result.items() if k != "metrics"}), now, now),
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)", (excess,)
+                )
+            self._conn.commit()
+        self._count("stored")
+        if excess > 0:
+            self._count("evicted", excess)
+
+    # --- Single-flight scrape ---
+
+    def _scrape(self, key, retailer, fetch):
+        """Runs fetch() once per key at a time; concurrent callers wait for the same result."""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self._count("coalesced")
+            return future.result()
+
+        try:
+            result = fetch()
+            if result.get("status") == "success":
+                self._store(key, retailer, result)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _refresh(self, key, retailer, fetch):
+        self._count("refreshes")
+        try:
+            self._scrape(key, retailer, fetch)
+        except Exception as e:
+            print(f"DEBUG: Background refresh failed for {key}: {e}", file=sys.stderr)
+
+    def _refresh_done(self, refresh):
+        with self._inflight_lock:
+            self._refreshes.discard(refresh)
+
+    # --- Public API ---
+
+    def get(self, query, retailer, master_title, fetch):
+        """
+        Returns a result dict for the scrape, adding "cache": "hit" | "stale" | "miss" and
+        "cache_age_seconds" for cached results. `fetch` is called with no arguments to scrape.
+        """
+        key = cache_key(query, retailer, master_title)
+        ttl = self.ttls.get(retailer, DEFAULT_TTL)
+        cached, fetched_at = self._load(key)
+
+        if cached is not None:
+            age = time.time() - fetched_at
+            if age < ttl['ttl']:
+                self._count("hits")
+                return dict(cached, cache="hit", cache_age_seconds=round(age, 1))
+            if age < ttl['ttl'] + ttl['stale']:
+                self._count("stale")
+                with self._inflight_lock:
+                    refreshing = key in self._inflight
+                if not refreshing:
+                    refresh = self._refresher.submit(self._refresh, key, retailer, fetch)
+                    with self._inflight_lock:
+                        self._refreshes.add(refresh)
+                    refresh.add_done_callback(self._refresh_done)
+                return dict(cached, cache="stale", cache_age_seconds=round(age, 1))
+
+        self._count("misses")
+        return dict(self._scrape(key, retailer, fetch), cache="miss")
+
+    def stats(self):
+        with self._counters_lock:
+            counters = dict(self._counters)
+        with self._db_lock:
+            counters["entries"] = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = counters["hits"] + counters["stale"] + counters["misses"]
+        counters["hit_rate"] = round((counters["hits"] + counters["stale"]) / lookups, 3) if lookups else None
+        return counters
+
+    def wait_for_refreshes(self, timeout=None):
+        """Blocks until the background refreshes queued so far have finished."""
+        with self._inflight_lock:
+            pending = list(self._refreshes)
+        wait(pending, timeout=timeout)
+
+    def close(self):
+        """Waits for background refreshes, then closes the database."""
+        self._refresher.shutdown(wait=True)
+        with self._db_lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_scrape_cache():
+    """
+    Returns the process-wide cache at SCRAPER_CACHE_PATH (closed at exit), or None when
+    SCRAPER_CACHE=off.
+    """
+    global _default_cache
+    if os.environ.get("SCRAPER_CACHE", "on").lower() in ("off", "0", "false"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ScrapeCache(os.environ.get("SCRAPER_CACHE_PATH", DEFAULT_CACHE_PATH))
+            atexit.register(_default_cache.close)
+        return _default_cache
+
+
+if __name__ == "__main__":
+    # Usage: python scrape_cache.py stats   (entries per retailer; hit counters are per process)
+    if len(sys.argv) > 1 and sys.argv[1] == "stats":
+        cache = ScrapeCache(os.environ.get("SCRAPER_CACHE_PATH", DEFAULT_CACHE_PATH))
+        with cache._db_lock:
+            rows = cache._conn.execute("SELECT retailer, COUNT(*), MIN(fetched_at) FROM entries GROUP BY retailer").fetchall()
+        now = time.time()
+        print(json.dumps({retailer: {"entries": count, "oldest_age_seconds": round(now - oldest, 1)} for retailer, count, oldest in rows}))
+        cache.close()
+    else:
+        print(json.dumps({"status": "error", "message": "Usage: scrape_cache.py stats"}))
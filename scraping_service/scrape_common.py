@@ -0,0 +1,338 @@
+import sys
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+
+# Configuration and helpers shared by the browser path (scraper.py) and the HTTP path
+# (static_scraper.py). Both import this module, never each other's, so running scraper.py as a
+# script still leaves one copy of the profile and of the per-thread scrape metrics.
+
+# Title cleaning/scoring is shared with the matching service so both agree on what "the same product" is
+ML_SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ml_service")
+if ML_SERVICE_DIR not in sys.path:
+    sys.path.append(ML_SERVICE_DIR)
+from title_normalizer import clean_text, score_titles
+
+# --- SELECTOR CONFIGURATION ---
+# Define multiple selectors for resilience. The script will try them in order.
+SELECTORS = {
+    'Amazon.in': {
+        'search_result_link': [
+            "div[data-component-type='s-search-result'] a.a-link-normal.s-no-outline",
+            "div.s-result-item a.a-link-normal.s-no-outline",
+            "a.a-link-normal.s-underline-text.s-underline-link-text.s-link-style.a-text-normal"
+        ],
+        'price': [
+            "//*[@id='corePriceDisplay_desktop_feature_div']//span[contains(@class, 'a-price-whole')]", # XPath Stable ID
+            "//*[@id='corePrice_feature_div']//span[contains(@class, 'a-price-whole')]",              # XPath Stable ID variant
+            "div#corePriceDisplay_desktop_feature_div span.a-offscreen", # New Stable ID
+            "div#corePrice_feature_div span.a-offscreen",              # Another Stable ID variant
+            "span.a-price span.a-offscreen",           # Primary: Hidden accessible price
+            "span#priceblock_ourprice",                # Old standard
+            "span#priceblock_dealprice",               # Deal price
+            "span.a-price-whole",                      # Visible price part
+            "div[data-csa-c-content-id='price']"       # Data attribute fallback
+        ],
+        'title': [
+            "#productTitle",                           # Standard ID
+            "h1#title",                                # Alternative ID
+            "span#productTitle",                       # Span variant
+            "h1"                                       # Generic fallback (last resort)
+        ]
+    },
+    'Flipkart': {
+        'search_result_link': [
+            "a._1fQZEK",
+            "a.CGtC98",
+            "div._1AtVbE a[rel='noopener noreferrer']"
+        ],
+        'price': [
+            "div._30jeq3._16Jk6d",                     # Common class combo
+            "div._30jeq3",                             # Base class
+            "div.Nx9bqj",                              # Newer class (2024/2025)
+            "div.CxhGGd",                              # Another variant
+            "div[class*='_30jeq3']",                   # Partial match
+            "div[class*='Nx9bqj']"                     # Partial match new
+        ],
+        'title': [
+            "span.B_NuCI",                             # Common span class
+            "h1.yhB1nd",                               # H1 variant
+            "span[class*='B_NuCI']",                   # Partial match
+            "h1"                                       # Generic fallback
+        ]
+    }
+}
+
+# Inner price spans of Amazon's main price containers, tried before SELECTORS['Amazon.in']['price']
+AMAZON_PRICE_XPATHS = [
+    "//*[@id='corePriceDisplay_desktop_feature_div']//span[contains(@class,'a-offscreen')]",
+    "//*[@id='corePriceDisplay_desktop_feature_div']//span[contains(@class,'a-price-whole')]",
+    "//*[@id='corePrice_feature_div']//span[contains(@class,'a-offscreen')]",
+    "//*[@id='corePrice_feature_div']//span[contains(@class,'a-price-whole')]"
+]
+
+# Amazon search result cards and the per-card selectors, tried in order
+AMAZON_RESULT_CARD = "div[data-component-type='s-search-result']"
+AMAZON_CARD_TITLE_SELECTORS = ["h2 a span", "h2 span", ".a-size-medium"]
+AMAZON_CARD_PRICE_SELECTORS = ["span.a-price span.a-offscreen", "span.a-price-whole"]
+AMAZON_CARD_LINK_SELECTORS = ["h2 a", "a.a-link-normal.s-no-outline"]
+AMAZON_CARD_SPONSORED_SELECTORS = [".puis-label-popover-default", ".s-sponsored-label-text", ".puis-sponsored-label-text"]
+# Number of ranked offers returned with an Amazon result
+TOP_OFFERS = int(os.environ.get("SCRAPER_TOP_OFFERS", "5"))
+# Brands for which Amazon's brand filter (p_89) is applied to the search
+AMAZON_BRAND_FILTERS = ['dell', 'hp', 'lenovo', 'asus', 'acer', 'apple', 'samsung']
+
+# Site roots; overridable so scrapes can be pointed at a local server replaying recorded pages
+RETAILER_BASE_URLS = {
+    'Amazon.in': os.environ.get("SCRAPER_AMAZON_BASE_URL", "https://www.amazon.in"),
+    'Flipkart': os.environ.get("SCRAPER_FLIPKART_BASE_URL", "https://www.flipkart.com"),
+}
+
+# Minimum fuzzy score between the master title and the scraped title to accept a price
+MATCH_THRESHOLD = 95
+
+# --- PER-PHASE METRICS ---
+# Every scrape_product_data result carries "metrics": wall time per phase and counters
+SCRAPE_METRICS = os.environ.get("SCRAPER_METRICS", "on").lower() not in ("off", "0", "false")
+
+
+class ScrapeMetrics:
+    """
+    Wall time per phase and counters for one scrape. Phases can repeat (e.g. two page loads)
+    and accumulate; they may nest, so they need not add up to the total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t0
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self):
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+
+_active_metrics = threading.local()
+
+def current_metrics():
+    """The ScrapeMetrics of the scrape running on this thread (a throwaway one outside a scrape)."""
+    return getattr(_active_metrics, "metrics", None) or ScrapeMetrics()
+
+def set_active_metrics(metrics):
+    """Makes `metrics` the current_metrics() of this thread (None to clear it)."""
+    _active_metrics.metrics = metrics
+
+# --- PER-FETCH RATE LIMIT ---
+# A caller such as ScrapeScheduler installs its retailer's token bucket on the scraping thread;
+# every page fetch (HTTP or browser) then waits for a token, so a scrape that needs several
+# pages (search -> product page, or an HTTP attempt followed by the browser) pays for each.
+_fetch_limiter = threading.local()
+
+def set_fetch_limiter(acquire):
+    """Makes `acquire()` run before every page fetch on this thread (None to clear it)."""
+    _fetch_limiter.acquire = acquire
+
+def wait_for_fetch_slot():
+    acquire = getattr(_fetch_limiter, "acquire", None)
+    if acquire is not None:
+        with current_metrics().phase("rate_limit"):
+            acquire()
+
+# --- SCRAPING PROFILES ---
+# page_load_strategy: 'normal' waits for every subresource, 'eager' returns at DOMContentLoaded
+# block_resources: drop images, media, fonts and tracker requests (BLOCKED_URL_PATTERNS)
+# jitter: (min, max) anti-bot pause in seconds after each navigation; (0, 0) disables it
+# budget_seconds: total time a single scrape may take, or None for no limit
+PROFILES = {
+    # Full page loads and a fixed human-like pause on every page (the original behaviour)
+    'standard': {'page_load_strategy': 'normal', 'block_resources': False, 'jitter': (2, 4), 'budget_seconds': None},
+    # Stop at DOMContentLoaded, skip heavy resources and wait only for the elements we read
+    'lean': {'page_load_strategy': 'eager', 'block_resources': True, 'jitter': (0, 0), 'budget_seconds': 20},
+}
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.mp4", "*.webm", "*.m3u8", "*.mp3",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+    "*amazon-adsystem.com*", "*fls-eu.amazon.*", "*unagi.amazon.*", "*rt.flipkart.com*",
+]
+
+_profile = None
+
+def set_profile(name, budget_seconds=None, jitter=None):
+    """
+    Selects the scraping profile for the process, optionally overriding its latency budget
+    and jitter. Call before the first scrape: drivers already in the pool keep their settings.
+    """
+    global _profile
+    if name not in PROFILES:
+        raise ValueError(f"Unknown scraping profile '{name}'. Choose from: {', '.join(PROFILES)}")
+    profile = dict(PROFILES[name], name=name)
+    if budget_seconds is not None:
+        profile['budget_seconds'] = budget_seconds if budget_seconds > 0 else None
+    if jitter is not None:
+        profile['jitter'] = jitter
+    _profile = profile
+    return profile
+
+def parse_jitter(text):
+    """Parses "min,max" (or a single number for a fixed pause) into a (min, max) tuple of seconds."""
+    parts = [float(part) for part in text.split(",")]
+    return (parts[0], parts[-1])
+
+def get_profile():
+    """Returns the active profile, defaulting to SCRAPER_PROFILE / SCRAPER_BUDGET / SCRAPER_JITTER."""
+    if _profile is None:
+        budget = os.environ.get("SCRAPER_BUDGET")
+        jitter = os.environ.get("SCRAPER_JITTER")
+        set_profile(os.environ.get("SCRAPER_PROFILE", "standard"),
+                    float(budget) if budget else None,
+                    parse_jitter(jitter) if jitter else None)
+    return _profile
+
+
+def apply_profile_args(args):
+    """Strips --profile NAME, --budget SECONDS and --jitter MIN,MAX from args (in place) and applies them."""
+    options = {}
+    for flag in ("--profile", "--budget", "--jitter"):
+        if flag in args:
+            i = args.index(flag)
+            options[flag] = args[i + 1]
+            del args[i:i + 2]
+    if options:
+        set_profile(options.get("--profile", os.environ.get("SCRAPER_PROFILE", "standard")),
+                    float(options["--budget"]) if "--budget" in options else None,
+                    parse_jitter(options["--jitter"]) if "--jitter" in options else None)
+    return args
+
+
+class BudgetExceeded(Exception):
+    """Raised when a scrape has used up its profile's latency budget."""
+
+def start_deadline():
+    budget = get_profile()['budget_seconds']
+    return time.monotonic() + budget if budget else None
+
+def time_left(deadline, cap):
+    """Caps a wait timeout by the scrape's remaining budget; raises BudgetExceeded once it is spent."""
+    if deadline is None:
+        return cap
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise BudgetExceeded(f"Latency budget of {get_profile()['budget_seconds']}s exceeded.")
+    return min(cap, left)
+
+def is_bot_title(page_title):
+    return "Robot Check" in page_title or "Captcha" in page_title
+
+def clean_title_for_matching(title):
+    """
+    Removes common noise phrases from product titles to improve fuzzy matching accuracy.
+    Same rules as the matching service (ml_service/title_normalizer.py).
+    """
+    if not title:
+        return ""
+    return clean_text(title)
+
+def title_match_score(master_product_title, scraped_title):
+    """Fuzzy score (0-100) used to validate that a scraped title is the requested product."""
+    with current_metrics().phase("validation"):
+        return score_titles(master_product_title, scraped_title)
+
+def mismatch_error(retailer, master_product_title, scraped_title, match_score):
+    return {
+        "status": "error", 
+        "retailer": retailer, 
+        "message": f"Product mismatch detected. Score: {match_score}/100. Expected: '{master_product_title}', Found: '{scraped_title}'"
+    }
+
+def parse_card_price(price_text):
+    """Parses an Amazon card price like '₹45,990.00' into a whole-rupee float, or None."""
+    clean_price = price_text.replace("₹", "").replace(",", "").strip()
+    if "." in clean_price: clean_price = clean_price.split(".")[0]
+    
+    # Ensure it is a float
+    clean_price = re.sub(r"[^0-9.]", "", clean_price)
+    return float(clean_price) if clean_price else None
+
+def parse_page_price(price_text):
+    """Parses a product-page price (rupee symbol, commas, non-breaking spaces) into a float, or None."""
+    # Keep only digits and dots (handles rupee symbol, commas, non-breaking spaces)
+    cleaned_price = re.sub(r"[^0-9.]", "", price_text)
+    if cleaned_price == "":
+        return None
+    # Convert to float; many pages show whole numbers only
+    return float(cleaned_price)
+
+def build_amazon_search_url(query):
+    """Builds the Amazon search URL, adding the brand filter for known brands."""
+    # 1. Split the query into Brand and Product
+    query_parts = query.split(maxsplit=1)
+    
+    if len(query_parts) < 2:
+        # Handle generic query like "laptop"
+        brand = None
+    else:
+        brand = query_parts[0].lower() # e.g., 'dell'
+    
+    # 2. Construct Search URL with mandatory brand filtering (if possible)
+    base_url = f"{RETAILER_BASE_URLS['Amazon.in']}/s?k="
+    
+    if brand and brand in AMAZON_BRAND_FILTERS:
+        # Append brand filter. This parameter forces the search to the brand's category.
+        return f"{base_url}{query.replace(' ', '+')}&rh=p_89%3A{brand.title()}"
+    return f"{base_url}{query.replace(' ', '+')}"
+
+def rank_offers(cards, query, master_product_title=None, top_n=TOP_OFFERS):
+    """
+    Ranks search result cards as offers for the query. Cards without a price or without the
+    query's brand (the first word) in the title are dropped. With a master title every card
+    is scored against it and the best scores come first; ties, and all cards when there is
+    no master title, go to organic results before sponsored ones, then to page position.
+    Returns up to `top_n` offer dicts with a "score" (None without a master title).
+    """
+    required_brand = query.split()[0].lower()
+    offers = []
+    for card in cards:
+        if card['price'] is None or required_brand not in card['title'].lower():
+            continue
+        score = title_match_score(master_product_title, card['title']) if master_product_title else None
+        offers.append(dict(card, score=score))
+
+    offers.sort(key=lambda offer: (-(offer['score'] or 0), offer['sponsored'], offer['position']))
+    return offers[:top_n]
+
+def offers_result(retailer, url, offers, master_product_title=None):
+    """Builds the scrape result from ranked offers: the best one, validated against the master title."""
+    best = offers[0]
+    print(f"DEBUG: Best offer ({best['score']}): {best['title']}", file=sys.stderr)
+    if master_product_title and best['score'] < MATCH_THRESHOLD:
+        result = mismatch_error(retailer, master_product_title, best['title'], best['score'])
+        result["offers"] = offers
+        return result
+    return {"status": "success", "retailer": retailer, "title": best['title'], "price": best['price'], "url": url,
+            "product_url": best['url'], "match_score": best['score'], "offers": offers}
+
+def build_search_url(product_query, retailer):
+    """Returns the retailer's search URL for a query, or "" for unsupported retailers."""
+    if retailer == 'Amazon.in':
+        return f"{RETAILER_BASE_URLS['Amazon.in']}/s?k={product_query.replace(' ', '+')}"
+    elif retailer == 'Flipkart':
+        return f"{RETAILER_BASE_URLS['Flipkart']}/search?q={product_query.replace(' ', '+')}"
+    return ""
@@ -0,0 +1,205 @@
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from scraper import DriverPool, build_search_url, scrape_product_data, get_fetch_stats
+from scrape_cache import get_scrape_cache
+from scrape_common import apply_profile_args, get_profile, set_fetch_limiter
+
+# --- PER-RETAILER LIMITS ---
+# concurrency: browsers working on the retailer at once
+# rate/burst: token bucket, in page fetches per second and maximum burst
+# backoff: first pause (seconds) after a bot page, doubled on every further block
+RETAILER_LIMITS = {
+    'Amazon.in': {'concurrency': 2, 'rate': 0.5, 'burst': 2, 'backoff': 30},
+    'Flipkart': {'concurrency': 2, 'rate': 0.5, 'burst': 2, 'backoff': 30},
+}
+DEFAULT_LIMITS = {'concurrency': 1, 'rate': 0.2, 'burst': 1, 'backoff': 60}
+MAX_BLOCK_RETRIES = 2
+
+
+class TokenBucket:
+    """Thread-safe token bucket. penalize() pauses the whole bucket, e.g. after a captcha."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    wait = self._paused_until - now
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+
+class ScrapeScheduler:
+    """
+    Runs many (query, retailer) scrape jobs concurrently over one shared DriverPool while
+    respecting each retailer's concurrency cap and token-bucket rate limit. A bot page pauses
+    that retailer's bucket with exponential backoff and the job is retried; other retailers
+    keep going. Wall-clock time approaches the slowest retailer's queue, not the sum of fetches.
+    """
+
+    def __init__(self, limits=None, pool=None, cache=None):
+        self.limits = limits or RETAILER_LIMITS
+        # Fresh cache hits skip the rate limiter entirely; pass cache=False to always scrape
+        self.cache = get_scrape_cache() if cache is None else cache
+        total_concurrency = sum(l['concurrency'] for l in self.limits.values()) or 1
+        self.pool = pool or DriverPool(size=total_concurrency)
+        # One executor per retailer, sized to its concurrency cap, so a long Amazon queue
+        # never holds up Flipkart jobs
+        self._executors = {}
+        self._buckets = {}
+        self._backoff_level = {}
+        self._lock = threading.Lock()
+
+    def _retailer_state(self, retailer):
+        with self._lock:
+            if retailer not in self._executors:
+                limits = self.limits.get(retailer, DEFAULT_LIMITS)
+                self._executors[retailer] = ThreadPoolExecutor(max_workers=limits['concurrency'])
+                self._buckets[retailer] = TokenBucket(limits['rate'], limits['burst'])
+                self._backoff_level[retailer] = 0
+            return self._executors[retailer], self._buckets[retailer]
+
+    def run_job(self, job):
+        """Scrapes one job dict ({query, retailer, master_title?}) and returns the result dict."""
+        query = job.get("query")
+        retailer = job.get("retailer")
+        url = build_search_url(query or "", retailer)
+        if not query or not url:
+            return {"status": "error", "query": query, "retailer": retailer, "message": "Invalid query or retailer specified."}
+
+        start = time.perf_counter()
+        fetch = lambda: self._scrape_with_backoff(url, retailer, job.get("master_title"))
+        result = self.cache.get(query, retailer, job.get("master_title"), fetch) if self.cache else fetch()
+        result["query"] = query
+        result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+        return result
+
+    def _scrape_with_backoff(self, url, retailer, master_title):
+        _, bucket = self._retailer_state(retailer)
+        backoff = self.limits.get(retailer, DEFAULT_LIMITS)['backoff']
+
+        for attempt in range(MAX_BLOCK_RETRIES + 1):
+            # One token per page fetch, taken inside the scrape, not one per job
+            set_fetch_limiter(bucket.acquire)
+            try:
+                result = scrape_product_data(url, retailer, master_title, pool=self.pool)
+            finally:
+                set_fetch_limiter(None)
+
+            with self._lock:
+                if not result.get("blocked"):
+                    self._backoff_level[retailer] = 0
+                    break
+                level = self._backoff_level[retailer]
+                self._backoff_level[retailer] = level + 1
+            print(f"DEBUG: {retailer} blocked us, pausing {backoff * 2 ** level}s", file=sys.stderr)
+            bucket.penalize(backoff * 2 ** level)
+
+        result["attempts"] = attempt + 1
+        return result
+
+    def _run_and_report(self, job, on_result):
+        try:
+            result = self.run_job(job)
+        except Exception as e:
+            result = {"status": "error", "query": job.get("query"), "retailer": job.get("retailer"),
+                      "message": f"An unexpected error occurred: {str(e)}"}
+        on_result(result)
+
+    def run(self, jobs, on_result):
+        """
+        Runs every job and calls on_result(result) from worker threads as each one finishes.
+        Jobs that are not objects, and error items from _read_jobs, are reported right away
+        from the calling thread.
+        """
+        futures = []
+        for job in jobs:
+            if not isinstance(job, dict):
+                on_result({"status": "error", "message": "Each job must be a JSON object.", "job": job})
+                continue
+            if job.get("status") == "error":
+                on_result(job)
+                continue
+            executor, _ = self._retailer_state(job.get("retailer"))
+            futures.append(executor.submit(self._run_and_report, job, on_result))
+        for future in futures:
+            future.result()
+
+    def close(self):
+        if self.cache:
+            self.cache.wait_for_refreshes() # They scrape through this scheduler's pool and buckets
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self.pool.close()
+
+
+def _read_jobs(stream):
+    """NDJSON job objects; a line that is not valid JSON comes out as an error item."""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {"status": "error", "message": f"Invalid JSON on line {line_number}: {str(e)}", "line": line_number}
+
+def run_batch_cli(args):
+    """
+    Entry point for `scraper.py --batch <jobs.ndjson|-> [--profile NAME] [--budget SECONDS] [--jitter MIN,MAX]`.
+    Each input line is {"query": ..., "retailer": ..., "master_title": optional}; each result is
+    printed as one NDJSON line as soon as it finishes, and a summary goes to stderr.
+    """
+    args = apply_profile_args(list(args))
+    source = args[0] if args else "-"
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    write_lock = threading.Lock()
+    counts = {"jobs": 0, "success": 0}
+    start = time.perf_counter()
+
+    def emit(result):
+        with write_lock:
+            counts["jobs"] += 1
+            counts["success"] += result.get("status") == "success"
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+
+    scheduler = ScrapeScheduler()
+    try:
+        scheduler.run(_read_jobs(stream), emit)
+    finally:
+        scheduler.close()
+        if stream is not sys.stdin:
+            stream.close()
+
+    summary = dict(counts, wall_seconds=round(time.perf_counter() - start, 3), profile=get_profile(), fetch=get_fetch_stats())
+    if scheduler.cache:
+        summary["cache"] = scheduler.cache.stats()
+    print(json.dumps({"summary": summary}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    run_batch_cli(sys.argv[1:])
@@ -1,71 +1,56 @@
 import sys
+import os
 import json
-import re
 import time
 import random
-from thefuzz import fuzz
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException, JavascriptException
 from webdriver_manager.chrome import ChromeDriverManager
+from scrape_common import (
+    SELECTORS, AMAZON_PRICE_XPATHS, AMAZON_RESULT_CARD, RETAILER_BASE_URLS, MATCH_THRESHOLD,
+    SCRAPE_METRICS, ScrapeMetrics, current_metrics, set_active_metrics, wait_for_fetch_slot,
+    BLOCKED_URL_PATTERNS, set_profile, parse_jitter, get_profile, apply_profile_args, BudgetExceeded, start_deadline, time_left,
+    is_bot_title, title_match_score, mismatch_error, parse_page_price, build_amazon_search_url,
+    rank_offers, offers_result, build_search_url,
+)
+from static_scraper import scrape_static, parse_amazon_cards
 
-# --- SELECTOR CONFIGURATION ---
-# Define multiple selectors for resilience. The script will try them in order.
-SELECTORS = {
-    'Amazon.in': {
-        'search_result_link': [
-            "div[data-component-type='s-search-result'] a.a-link-normal.s-no-outline",
-            "div.s-result-item a.a-link-normal.s-no-outline",
-            "a.a-link-normal.s-underline-text.s-underline-link-text.s-link-style.a-text-normal"
-        ],
-        'price': [
-            "//*[@id='corePriceDisplay_desktop_feature_div']//span[contains(@class, 'a-price-whole')]", # XPath Stable ID
-            "//*[@id='corePrice_feature_div']//span[contains(@class, 'a-price-whole')]",              # XPath Stable ID variant
-            "div#corePriceDisplay_desktop_feature_div span.a-offscreen", # New Stable ID
-            "div#corePrice_feature_div span.a-offscreen",              # Another Stable ID variant
-            "span.a-price span.a-offscreen",           # Primary: Hidden accessible price
-            "span#priceblock_ourprice",                # Old standard
-            "span#priceblock_dealprice",               # Deal price
-            "span.a-price-whole",                      # Visible price part
-            "div[data-csa-c-content-id='price']"       # Data attribute fallback
-        ],
-        'title': [
-            "#productTitle",                           # Standard ID
-            "h1#title",                                # Alternative ID
-            "span#productTitle",                       # Span variant
-            "h1"                                       # Generic fallback (last resort)
-        ]
-    },
-    'Flipkart': {
-        'search_result_link': [
-            "a._1fQZEK",
-            "a.CGtC98",
-            "div._1AtVbE a[rel='noopener noreferrer']"
-        ],
-        'price': [
-            "div._30jeq3._16Jk6d",                     # Common class combo
-            "div._30jeq3",                             # Base class
-            "div.Nx9bqj",                              # Newer class (2024/2025)
-            "div.CxhGGd",                              # Another variant
-            "div[class*='_30jeq3']",                   # Partial match
-            "div[class*='Nx9bqj']"                     # Partial match new
-        ],
-        'title': [
-            "span.B_NuCI",                             # Common span class
-            "h1.yhB1nd",                               # H1 variant
-            "span[class*='B_NuCI']",                   # Partial match
-            "h1"                                       # Generic fallback
-        ]
-    }
-}
+# --- DRIVER POOL CONFIGURATION ---
+DRIVER_POOL_SIZE = int(os.environ.get("SCRAPER_POOL_SIZE", "2"))
+# Recycle a browser after this many page loads to cap Chrome's memory growth
+MAX_PAGES_PER_DRIVER = int(os.environ.get("SCRAPER_MAX_PAGES_PER_DRIVER", "50"))
+
+def anti_bot_pause(deadline=None):
+    """Sleeps for the profile's jitter, never past the deadline."""
+    low, high = get_profile()['jitter']
+    if high > 0:
+        with current_metrics().phase("jitter"):
+            time.sleep(time_left(deadline, random.uniform(low, high)))
+
+_chromedriver_path = None
+_chromedriver_path_lock = threading.Lock()
+
+def get_chromedriver_path():
+    """Resolves the chromedriver binary once per process (ChromeDriverManager checks versions on every install() call)."""
+    global _chromedriver_path
+    with _chromedriver_path_lock:
+        if _chromedriver_path is None:
+            _chromedriver_path = ChromeDriverManager().install()
+        return _chromedriver_path
 
 def initialize_driver():
-    """Initializes a stable, anti-detection Selenium Chrome driver."""
+    """Initializes a stable, anti-detection Selenium Chrome driver configured by the active profile."""
+    profile = get_profile()
     options = Options()
+    options.page_load_strategy = profile['page_load_strategy']
     options.add_argument("--headless=new")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
@@ -74,152 +59,411 @@ def initialize_driver():
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
+    if profile['block_resources']:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
     
     try:
         driver = webdriver.Chrome(
-            service=ChromeService(ChromeDriverManager().install()),
+            service=ChromeService(get_chromedriver_path()),
             options=options
         )
+        if profile['block_resources']:
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+            except Exception as e:
+                print(f"DEBUG: Could not block resources: {e}", file=sys.stderr)
         return driver
     except Exception as e:
         print(f"Driver initialization failed: {e}", file=sys.stderr)
         return None
 
-def find_resilient_element(driver, selectors, timeout=5):
+def load_page(driver, url, deadline=None):
     """
-    Tries a list of selectors until one is found and present in the DOM.
-    Returns the element if found, otherwise raises TimeoutException.
-    Supports both CSS Selectors and XPath.
+    Navigates to `url`, counting page loads so the pool can recycle long-lived browsers.
+    With a deadline, a page still loading when the budget runs out is stopped and used as-is;
+    the readiness waits decide whether it has what we need.
     """
-    for selector in selectors:
+    wait_for_fetch_slot()
+    if deadline is not None:
+        driver.set_page_load_timeout(time_left(deadline, 30))
+    driver.pages_loaded = getattr(driver, 'pages_loaded', 0) + 1
+    metrics = current_metrics()
+    metrics.count("pages_loaded")
+    with metrics.phase("navigation"):
         try:
-            wait = WebDriverWait(driver, timeout)
-            # Detect XPath (starts with / or parenthesis) vs CSS
-            if selector.startswith('/') or selector.startswith('('):
-                locator = (By.XPATH, selector)
-            else:
-                locator = (By.CSS_SELECTOR, selector)
-                
-            # Use presence_of_element_located instead of visibility to handle hidden elements like a-offscreen
-            element = wait.until(EC.presence_of_element_located(locator))
-            # print(f"DEBUG: Found element with selector: {selector}", file=sys.stderr) # Uncomment for debugging
-            return element
+            driver.get(url)
         except TimeoutException:
-            continue
-            
-    # If we exhaust the list without finding anything
-    raise TimeoutException(f"All specified selectors failed. Tried: {selectors}")
+            if deadline is None:
+                raise
+            driver.execute_script("window.stop();")
 
-def clean_title_for_matching(title):
+def is_bot_page(driver):
+    """Checks for a bot-detection page and flags the driver so the pool replaces it."""
+    if is_bot_title(driver.title):
+        driver.blocked = True
+        current_metrics().count("bot_blocks")
+        return True
+    return False
+
+
+class DriverPool:
     """
-    Removes common noise phrases from product titles to improve fuzzy matching accuracy.
+    A bounded pool of warm Chrome drivers shared by every scrape in the process.
+
+    acquire() hands out an idle browser (or starts one while under `size`), replacing any
+    that crashed while idle. release() wipes cookies/storage and extra tabs before the browser
+    is reused, and quits browsers that were flagged as blocked or have loaded
+    `max_pages_per_driver` pages.
     """
-    if not title:
-        return ""
-    # Remove "with MS Office", "MSO'24", "Backlit KB", etc.
-    noise_pattern = r"(MSO\'\d+|with MS Office|Backlit KB|Anti-Glare|FHD|Display|Windows \d+|Win \d+|Home|Student)"
-    return re.sub(noise_pattern, "", title, flags=re.IGNORECASE).strip()
 
-def scrape_amazon_search_page(driver, query):
+    def __init__(self, size=DRIVER_POOL_SIZE, max_pages_per_driver=MAX_PAGES_PER_DRIVER, factory=initialize_driver):
+        self.size = size
+        self.max_pages_per_driver = max_pages_per_driver
+        self._factory = factory
+        self._idle = queue.LifoQueue() # Most recently used first: its caches are the warmest
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _is_healthy(self, driver):
+        try:
+            driver.current_url # Any round trip fails if the browser or chromedriver died
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _reset(self, driver):
+        """Clears per-session browsing state so the next scrape starts clean."""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {}) # All domains, not just the current one
+        except Exception:
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def acquire(self, timeout=None):
+        """Returns a ready driver, or None if no browser could be started. Blocks while the pool is exhausted."""
+        if not self._slots.acquire(timeout=timeout):
+            return None
+
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._factory()
+                if driver is None:
+                    self._slots.release()
+                    return None
+                driver.pages_loaded = 0
+                driver.blocked = False
+                return driver
+
+            if self._is_healthy(driver):
+                return driver
+            self._quit(driver) # Crashed while idle: drop it and try the next one
+
+    def release(self, driver, discard=False):
+        """Returns a driver to the pool (or retires it) and frees its slot."""
+        if driver is None:
+            return
+        try:
+            retire = (discard or self._closed or getattr(driver, 'blocked', False)
+                      or getattr(driver, 'pages_loaded', 0) >= self.max_pages_per_driver)
+            if not retire:
+                try:
+                    self._reset(driver)
+                except Exception:
+                    retire = True # Crashed mid-scrape
+            if retire:
+                self._quit(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        finally:
+            if driver is not None:
+                self.release(driver)
+
+    def close(self):
+        """Quits every idle browser. Drivers still in use are quit when released."""
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_driver_pool():
+    """Returns the process-wide driver pool, created on first use and closed at exit."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = DriverPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+# --- SELECTOR HIT STATISTICS ---
+# Which selector matched, per retailer and field, persisted across runs so the selectors that
+# usually win are tried first. Set SCRAPER_SELECTOR_STATS=off to keep the configured order.
+SELECTOR_STATS_PATH = os.environ.get("SCRAPER_SELECTOR_STATS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "selector_stats.json"))
+SELECTOR_STATS_SAVE_INTERVAL = 30 # seconds between writes; the rest is flushed at exit
+
+
+class SelectorStats:
     """
-    Scrapes price directly from Amazon search results page to avoid bot detection on product pages.
+    Win counts for selectors, stored as {"<retailer>|<field>": {"<selector>": wins}} in a JSON file.
+    order() sorts a selector list by wins (most first); ties keep the configured order, so new
+    or never-matching selectors stay where SELECTORS put them.
     """
-    # 1. Split the query into Brand and Product
-    query_parts = query.split(maxsplit=1)
-    
-    if len(query_parts) < 2:
-        # Handle generic query like "laptop"
-        brand = None
-    else:
-        brand = query_parts[0].lower() # e.g., 'dell'
-    
-    # 2. Construct Search URL with mandatory brand filtering (if possible)
-    base_url = "https://www.amazon.in/s?k="
-    
-    if brand and brand in ['dell', 'hp', 'lenovo', 'asus', 'acer', 'apple', 'samsung']:
-        # Append brand filter. This parameter forces the search to the brand's category.
-        search_url = f"{base_url}{query.replace(' ', '+')}&rh=p_89%3A{brand.title()}"
-    else:
-        search_url = f"{base_url}{query.replace(' ', '+')}"
-        
+
+    def __init__(self, path=SELECTOR_STATS_PATH):
+        self.path = path
+        self._wins = None
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._wins is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._wins = json.load(f)
+            except (OSError, ValueError):
+                self._wins = {}
+        return self._wins
+
+    def order(self, key, selectors):
+        with self._lock:
+            wins = self._load().get(key, {})
+            return sorted(selectors, key=lambda selector: -wins.get(selector, 0))
+
+    def record(self, key, selector):
+        with self._lock:
+            wins = self._load().setdefault(key, {})
+            wins[selector] = wins.get(selector, 0) + 1
+            self._dirty = True
+            due = time.monotonic() - self._last_save >= SELECTOR_STATS_SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self._wins, indent=2, sort_keys=True)
+            self._dirty = False
+            self._last_save = time.monotonic()
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"DEBUG: Could not save selector stats: {e}", file=sys.stderr)
+
+
+_selector_stats = None
+_selector_stats_lock = threading.Lock()
+
+def get_selector_stats():
+    """Returns the process-wide SelectorStats (saved at exit), or None when disabled."""
+    global _selector_stats
+    if SELECTOR_STATS_PATH.lower() in ("off", "0", "false"):
+        return None
+    with _selector_stats_lock:
+        if _selector_stats is None:
+            _selector_stats = SelectorStats()
+            atexit.register(_selector_stats.save)
+        return _selector_stats
+
+# Evaluates every selector in one round trip and returns [index, element] for the first hit
+FIRST_MATCH_SCRIPT = """
+var selectors = arguments[0];
+for (var i = 0; i < selectors.length; i++) {
+    var selector = selectors[i], element = null;
+    try {
+        if (selector.charAt(0) === '/' || selector.charAt(0) === '(') {
+            element = document.evaluate(selector, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        } else {
+            element = document.querySelector(selector);
+        }
+    } catch (e) {}
+    if (element) return [i, element];
+}
+return null;
+"""
+
+def find_resilient_element(driver, selectors, timeout=5, stats_key=None):
+    """
+    Waits until any of the selectors is present in the DOM and returns the element of the
+    first one (in list order) that matches, otherwise raises TimeoutException.
+    Supports both CSS Selectors and XPath (starts with / or parenthesis).
+
+    All selectors are checked together on every poll, so the worst case is `timeout` for the
+    whole list rather than per selector. With a `stats_key` such as "Amazon.in|price", the list
+    is reordered by past wins and the winning selector is recorded.
+    """
+    stats = get_selector_stats() if stats_key else None
+    if stats:
+        selectors = stats.order(stats_key, selectors)
+
+    metrics = current_metrics()
+
+    def poll(d):
+        metrics.count("selector_polls")
+        return d.execute_script(FIRST_MATCH_SCRIPT, selectors)
+
+    try:
+        with metrics.phase("selector_wait"):
+            # Presence, not visibility, to handle hidden elements like a-offscreen
+            index, element = WebDriverWait(driver, timeout, ignored_exceptions=[JavascriptException]).until(poll)
+    except TimeoutException:
+        metrics.count("selectors_tried", len(selectors))
+        raise TimeoutException(f"All specified selectors failed. Tried: {selectors}")
+
+    metrics.count("selectors_tried", index + 1)
+
+    # print(f"DEBUG: Found element with selector: {selectors[index]}", file=sys.stderr) # Uncomment for debugging
+    if stats:
+        stats.record(stats_key, selectors[index])
+    return element
+
+def wait_for_page(driver, selectors, timeout):
+    """
+    Readiness check used instead of a fixed sleep: waits until one of `selectors` is present or
+    a bot-detection page is showing. Returns False on timeout.
+    """
+    try:
+        with current_metrics().phase("readiness_wait"):
+            WebDriverWait(driver, timeout, ignored_exceptions=[JavascriptException]).until(
+                lambda d: is_bot_title(d.title) or d.execute_script(FIRST_MATCH_SCRIPT, selectors)
+            )
+        return True
+    except TimeoutException:
+        return False
+
+def scrape_amazon_search_page(driver, query, deadline=None):
+    """
+    Scrapes prices directly from Amazon search results page to avoid bot detection on product pages.
+    Returns every result card (see static_scraper.parse_amazon_cards), or None on a bot page.
+    """
+    search_url = build_amazon_search_url(query)
     print(f"DEBUG: Tighter Amazon Search URL: {search_url}", file=sys.stderr)
     
-    driver.get(search_url)
-    time.sleep(random.uniform(2, 4))
+    load_page(driver, search_url, deadline)
+    anti_bot_pause(deadline)
+    # Wait for the result cards (or a captcha) rather than for the whole page
+    wait_for_page(driver, [AMAZON_RESULT_CARD], time_left(deadline, 10))
     
     # Check for Bot Block
-    if "Robot Check" in driver.title or "Captcha" in driver.title:
+    if is_bot_page(driver):
         print("DEBUG: Amazon blocked the request.", file=sys.stderr)
-        return None, None
+        return None
 
-    try:
-        wait = WebDriverWait(driver, 10)
-        
-        # Get ALL result cards
-        cards = wait.until(EC.presence_of_all_elements_located(
-            (By.CSS_SELECTOR, "div[data-component-type='s-search-result']")
-        ))
-        
-        # Determine the "Brand" we must find (e.g., "Dell" from "Dell Inspiron 15")
-        required_brand = query.split()[0].lower() 
+    # One page_source round trip, parsed by the same extractor as the static path
+    with current_metrics().phase("card_scan"):
+        cards = parse_amazon_cards(driver.page_source, driver.current_url)
+    if not cards:
+        print("DEBUG: No search result cards found.", file=sys.stderr)
+    return cards
 
-        for card in cards:
-            try:
-                # 1. Get Title
-                # Try multiple title selectors in case one fails
-                title_text = ""
-                for selector in ["h2 a span", "h2 span", ".a-size-medium"]:
-                    try:
-                        title_elm = card.find_element(By.CSS_SELECTOR, selector)
-                        title_text = title_elm.text
-                        if title_text: break
-                    except: continue
-                
-                if not title_text: continue
-
-                # --- 🛑 THE CRITICAL FIX: BRAND GATE ---
-                # If the user searched "Dell" and the title doesn't say "dell", SKIP IT.
-                if required_brand not in title_text.lower():
-                    print(f"DEBUG: Skipping Ad/Mismatch: {title_text}", file=sys.stderr)
-                    continue 
-                # ---------------------------------------
-
-                # 2. Get Price (Only if title passed the check)
-                price_text = ""
-                for selector in ["span.a-price span.a-offscreen", "span.a-price-whole"]:
-                    try:
-                        price_elm = card.find_element(By.CSS_SELECTOR, selector)
-                        price_text = price_elm.get_attribute("innerHTML") or price_elm.text
-                        if price_text: break
-                    except: continue
-                
-                if not price_text: continue
-
-                # If we get here, we found a DELL laptop with a PRICE.
-                print(f"DEBUG: Match Found! {title_text}", file=sys.stderr)
-                
-                clean_price = price_text.replace("₹", "").replace(",", "").strip()
-                if "." in clean_price: clean_price = clean_price.split(".")[0]
-                
-                # Ensure it is a float
-                clean_price = re.sub(r"[^0-9.]", "", clean_price)
-                    
-                return float(clean_price), title_text
-
-            except Exception:
-                continue
-        
-        return None, "No matching product found."
+# Try a plain HTTP fetch + lxml parse before starting a browser (see static_scraper.py)
+HTTP_FIRST = os.environ.get("SCRAPER_HTTP_FIRST", "on").lower() not in ("off", "0", "false")
 
-    except Exception as e:
-        print(f"DEBUG: Error: {e}", file=sys.stderr)
-        return None, None
+_fetch_stats = {"http": {"scrapes": 0, "seconds": 0.0}, "browser": {"scrapes": 0, "seconds": 0.0}, "http_fallbacks": {}}
+_fetch_stats_lock = threading.Lock()
+
+def _record_fetch(path, seconds, fallback_reason=None):
+    with _fetch_stats_lock:
+        _fetch_stats[path]["scrapes"] += 1
+        _fetch_stats[path]["seconds"] += seconds
+        if fallback_reason:
+            _fetch_stats["http_fallbacks"][fallback_reason] = _fetch_stats["http_fallbacks"].get(fallback_reason, 0) + 1
+
+def get_fetch_stats():
+    """Share of scrapes served by the HTTP fast path and mean latency of each path."""
+    with _fetch_stats_lock:
+        http, browser = _fetch_stats["http"], _fetch_stats["browser"]
+        total = http["scrapes"] + browser["scrapes"]
+        return {
+            "scrapes": total,
+            "http_fraction": round(http["scrapes"] / total, 3) if total else None,
+            "http_mean_seconds": round(http["seconds"] / http["scrapes"], 3) if http["scrapes"] else None,
+            "browser_mean_seconds": round(browser["seconds"] / browser["scrapes"], 3) if browser["scrapes"] else None,
+            "http_fallbacks": dict(_fetch_stats["http_fallbacks"]),
+        }
+
+def scrape_product_data(url, retailer, master_product_title=None, pool=None):
+    """
+    Scrapes price and title for a product. The static HTTP path is tried first; a browser
+    from `pool` (the process-wide DriverPool by default) is only used when the static page
+    has no price or is a bot page. Results carry "fetch_path": "http" or "browser", and
+    results from a bot-detection page carry "blocked": True so callers can back off.
+    Browser waits are capped by the active profile's latency budget (see PROFILES).
+    Results also carry "metrics": per-phase timings and counters (see ScrapeMetrics).
+    """
+    metrics = ScrapeMetrics()
+    set_active_metrics(metrics)
+    try:
+        result = _scrape_product_data(url, retailer, master_product_title, pool)
+    finally:
+        set_active_metrics(None)
+    if SCRAPE_METRICS:
+        result["metrics"] = metrics.as_dict()
+    return result
+
+def _scrape_product_data(url, retailer, master_product_title, pool):
+    start = time.perf_counter()
+    deadline = start_deadline()
+    fallback_reason = None
+    if HTTP_FIRST:
+        with current_metrics().phase("http_path"):
+            result, fallback_reason = scrape_static(url, retailer, master_product_title)
+        if result is not None:
+            result["fetch_path"] = "http"
+            _record_fetch("http", time.perf_counter() - start)
+            return result
 
-def scrape_product_data(url, retailer, master_product_title=None):
-    driver = initialize_driver()
+    pool = pool or get_driver_pool()
+    with current_metrics().phase("driver_acquire"):
+        driver = pool.acquire()
     if driver is None:
         return {"status": "error", "retailer": retailer, "message": "WebDriver initialization failed."}
-    
+
+    try:
+        result = _scrape_with_driver(driver, url, retailer, master_product_title, deadline)
+        if getattr(driver, 'blocked', False):
+            result["blocked"] = True
+        result["fetch_path"] = "browser"
+        # Includes the failed static attempt: that is the real cost of a fallback
+        _record_fetch("browser", time.perf_counter() - start, fallback_reason)
+        return result
+    finally:
+        pool.release(driver)
+
+def _scrape_with_driver(driver, url, retailer, master_product_title, deadline=None):
     try:
         # --- SPECIAL HANDLING FOR AMAZON ---
         if retailer == 'Amazon.in':
@@ -229,141 +473,106 @@ def scrape_product_data(url, retailer, master_product_title=None):
             # If url was passed, we might ignore it in favor of search page scraping for stability
             # But let's try to extract query from the url if possible, or just use the master title
             
-            price, title = scrape_amazon_search_page(driver, query)
-            
-            if price and title:
-                 # --- FUZZY MATCHING VALIDATION ---
-                if master_product_title:
-                    cleaned_master = clean_title_for_matching(master_product_title)
-                    cleaned_scraped = clean_title_for_matching(title)
-                    match_score = fuzz.token_set_ratio(cleaned_master.lower(), cleaned_scraped.lower())
-                    
-                    if match_score < 95:
-                        return {
-                            "status": "error", 
-                            "retailer": retailer, 
-                            "message": f"Product mismatch detected. Score: {match_score}/100. Expected: '{master_product_title}', Found: '{title}'"
-                        }
-
-                return {"status": "success", "retailer": retailer, "title": title, "price": price, "url": url}
+            cards = scrape_amazon_search_page(driver, query, deadline)
+            offers = rank_offers(cards or [], query, master_product_title)
+            if offers:
+                # --- FUZZY MATCHING VALIDATION --- (every card is scored, the best one wins)
+                return offers_result(retailer, url, offers, master_product_title)
             else:
                  return {"status": "error", "retailer": retailer, "message": "Could not find valid product on Amazon search page."}
 
         # --- STANDARD LOGIC FOR FLIPKART ---
-        driver.get(url)
+        # Get the list of selectors for the current retailer
+        retailer_selectors = SELECTORS.get(retailer)
+        if not retailer_selectors:
+             return {"status": "error", "retailer": retailer, "message": f"Retailer '{retailer}' not supported."}
+
+        load_page(driver, url, deadline)
         
         # --- ANTI-BOT DELAY & CHECK ---
-        time.sleep(random.uniform(2, 4))
+        anti_bot_pause(deadline)
+        wait_for_page(driver, retailer_selectors['search_result_link'] + retailer_selectors['price'], time_left(deadline, 10))
         # print(f"DEBUG: Current Page Title is: {driver.title}", file=sys.stderr)
         
-        if "Robot Check" in driver.title or "Captcha" in driver.title:
+        if is_bot_page(driver):
              return {"status": "error", "retailer": retailer, "message": "Amazon detected a bot! Try changing User-Agent or IP."}
 
-        # Get the list of selectors for the current retailer
-        retailer_selectors = SELECTORS.get(retailer)
-        if not retailer_selectors:
-             return {"status": "error", "retailer": retailer, "message": f"Retailer '{retailer}' not supported."}
-
         # --- NAVIGATION LOGIC: Search Page -> Product Page ---
         # If we are on a search page (which we are, based on the URL construction), we need to click the first result.
         try:
             # Try to find a product link using the search_result_link selectors
-            product_link_element = find_resilient_element(driver, retailer_selectors.get('search_result_link', []), timeout=10)
+            product_link_element = find_resilient_element(driver, retailer_selectors.get('search_result_link', []), timeout=time_left(deadline, 10), stats_key=f"{retailer}|search_result_link")
             product_url = product_link_element.get_attribute('href')
             # print(f"DEBUG: Navigating to product page: {product_url}", file=sys.stderr)
-            driver.get(product_url)
+            load_page(driver, product_url, deadline)
         except TimeoutException:
             # If we can't find a product link, maybe we are already on a product page or the search failed.
             # We'll proceed to try scraping price/title from the current page, just in case.
             pass 
 
-        # Use the resilient finder for price. For Amazon, prefer XPath inside the stable price container,
-        # then fall back to the generic selectors list if XPath fails.
+        # Use the resilient finder for price: one combined wait over every known selector/XPath
         try:
-            price_element = None
+            price_selectors = retailer_selectors['price']
             if retailer == 'Amazon.in':
-                # Try several XPath variants that target the main price containers and inner spans.
-                amazon_xpaths = [
-                    "//*[@id='corePriceDisplay_desktop_feature_div']//span[contains(@class,'a-offscreen')]",
-                    "//*[@id='corePriceDisplay_desktop_feature_div']//span[contains(@class,'a-price-whole')]",
-                    "//*[@id='corePrice_feature_div']//span[contains(@class,'a-offscreen')]",
-                    "//*[@id='corePrice_feature_div']//span[contains(@class,'a-price-whole')]"
-                ]
-
-                for xp in amazon_xpaths:
-                    try:
-                        price_element = WebDriverWait(driver, 10).until(
-                            EC.presence_of_element_located((By.XPATH, xp))
-                        )
-                        break
-                    except TimeoutException:
-                        continue
-
-                # If XPath attempts didn't find anything, fall back to general selectors
-                if price_element is None:
-                    price_element = find_resilient_element(driver, retailer_selectors['price'])
-            else:
-                price_element = find_resilient_element(driver, retailer_selectors['price'])
+                # Prefer the inner spans of the main price containers, then the general selectors
+                price_selectors = AMAZON_PRICE_XPATHS + price_selectors
+            price_element = find_resilient_element(driver, price_selectors, timeout=time_left(deadline, 10), stats_key=f"{retailer}|price")
 
             price_text = price_element.get_attribute('innerHTML') or price_element.text
-            # Keep only digits and dots (handles rupee symbol, commas, non-breaking spaces)
-            cleaned_price = re.sub(r"[^0-9.]", "", price_text)
-            if cleaned_price == "":
+            final_price = parse_page_price(price_text)
+            if final_price is None:
                 raise TimeoutException("Price text empty or not parsable")
-            # Convert to float; many pages show whole numbers only
-            final_price = float(cleaned_price)
         except TimeoutException:
              return {"status": "error", "retailer": retailer, "message": "Could not find price element using any known selector or XPath."}
 
         # Use the resilient finder for title (using presence instead of visibility for title is sometimes safer, but visibility is good for now)
         try:
             # For title, we can reuse the same logic, or create a separate one if we want to check for presence only
-            title_element = find_resilient_element(driver, retailer_selectors['title'])
+            title_element = find_resilient_element(driver, retailer_selectors['title'], timeout=time_left(deadline, 5), stats_key=f"{retailer}|title")
             title_text = title_element.text.strip()
-        except TimeoutException:
+        except (TimeoutException, BudgetExceeded):
              title_text = "Title not found" # Non-critical failure
 
         # --- FUZZY MATCHING VALIDATION ---
         if master_product_title and title_text != "Title not found":
-            # Pre-process titles for better comparison
-            cleaned_master = clean_title_for_matching(master_product_title)
-            cleaned_scraped = clean_title_for_matching(title_text)
-            
-            match_score = fuzz.token_set_ratio(cleaned_master.lower(), cleaned_scraped.lower())
+            match_score = title_match_score(master_product_title, title_text)
             # print(f"DEBUG: Fuzzy Match Score: {match_score} (Master: '{master_product_title}' vs Scraped: '{title_text}')", file=sys.stderr)
             
-            if match_score < 95:
-                return {
-                    "status": "error", 
-                    "retailer": retailer, 
-                    "message": f"Product mismatch detected. Score: {match_score}/100. Expected: '{master_product_title}', Found: '{title_text}'"
-                }
+            if match_score < MATCH_THRESHOLD:
+                return mismatch_error(retailer, master_product_title, title_text, match_score)
 
         return {"status": "success", "retailer": retailer, "title": title_text, "price": final_price, "url": url}
 
+    except BudgetExceeded as e:
+        return {"status": "error", "retailer": retailer, "message": str(e)}
     except Exception as e:
         return {"status": "error", "retailer": retailer, "message": f"An unexpected error occurred: {str(e)}"}
-    finally:
-        if driver:
-            driver.quit()
 
 if __name__ == "__main__":
-    if len(sys.argv) > 2:
-        product_query = sys.argv[1]
-        retailer = sys.argv[2]
-        master_product_title = sys.argv[3] if len(sys.argv) > 3 else None
+    # Single scrape: scraper.py <product_query> <retailer> [master_product_title]
+    # Batch mode:    scraper.py --batch <jobs.ndjson|-> (see scrape_scheduler.py)
+    # Options:       --profile standard|lean  --budget SECONDS  --jitter MIN,MAX
+    argv = sys.argv[1:]
+    if "--batch" in argv:
+        # run_batch_cli applies the profile options itself, to the modules the scheduler scrapes with
+        from scrape_scheduler import run_batch_cli
+        argv.remove("--batch")
+        run_batch_cli(argv)
+    elif len(apply_profile_args(argv)) > 1:
+        product_query = argv[0]
+        retailer = argv[1]
+        master_product_title = argv[2] if len(argv) > 2 else None
         
-        if retailer == 'Amazon.in':
-            url = f"https://www.amazon.in/s?k={product_query.replace(' ', '+')}"
-        elif retailer == 'Flipkart':
-            url = f"https://www.flipkart.com/search?q={product_query.replace(' ', '+')}"
-        else:
-            url = ""
+        url = build_search_url(product_query, retailer)
 
         if url:
-            result = scrape_product_data(url, retailer, master_product_title)
-            print(json.dumps(result))
+            from scrape_cache import get_scrape_cache
+            cache = get_scrape_cache()
+            fetch = lambda: scrape_product_data(url, retailer, master_product_title)
+            result = cache.get(product_query, retailer, master_product_title, fetch) if cache else fetch()
+            # Print before exiting: a stale hit's background refresh finishes at exit
+            print(json.dumps(result), flush=True)
         else:
             print(json.dumps({"status": "error", "message": "Invalid retailer specified."}))
     else:
-        print(json.dumps({"status": "error", "message": "Usage: scraper.py <product_query> <retailer> [master_product_title]"}))
\ No newline at end of file
+        print(json.dumps({"status": "error", "message": "Usage: scraper.py <product_query> <retailer> [master_product_title] | scraper.py --batch <jobs.ndjson|-> [--profile standard|lean] [--budget SECONDS] [--jitter MIN,MAX]"}))
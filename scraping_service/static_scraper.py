@@ -0,0 +1,171 @@
+import sys
+import threading
+from urllib.parse import urljoin
+import urllib3
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+from scrape_common import (
+    SELECTORS, AMAZON_RESULT_CARD, AMAZON_CARD_TITLE_SELECTORS, AMAZON_CARD_PRICE_SELECTORS,
+    AMAZON_CARD_LINK_SELECTORS, AMAZON_CARD_SPONSORED_SELECTORS,
+    MATCH_THRESHOLD, build_amazon_search_url, parse_card_price, parse_page_price,
+    is_bot_title, title_match_score, mismatch_error, current_metrics, wait_for_fetch_slot, rank_offers, offers_result,
+)
+
+# Same identity as the Selenium driver, so both paths get the same pages
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-IN,en;q=0.9",
+}
+
+# One pooled, keep-alive client for the whole process (urllib3 is thread-safe)
+_http = urllib3.PoolManager(
+    num_pools=8,
+    maxsize=8,
+    headers=HTTP_HEADERS,
+    timeout=urllib3.Timeout(connect=5, read=10),
+    retries=urllib3.Retry(total=1, backoff_factor=0.5, status_forcelist=[502, 504]),
+)
+
+_css_cache = {}
+_css_cache_lock = threading.Lock()
+
+
+def _select(tree, selector):
+    """Runs a CSS selector or XPath (starts with / or parenthesis) against an lxml tree."""
+    if selector.startswith('/') or selector.startswith('('):
+        return tree.xpath(selector)
+    with _css_cache_lock:
+        compiled = _css_cache.get(selector)
+        if compiled is None:
+            compiled = _css_cache[selector] = CSSSelector(selector)
+    return compiled(tree)
+
+def find_static_element(tree, selectors):
+    """
+    Static counterpart of find_resilient_element: returns the first element matched by
+    the selectors, tried in order, or None.
+    """
+    metrics = current_metrics()
+    for selector in selectors:
+        metrics.count("selectors_tried")
+        matches = _select(tree, selector)
+        if matches:
+            return matches[0]
+    return None
+
+def element_text(element):
+    return " ".join(element.text_content().split())
+
+def fetch_page(url):
+    """Fetches a page over the pooled client. Returns (tree, final_url, page_title) or raises."""
+    wait_for_fetch_slot()
+    metrics = current_metrics()
+    metrics.count("http_requests")
+    with metrics.phase("http_fetch"):
+        response = _http.request("GET", url, redirect=True)
+    if response.status >= 400 and response.status != 503: # Amazon serves its captcha page as a 503
+        raise urllib3.exceptions.HTTPError(f"HTTP {response.status}")
+    with metrics.phase("html_parse"):
+        tree = lxml_html.fromstring(response.data)
+    title_element = tree.find(".//title")
+    page_title = title_element.text_content() if title_element is not None else ""
+    # geturl() may be a bare path after redirects; resolve it against the requested URL
+    return tree, urljoin(url, response.geturl() or url), page_title
+
+def extract_amazon_cards(tree, page_url):
+    """
+    Pulls every search result card out of a parsed Amazon results page in one pass.
+    Returns [{title, price, url, sponsored, position}]; price is None when a card has none.
+    """
+    cards = []
+    metrics = current_metrics()
+    for position, card in enumerate(_select(tree, AMAZON_RESULT_CARD)):
+        metrics.count("cards_scanned")
+        title_element = find_static_element(card, AMAZON_CARD_TITLE_SELECTORS)
+        title_text = element_text(title_element) if title_element is not None else ""
+        if not title_text:
+            continue
+        price_element = find_static_element(card, AMAZON_CARD_PRICE_SELECTORS)
+        link_element = find_static_element(card, AMAZON_CARD_LINK_SELECTORS)
+        href = link_element.get('href') if link_element is not None else None
+        cards.append({
+            "title": title_text,
+            "price": parse_card_price(element_text(price_element)) if price_element is not None else None,
+            "url": urljoin(page_url, href) if href else None,
+            "sponsored": find_static_element(card, AMAZON_CARD_SPONSORED_SELECTORS) is not None,
+            "position": position,
+        })
+    return cards
+
+def parse_amazon_cards(page_source, page_url):
+    """extract_amazon_cards for HTML text, e.g. a browser's page_source."""
+    return extract_amazon_cards(lxml_html.fromstring(page_source), page_url)
+
+def _scrape_amazon_static(url, master_product_title):
+    # Same query as scrape_amazon_search_page; every card is ranked, not just the first one
+    query = master_product_title if master_product_title else "laptop"
+    search_url = build_amazon_search_url(query)
+    tree, final_url, page_title = fetch_page(search_url)
+    if is_bot_title(page_title):
+        return None, "bot_page"
+
+    offers = rank_offers(extract_amazon_cards(tree, final_url), query, master_product_title)
+    if not offers:
+        return None, "no_price"
+    return offers_result('Amazon.in', url, offers, master_product_title), None
+
+def _scrape_flipkart_static(url):
+    selectors = SELECTORS['Flipkart']
+    tree, final_url, page_title = fetch_page(url)
+    if is_bot_title(page_title):
+        return None, "bot_page"
+
+    # Search page -> product page, like the browser path
+    link = find_static_element(tree, selectors['search_result_link'])
+    if link is not None and link.get('href'):
+        tree, _, page_title = fetch_page(urljoin(final_url, link.get('href')))
+        if is_bot_title(page_title):
+            return None, "bot_page"
+
+    price_element = find_static_element(tree, selectors['price'])
+    price = parse_page_price(element_text(price_element)) if price_element is not None else None
+    if price is None:
+        return None, "no_price"
+
+    title_element = find_static_element(tree, selectors['title'])
+    title_text = element_text(title_element) if title_element is not None else "Title not found"
+    return (price, title_text), None
+
+def scrape_static(url, retailer, master_product_title=None):
+    """
+    Fast path for scrape_product_data: plain HTTP fetch + lxml parse with the same SELECTORS.
+    Returns (result, None) when the static page was enough, or (None, reason) when the caller
+    should fall back to the browser (no price found, bot page, unsupported retailer, network error).
+    """
+    try:
+        if retailer == 'Amazon.in':
+            result, reason = _scrape_amazon_static(url, master_product_title)
+            if result is None and reason == "bot_page":
+                current_metrics().count("bot_blocks")
+            return result, reason
+        elif retailer == 'Flipkart':
+            found, reason = _scrape_flipkart_static(url)
+        else:
+            return None, "unsupported_retailer"
+    except Exception as e:
+        print(f"DEBUG: Static fetch failed, falling back to browser: {e}", file=sys.stderr)
+        return None, "fetch_error"
+
+    if found is None:
+        if reason == "bot_page":
+            current_metrics().count("bot_blocks")
+        return None, reason
+
+    price, title_text = found
+    if master_product_title and title_text != "Title not found":
+        match_score = title_match_score(master_product_title, title_text)
+        if match_score < MATCH_THRESHOLD:
+            return mismatch_error(retailer, master_product_title, title_text, match_score), None
+
+    return {"status": "success", "retailer": retailer, "title": title_text, "price": price, "url": url}, None
@@ -0,0 +1,41 @@
+import pytest
+import scrape_common
+from scraper import DriverPool
+from scrape_scheduler import ScrapeScheduler
+from benchmark_scraper import start_fixture_server
+
+# Run with: python -m pytest scraping_service
+
+
+@pytest.fixture
+def scheduler():
+    server, base_url = start_fixture_server()
+    saved = dict(scrape_common.RETAILER_BASE_URLS)
+    scrape_common.RETAILER_BASE_URLS.update({'Amazon.in': base_url, 'Flipkart': base_url})
+    # A slow refill, so the tokens left show how many fetches each job paid for
+    limits = {retailer: {'concurrency': 1, 'rate': 0.001, 'burst': 10, 'backoff': 1} for retailer in ('Amazon.in', 'Flipkart')}
+    scheduler = ScrapeScheduler(limits, pool=DriverPool(size=1, factory=lambda: None), cache=False)
+    yield scheduler
+    scheduler.close()
+    scrape_common.RETAILER_BASE_URLS.update(saved)
+    server.shutdown()
+
+def tokens_spent(scheduler, retailer):
+    return round(10 - scheduler._buckets[retailer]._tokens)
+
+def test_every_page_fetch_takes_a_token(scheduler):
+    # Flipkart's HTTP path fetches the search page, then the product page
+    result = scheduler.run_job({"query": "Dell Inspiron 15 3520", "retailer": "Flipkart"})
+    assert result["status"] == "success"
+    assert result["metrics"]["counters"]["http_requests"] == 2
+    assert tokens_spent(scheduler, "Flipkart") == 2
+
+    result = scheduler.run_job({"query": "Dell Inspiron 15 3520", "retailer": "Amazon.in",
+                                "master_title": "Dell Inspiron 15 3520 Laptop"})
+    assert result["status"] == "success"
+    assert tokens_spent(scheduler, "Amazon.in") == 1
+
+def test_rate_limit_is_off_outside_the_scheduler(scheduler):
+    scheduler.run_job({"query": "Dell Inspiron 15 3520", "retailer": "Flipkart"})
+    scrape_common.wait_for_fetch_slot() # No limiter installed on this thread any more
+    assert tokens_spent(scheduler, "Flipkart") == 2
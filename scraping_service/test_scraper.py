@@ -0,0 +1,153 @@
+import os
+from urllib.parse import urljoin, urlsplit
+import pytest
+from lxml import html as lxml_html
+import scrape_common
+import scraper
+import static_scraper
+from benchmark_scraper import FIXTURES_DIR, FixtureHandler, fixture_name, start_fixture_server
+from scrape_common import SELECTORS, ScrapeMetrics, set_active_metrics, build_search_url
+from scraper import SelectorStats, FIRST_MATCH_SCRIPT, find_resilient_element, scrape_product_data
+
+# Run with: python -m pytest scraping_service
+FLIPKART_PRICE_DIV = "<div class=\"Nx9bqj CxhGGd\">&#8377;50,990</div>".encode()
+
+
+class NoPriceHandler(FixtureHandler):
+    """Serves the Flipkart product page without its price, as if the price were rendered by script."""
+
+    def page(self, name):
+        body = super().page(name)
+        return body.replace(FLIPKART_PRICE_DIV, b"") if name == "flipkart_product.html" else body
+
+
+class FixtureElement:
+    def __init__(self, element, page_url):
+        self._element = element
+        self._page_url = page_url
+
+    @property
+    def text(self):
+        return static_scraper.element_text(self._element)
+
+    def get_attribute(self, name):
+        if name == "innerHTML":
+            return self.text
+        value = self._element.get(name)
+        return urljoin(self._page_url, value) if name == "href" and value else value # Browsers resolve links
+
+
+class FixtureDriver:
+    """Stands in for Chrome: 'renders' the full recorded pages from fixtures/ and runs selectors with lxml."""
+
+    def __init__(self):
+        self.current_url = "about:blank"
+        self.title = ""
+        self._tree = lxml_html.fromstring("<html></html>")
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def get(self, url):
+        with open(os.path.join(FIXTURES_DIR, fixture_name(urlsplit(url).path)), "rb") as f:
+            self._tree = lxml_html.fromstring(f.read())
+        self.current_url = url
+        title = self._tree.find(".//title")
+        self.title = title.text_content() if title is not None else ""
+
+    @property
+    def page_source(self):
+        return lxml_html.tostring(self._tree, encoding="unicode")
+
+    def execute_script(self, script, *args):
+        assert script == FIRST_MATCH_SCRIPT
+        for index, selector in enumerate(args[0]):
+            matches = static_scraper._select(self._tree, selector)
+            if matches:
+                return [index, FixtureElement(matches[0], self.current_url)]
+        return None
+
+
+class CountingPool:
+    """A one-driver pool that counts how often a browser was needed."""
+
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self, timeout=None):
+        self.acquired += 1
+        return FixtureDriver()
+
+    def release(self, driver, discard=False):
+        pass
+
+def serve(monkeypatch, handler=FixtureHandler):
+    server, base_url = start_fixture_server(handler=handler)
+    for retailer in ("Amazon.in", "Flipkart"):
+        monkeypatch.setitem(scrape_common.RETAILER_BASE_URLS, retailer, base_url)
+    return server
+
+@pytest.fixture(autouse=True)
+def quiet_scraper(tmp_path, monkeypatch):
+    # No anti-bot pauses, and selector wins go to a throwaway file
+    monkeypatch.setattr(scrape_common, "_profile", dict(scrape_common.PROFILES["standard"], name="standard", jitter=(0, 0)))
+    monkeypatch.setattr(scraper, "HTTP_FIRST", True)
+    monkeypatch.setattr(scraper, "SELECTOR_STATS_PATH", str(tmp_path / "selector_stats.json"))
+    monkeypatch.setattr(scraper, "_selector_stats", SelectorStats(str(tmp_path / "selector_stats.json")))
+
+@pytest.mark.parametrize("retailer, master_title", [("Amazon.in", "Dell Inspiron 15 3520 Laptop"), ("Flipkart", None)])
+def test_static_page_is_enough(monkeypatch, retailer, master_title):
+    server = serve(monkeypatch)
+    try:
+        pool = CountingPool()
+        result = scrape_product_data(build_search_url("Dell Inspiron 15 3520", retailer), retailer, master_title, pool=pool)
+    finally:
+        server.shutdown()
+    assert result["status"] == "success"
+    assert result["fetch_path"] == "http"
+    assert result["price"] > 0
+    assert pool.acquired == 0
+
+def test_missing_static_price_falls_back_to_the_browser(monkeypatch):
+    server = serve(monkeypatch, NoPriceHandler)
+    try:
+        assert static_scraper.scrape_static(build_search_url("Dell Inspiron 15 3520", "Flipkart"), "Flipkart") == (None, "no_price")
+        pool = CountingPool()
+        result = scrape_product_data(build_search_url("Dell Inspiron 15 3520", "Flipkart"), "Flipkart", pool=pool)
+    finally:
+        server.shutdown()
+    assert pool.acquired == 1
+    assert result["fetch_path"] == "browser"
+    assert (result["status"], result["price"]) == ("success", 50990.0)
+    assert result["title"].startswith("DELL Inspiron 3520 Intel Core i5 12th Gen 1235U")
+    assert result["metrics"]["counters"]["http_requests"] == 2
+    assert result["metrics"]["counters"]["pages_loaded"] == 2
+
+def test_selector_stats_order_by_wins_and_persist(tmp_path):
+    selectors = ["a", "b", "c"]
+    stats = SelectorStats(str(tmp_path / "stats.json"))
+    assert stats.order("Flipkart|price", selectors) == selectors
+    for _ in range(2):
+        stats.record("Flipkart|price", "c")
+    stats.record("Flipkart|price", "b")
+    assert stats.order("Flipkart|price", selectors) == ["c", "b", "a"]
+    assert stats.order("Flipkart|title", selectors) == selectors # Other keys keep the configured order
+    stats.save()
+    assert SelectorStats(str(tmp_path / "stats.json")).order("Flipkart|price", selectors) == ["c", "b", "a"]
+
+def test_find_resilient_element_moves_the_winning_selector_first():
+    driver = FixtureDriver()
+    driver.get("http://fixtures/search?q=dell")
+    selectors = SELECTORS["Flipkart"]["search_result_link"] # The fixture page only matches the second one
+    tried = []
+    for _ in range(3):
+        metrics = ScrapeMetrics()
+        set_active_metrics(metrics)
+        try:
+            element = find_resilient_element(driver, selectors, timeout=1, stats_key="Flipkart|search_result_link")
+        finally:
+            set_active_metrics(None)
+        assert "/p/" in element.get_attribute("href")
+        tried.append(metrics.as_dict()["counters"]["selectors_tried"])
+    assert tried == [2, 1, 1]
+    assert scraper.get_selector_stats().order("Flipkart|search_result_link", selectors)[0] == selectors[1]
@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+from benchmark_scraper import start_fixture_server
+
+# Run with: python -m pytest scraping_service
+SCRAPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraper.py")
+
+
+@pytest.fixture
+def fixture_site():
+    server, base_url = start_fixture_server()
+    yield base_url
+    server.shutdown()
+
+def run_cli(base_url, *args, stdin=None, with_stderr=False):
+    env = dict(os.environ, SCRAPER_AMAZON_BASE_URL=base_url, SCRAPER_FLIPKART_BASE_URL=base_url,
+               SCRAPER_CACHE="off", SCRAPER_SELECTOR_STATS="off", SCRAPER_METRICS="on")
+    completed = subprocess.run([sys.executable, SCRAPER_PATH, *args], input=stdin, env=env,
+                               capture_output=True, text=True, timeout=60)
+    results = [json.loads(line) for line in completed.stdout.splitlines() if line.strip()]
+    return (results, completed.stderr) if with_stderr else results
+
+def test_cli_http_path_reports_every_phase_and_counter(fixture_site):
+    # scraper.py runs as __main__ here; the static path must still write to the same metrics
+    result, = run_cli(fixture_site, "Dell Inspiron 15 3520", "Amazon.in", "Dell Inspiron 15 3520 Laptop")
+    assert result["status"] == "success"
+    assert result["fetch_path"] == "http"
+    assert {"http_path", "http_fetch", "html_parse", "validation"} <= set(result["metrics"]["phases_ms"])
+    counters = result["metrics"]["counters"]
+    assert counters["http_requests"] == 1
+    assert counters["cards_scanned"] > 0
+    assert counters["selectors_tried"] > 0
+
+def test_cli_flipkart_counts_both_page_fetches(fixture_site):
+    result, = run_cli(fixture_site, "Dell Inspiron 15 3520", "Flipkart")
+    assert result["fetch_path"] == "http"
+    assert result["metrics"]["counters"]["http_requests"] == 2
+
+def test_cli_batch_applies_profile_options(fixture_site):
+    job = json.dumps({"query": "Dell Inspiron 15 3520", "retailer": "Amazon.in", "master_title": "Dell Inspiron 15 3520 Laptop"})
+    results, stderr = run_cli(fixture_site, "--batch", "-", "--profile", "lean", "--budget", "7", "--jitter", "0,0",
+                              stdin=job + "\n", with_stderr=True)
+    assert [result["status"] for result in results] == ["success"]
+    summary = json.loads(stderr.strip().splitlines()[-1])["summary"]
+    assert summary["profile"]["name"] == "lean"
+    assert summary["profile"]["budget_seconds"] == 7
+    assert summary["profile"]["jitter"] == [0, 0]
+
+def test_cli_batch_reports_malformed_lines_and_keeps_going(fixture_site):
+    job = json.dumps({"query": "Dell Inspiron 15 3520", "retailer": "Flipkart"})
+    results, stderr = run_cli(fixture_site, "--batch", "-", stdin="\n".join([job, '{"query": bad', "[1, 2]", job]) + "\n",
+                              with_stderr=True)
+    assert sorted(result["status"] for result in results) == ["error", "error", "success", "success"]
+    assert any(result.get("line") == 2 for result in results)
+    summary = json.loads(stderr.strip().splitlines()[-1])["summary"]
+    assert (summary["jobs"], summary["success"]) == (4, 2)